@@ -47,7 +47,66 @@ export async function chatOnce(prompt: string, opts?: ChatOptions): Promise<Chat
   return (await res.json()) as ChatResponse;
 }
 
-export async function ttsSpeak(text: string): Promise<string> {
+export type ChatStreamHandlers = {
+  onToken?: (text: string) => void;
+};
+
+async function* readSseEvents(res: Response): AsyncGenerator<{ event: string; data: any }> {
+  const reader = res.body!.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let idx: number;
+    while ((idx = buffer.indexOf("\n\n")) !== -1) {
+      const raw = buffer.slice(0, idx);
+      buffer = buffer.slice(idx + 2);
+      let event = "message";
+      let data = "";
+      for (const line of raw.split("\n")) {
+        if (line.startsWith("event: ")) event = line.slice(7);
+        else if (line.startsWith("data: ")) data += line.slice(6);
+      }
+      yield { event, data: data ? JSON.parse(data) : null };
+    }
+  }
+}
+
+export async function chatStream(
+  prompt: string,
+  handlers: ChatStreamHandlers = {},
+  opts?: ChatOptions
+): Promise<ChatResponse> {
+  const url = new URL(`${API_BASE}/chat/stream`);
+  if (opts?.latencyMs != null) {
+    url.searchParams.set("latency_ms", String(opts.latencyMs));
+  }
+
+  const res = await fetch(url.toString(), {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+      ...(opts?.model ? { "X-AIOS-Model": opts.model } : {}),
+    },
+    body: JSON.stringify({ messages: [{ role: "user", content: prompt }] }),
+  });
+
+  if (!res.ok || !res.body) {
+    const detail = await res.text();
+    throw new Error(`Chat stream failed: ${res.status} ${detail}`);
+  }
+
+  for await (const { event, data } of readSseEvents(res)) {
+    if (event === "token") handlers.onToken?.(data.text);
+    else if (event === "final") return data as ChatResponse;
+    else if (event === "error") throw new Error(`Chat stream failed: ${data.status} ${JSON.stringify(data.detail)}`);
+  }
+  throw new Error("Chat stream ended without a final event");
+}
+
+export async function ttsSpeakWav(text: string): Promise<string> {
   const res = await fetch(`${API_BASE}/tts`, {
     method: "POST",
     headers: { "Content-Type": "application/json" },
@@ -67,6 +126,168 @@ export async function ttsSpeak(text: string): Promise<string> {
   return url;
 }
 
+type AudioFrame = { kind: "meta"; data: any } | { kind: "audio"; data: Uint8Array };
+
+// /tts/stream framing: 1 kind byte ("m" JSON, "a" 16-bit mono PCM), u32 little-endian length, payload.
+async function* readAudioFrames(res: Response): AsyncGenerator<AudioFrame> {
+  const reader = res.body!.getReader();
+  const decoder = new TextDecoder();
+  let buffer = new Uint8Array(0);
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    const next = new Uint8Array(buffer.length + value.length);
+    next.set(buffer);
+    next.set(value, buffer.length);
+    buffer = next;
+    while (buffer.length >= 5) {
+      const length = new DataView(buffer.buffer, buffer.byteOffset + 1, 4).getUint32(0, true);
+      if (buffer.length < 5 + length) break;
+      const payload = buffer.slice(5, 5 + length);
+      const kind = buffer[0];
+      buffer = buffer.slice(5 + length);
+      if (kind === 0x6d) yield { kind: "meta", data: JSON.parse(decoder.decode(payload)) };
+      else if (kind === 0x61) yield { kind: "audio", data: payload };
+    }
+  }
+}
+
+// Schedules 16-bit mono PCM chunks back to back on one AudioContext.
+class PcmPlayer {
+  private ctx: AudioContext;
+  private playAt = 0;
+  private last: AudioBufferSourceNode | null = null;
+
+  constructor(AudioCtx: typeof AudioContext) {
+    this.ctx = new AudioCtx();
+  }
+
+  enqueue(bytes: Uint8Array, sampleRate: number) {
+    const pcm = new Int16Array(bytes.buffer, bytes.byteOffset, bytes.byteLength >> 1);
+    const buffer = this.ctx.createBuffer(1, pcm.length, sampleRate);
+    const channel = buffer.getChannelData(0);
+    for (let i = 0; i < pcm.length; i++) channel[i] = pcm[i] / 32768;
+    const source = this.ctx.createBufferSource();
+    source.buffer = buffer;
+    source.connect(this.ctx.destination);
+    this.playAt = Math.max(this.playAt, this.ctx.currentTime);
+    source.start(this.playAt);
+    this.playAt += buffer.duration;
+    this.last = source;
+  }
+
+  // Closes the context once everything queued has played.
+  finish() {
+    if (this.last) this.last.onended = () => void this.ctx.close();
+    else void this.ctx.close();
+  }
+
+  abort() {
+    void this.ctx.close();
+  }
+}
+
+function audioContextClass(): typeof AudioContext | undefined {
+  return (globalThis as any).AudioContext ?? (globalThis as any).webkitAudioContext;
+}
+
+// Plays each sentence as soon as it arrives from /tts/stream; resolves once the last one is scheduled.
+export async function ttsSpeak(text: string): Promise<void> {
+  const AudioCtx = audioContextClass();
+  if (!AudioCtx) {
+    await ttsSpeakWav(text);
+    return;
+  }
+
+  const res = await fetch(`${API_BASE}/tts/stream`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ text }),
+  });
+  if (res.status === 404) {
+    await ttsSpeakWav(text);
+    return;
+  }
+  if (!res.ok || !res.body) {
+    const detail = await res.text();
+    throw new Error(`TTS failed: ${res.status} ${detail}`);
+  }
+
+  const player = new PcmPlayer(AudioCtx);
+  let sampleRate = 22050;
+  try {
+    for await (const frame of readAudioFrames(res)) {
+      if (frame.kind === "audio") {
+        player.enqueue(frame.data, sampleRate);
+        continue;
+      }
+      if (frame.data?.error) throw new Error(`TTS failed: ${frame.data.error}`);
+      if (frame.data?.sample_rate) sampleRate = frame.data.sample_rate;
+    }
+  } catch (error) {
+    player.abort();
+    throw error;
+  }
+  player.finish();
+}
+
+export type ChatSpeakHandlers = ChatStreamHandlers & {
+  onSegment?: (segment: { index: number; text: string; ready_ms: number; synth_ms: number; sent_ms: number }) => void;
+};
+
+// One round trip for chat + speech: /chat/speak streams text and plays each sentence while the reply generates.
+export async function chatSpeak(
+  prompt: string,
+  handlers: ChatSpeakHandlers = {},
+  opts?: ChatOptions
+): Promise<ChatResponse> {
+  const AudioCtx = audioContextClass();
+  const url = new URL(`${API_BASE}/chat/speak`);
+  if (opts?.latencyMs != null) {
+    url.searchParams.set("latency_ms", String(opts.latencyMs));
+  }
+
+  const res = await fetch(url.toString(), {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+      ...(opts?.model ? { "X-AIOS-Model": opts.model } : {}),
+    },
+    body: JSON.stringify({ messages: [{ role: "user", content: prompt }] }),
+  });
+  if (!res.ok || !res.body) {
+    const detail = await res.text();
+    throw new Error(`Chat speak failed: ${res.status} ${detail}`);
+  }
+
+  const player = AudioCtx ? new PcmPlayer(AudioCtx) : null;
+  let sampleRate = 22050;
+  let final: ChatResponse | null = null;
+  try {
+    for await (const frame of readAudioFrames(res)) {
+      if (frame.kind === "audio") {
+        player?.enqueue(frame.data, sampleRate);
+        continue;
+      }
+      const data = frame.data ?? {};
+      if (data.type === "token") handlers.onToken?.(data.text);
+      else if (data.type === "segment") {
+        sampleRate = data.sample_rate ?? sampleRate;
+        handlers.onSegment?.(data);
+      } else if (data.type === "final") final = data as ChatResponse;
+      else if (data.type === "error" && data.stage !== "tts") {
+        throw new Error(`Chat speak failed: ${data.status} ${JSON.stringify(data.detail)}`);
+      }
+    }
+  } catch (error) {
+    player?.abort();
+    throw error;
+  }
+  player?.finish();
+  if (!final) throw new Error("Chat speak ended without a final event");
+  return final;
+}
+
 export async function health(): Promise<{ status: string; ollama: boolean; piper: boolean }> {
   const res = await fetch(`${API_BASE}/health`);
   if (!res.ok) {
@@ -1,17 +1,19 @@
 from __future__ import annotations
 
+import asyncio
+import fnmatch
 import json
 import logging
 import os
 import re
 import shutil
 import time
-from typing import Any, Dict, List, Optional, Tuple
+from contextlib import aclosing, asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 
-import httpx
 from fastapi import FastAPI, Header, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel, Field
 
 from . import flag
@@ -34,22 +36,66 @@ EMBED_MODEL = os.getenv("AIOS_EMBED_MODEL", "sentence-transformers/all-MiniLM-L6
 LTM_MAX = int(os.getenv("AIOS_LTM_MAX", "5000") or "5000")
 LTM_K = int(os.getenv("AIOS_LTM_K", "5") or "5")
 LTM_BYTES_CAP = int(os.getenv("AIOS_LTM_BYTES_CAP", "800") or "800")
+PROMPT_LAYOUT = os.getenv("AIOS_PROMPT_LAYOUT", "default").strip().lower()
+PROMPT_PROFILE = os.getenv("AIOS_PROMPT_PROFILE", "full").strip().lower()
+FAST_PATH_ENABLED = flag("AIOS_FAST_PATH")
+FAST_PATH_MIN_CONF = float(os.getenv("AIOS_FAST_PATH_MIN_CONF", "0.8") or "0.8")
+FAST_PATH_TOOLS = [
+    name.strip()
+    for name in os.getenv("AIOS_FAST_PATH_TOOLS", "open_app,open_terminal,user_profile.set,memory_ltm_*").split(",")
+    if name.strip()
+]
+TOOL_EARLY_STOP_ENABLED = flag("AIOS_TOOL_EARLY_STOP", True)
+TOOL_FORMAT_ENABLED = flag("AIOS_TOOL_FORMAT")
 _SECRET_PATTERN = re.compile(r"(api[_-]?key\\s*=\\s*[\\w-]+|sk-[a-z0-9]{20,}|bearer\\s+[a-z0-9._-]+)", re.IGNORECASE)
 LOGGER = logging.getLogger(__name__)
 
 from .errors import ServiceUnavailableError
-from .llm import generate
-from .llm_router import select_model
+from .llm import generate, stream_generate
+from . import ollama_client
+from .llm_router import budget_model, context_window, model_info, prompt_bytes, select_model
+from .generation import GenerationPlan, plan_for, trim_truncated
+from . import audio_format, cascade
+from . import latency_router
 from .prompt import SYSTEM_PERSONA, tool_catalog
 from .tool_gate import analyze_request
-from .tts import piper_say
+from .tts import (
+    FRAME_AUDIO,
+    FRAME_MEDIA_TYPE,
+    SentenceSegmenter,
+    SpeechPipeline,
+    audio_frame,
+    meta_frame,
+    render_wav,
+    split_sentences,
+    stream_audio,
+    synthesize,
+)
+from .lex.gazetteer import GAZETTEER, TUI_SET
 from .tools import registry
+from .tools.impl_open_terminal import DEFAULT_TERMINAL, DEFAULT_WORKSPACE, launch_note
 from .tools.registry import list_tools
 from .runtime import cache as runtime_cache
+from .runtime import (
+    admission,
+    breakers,
+    looplag,
+    piper_pool,
+    residency,
+    response_cache,
+    singleflight,
+    speculation,
+    tts_cache,
+)
 from .util.prompt_dump import dump_prompt
+from .util.session import compositor_name
+from .util.tool_json import ToolCallScanner, tool_call_schema
 from .debug import context_debug
 from . import permissions, logs
-from .context import RequestContext as PromptRequestContext, build_prompt
+from .context import RequestContext as PromptRequestContext, build_prompt, common_prefix_bytes
+from .context import section_cache
+from .context.budget import fit_sections
+from .context.tokens import TokenCounter, counter_for
 from .context.snapshot import ContextSnapshot
 from .context.turn_context import infer_turn_context
 from .intent.intent_stabilizer import stabilize_intent
@@ -145,7 +191,28 @@ REFRESH_TRIGGER_TOOLS = {"pkg_install", "pkg_remove", "pkg_update"}
 NUMBER_CATEGORY_HINTS = {"number_game", "game/number", "guess_number", "number"}
 MAX_DIALOG_HISTORY = 12
 
-app = FastAPI(title="AIOS Backend v2", version="0.2.0")
+TokenCallback = Callable[[str], Awaitable[None]]
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    await ollama_client.startup()
+    await residency.startup()
+    await looplag.startup()
+    await latency_router.startup()
+    await piper_pool.startup()
+    await tts_cache.startup(tool_confirmation_phrases, render_wav)
+    try:
+        yield
+    finally:
+        await tts_cache.shutdown()
+        await piper_pool.shutdown()
+        await looplag.shutdown()
+        await residency.shutdown()
+        await ollama_client.shutdown()
+
+
+app = FastAPI(title="AIOS Backend v2", version="0.2.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -185,6 +252,18 @@ class ChatResponse(BaseModel):
     remark: Optional[str] = None
 
 
+def _trim_history_to_tokens(
+    history: list[Dict[str, str]],
+    max_tokens: int,
+    counter: TokenCounter,
+) -> list[Dict[str, str]]:
+    """Drop the oldest turns until the history fits; the latest turn is always kept."""
+    trimmed = list(history)
+    while len(trimmed) > 1 and sum(counter.count(m["content"]) for m in trimmed) > max_tokens:
+        trimmed.pop(0)
+    return trimmed
+
+
 def _prepare_dialog_history(messages: list[ChatMessage], limit: int = MAX_DIALOG_HISTORY) -> list[Dict[str, str]]:
     """Return the latest user/assistant turns (preserving order) for LLM context."""
     filtered: list[Dict[str, str]] = []
@@ -315,6 +394,24 @@ def format_tool_result(name: str, result: Dict[str, Any]) -> str:
     return json.dumps(result, ensure_ascii=False)
 
 
+def tool_confirmation_phrases() -> List[str]:
+    """Spoken confirmations worth pre-rendering: app launches and TUIs on the default terminal."""
+    apps = set(GAZETTEER)
+    for entry in memory_store.list_app_index() if memory_store else []:
+        command = [part for part in str(entry.get("exec") or "").split() if part != "env" and "=" not in part]
+        if command and os.path.basename(command[0]) not in {"flatpak", "snap"}:
+            apps.add(os.path.basename(command[0]).lower())
+        name = str(entry.get("name") or "").strip().lower()
+        if name and len(name.split()) <= 2:
+            apps.add(name)
+    phrases = [format_tool_result("open_app", {"ok": True, "app": app}) for app in sorted(apps)]
+    comp = compositor_name()
+    for program in sorted(TUI_SET):
+        note = launch_note(program, DEFAULT_TERMINAL, DEFAULT_WORKSPACE, comp)
+        phrases.append(format_tool_result("open_terminal", {"ok": True, "note": note}))
+    return phrases
+
+
 def build_clarify_payload(parsed_intent: Dict[str, Any], phrase: str) -> tuple[Optional[Dict[str, Any]], float]:
     if not memory_store:
         return None, 0.0
@@ -480,18 +577,31 @@ async def run_tool(body: ToolExecuteRequest):
 async def health_check() -> dict:
     details = {"status": "ok", "ollama": False, "piper": False}
 
-    ollama_base = os.getenv("OLLAMA_URL", "http://127.0.0.1:11434").rstrip("/")
     try:
-        async with httpx.AsyncClient(timeout=1.0) as client:
-            resp = await client.get(f"{ollama_base}/api/tags")
-            details["ollama"] = resp.status_code == 200
+        resp = await ollama_client.get_client().get("/api/tags", read_timeout=1.0)
+        details["ollama"] = resp.status_code == 200
     except Exception:
         details["ollama"] = False
+    details["ollama_pool"] = ollama_client.pool_stats()
+    details["models"] = breakers.snapshot()
+    details["residency"] = residency.snapshot()
+    details["coalescing"] = singleflight.snapshot()
+    details["admission"] = admission.snapshot()
+    details["speculation"] = speculation.snapshot()
+    details["cascade"] = cascade.snapshot()
+    details["response_cache"] = response_cache.snapshot()
+    details["event_loop"] = looplag.snapshot()
+    details["piper_pool"] = piper_pool.snapshot()
+    details["tts_cache"] = tts_cache.snapshot()
+    details["audio_formats"] = audio_format.snapshot()
+    details["prompt_sections"] = section_cache.snapshot()
 
     piper_binary = shutil.which("piper")
     voice_path = os.getenv("PIPER_MODEL") or os.getenv("PIPER_VOICE", "")
     if piper_binary and voice_path and os.path.exists(voice_path):
         details["piper"] = True
+    if piper_pool.running() and not details["piper_pool"]["alive"]:
+        details["piper"] = False
 
     if not (details["ollama"] and details["piper"]):
         details["status"] = "degraded"
@@ -503,8 +613,303 @@ async def health_check() -> dict:
 async def chat_route(
     body: ChatRequest,
     x_aios_model: str | None = Header(default=None),
+    x_aios_priority: str | None = Header(default=None),
     latency_ms: int | None = Query(default=None),
 ) -> ChatResponse:
+    priority = _request_priority(x_aios_priority, latency_ms)
+    key = singleflight.request_key(
+        [[(m.role or "").strip().lower(), (m.content or "").strip()] for m in body.messages],
+        (body.text or "").strip(),
+        x_aios_model,
+        latency_ms,
+    )
+    return await singleflight.chat_flights.do(
+        key, lambda: _chat_turn(body, x_aios_model, latency_ms, priority=priority)
+    )
+
+
+@app.post("/chat/stream")
+async def chat_stream_route(
+    body: ChatRequest,
+    x_aios_model: str | None = Header(default=None),
+    x_aios_priority: str | None = Header(default=None),
+    latency_ms: int | None = Query(default=None),
+) -> StreamingResponse:
+    """Server-Sent Events variant of /chat.
+
+    Emits ``token`` events while Ollama generates, then one ``final`` event with
+    the ChatResponse fields (or an ``error`` event). Token events carry the raw
+    model output; the ``final`` text is authoritative after tone/constraint fixes.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def on_token(chunk: str) -> None:
+        await queue.put(("token", {"text": chunk}))
+
+    async def run_turn() -> None:
+        try:
+            response = await _chat_turn(
+                body,
+                x_aios_model,
+                latency_ms,
+                on_token=on_token,
+                priority=_request_priority(x_aios_priority, latency_ms),
+            )
+            await queue.put(("final", response.model_dump(exclude_none=True)))
+        except HTTPException as exc:
+            await queue.put(("error", {"status": exc.status_code, "detail": exc.detail}))
+        except Exception as exc:  # noqa: BLE001
+            LOGGER.exception("chat_stream_failed", exc_info=exc)
+            await queue.put(("error", {"status": 500, "detail": str(exc)}))
+        finally:
+            await queue.put(None)
+
+    async def events():
+        task = asyncio.create_task(run_turn())
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                event, data = item
+                yield _sse_event(event, data)
+        finally:
+            if not task.done():
+                task.cancel()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/chat/speak")
+async def chat_speak_route(
+    body: ChatRequest,
+    x_aios_model: str | None = Header(default=None),
+    x_aios_priority: str | None = Header(default=None),
+    latency_ms: int | None = Query(default=None),
+    format: str | None = Query(default=None),
+    accept: str | None = Header(default=None),
+) -> StreamingResponse:
+    """/chat/stream plus speech: sentences are synthesized while the reply is still generating.
+
+    Uses the ``/tts/stream`` framing. ``m`` frames carry a ``type``: ``token``
+    (streamed text), ``segment`` (a spoken sentence and its timings, followed by
+    its ``a`` PCM frame), ``final`` (the ChatResponse fields), ``error`` and a
+    closing ``done`` with the per-segment telemetry. Audio is 16-bit mono PCM
+    unless ``?format=``/``Accept`` picks another format, as for /tts/stream.
+    """
+    fmt = _audio_format(format, accept, default="pcm")
+    start = time.perf_counter()
+    frames: asyncio.Queue = asyncio.Queue()
+    segmenter = SentenceSegmenter()
+    speech = SpeechPipeline(fmt)
+    spoken: List[str] = []
+    timings: List[Dict[str, Any]] = []
+    telemetry: Dict[str, Any] = {"endpoint": "/chat/speak"}
+
+    def elapsed_ms() -> float:
+        return round((time.perf_counter() - start) * 1000, 1)
+
+    def speak(segments: List[str]) -> None:
+        if "tts_error" in telemetry:
+            return
+        for segment in segments:
+            spoken.append(segment)
+            speech.submit(segment)
+
+    async def on_token(chunk: str) -> None:
+        telemetry.setdefault("first_token_ms", elapsed_ms())
+        await frames.put(meta_frame({"type": "token", "text": chunk}))
+        speak(segmenter.feed(chunk))
+
+    async def run_turn() -> None:
+        try:
+            response = await _chat_turn(
+                body,
+                x_aios_model,
+                latency_ms,
+                on_token=on_token,
+                priority=_request_priority(x_aios_priority, latency_ms),
+            )
+            speak(_unspoken_segments(response.text or "", spoken, segmenter.flush()))
+            telemetry["model"] = response.model
+            telemetry["final_ms"] = elapsed_ms()
+            await frames.put(meta_frame({"type": "final", **response.model_dump(exclude_none=True)}))
+        except HTTPException as exc:
+            await frames.put(meta_frame({"type": "error", "status": exc.status_code, "detail": exc.detail}))
+        except Exception as exc:  # noqa: BLE001
+            LOGGER.exception("chat_speak_failed", exc_info=exc)
+            await frames.put(meta_frame({"type": "error", "status": 500, "detail": str(exc)}))
+        finally:
+            speech.close()
+            await frames.put(None)
+
+    async def relay_speech() -> None:
+        try:
+            async for index, text, audio, sample_rate, synth_ms, submitted_at in speech:
+                ready_ms = round((submitted_at - start) * 1000, 1)
+                sent_ms = elapsed_ms()
+                timing = {
+                    "index": index,
+                    "chars": len(text),
+                    "ready_ms": ready_ms,
+                    "synth_ms": round(synth_ms, 1),
+                    "sent_ms": sent_ms,
+                    "wait_ms": round(max(0.0, sent_ms - ready_ms - synth_ms), 1),
+                }
+                timings.append(timing)
+                telemetry.setdefault("first_audio_ms", sent_ms)
+                segment = {"type": "segment", "text": text, "format": fmt, "sample_rate": sample_rate, **timing}
+                await frames.put(meta_frame(segment))
+                await frames.put(audio_frame(FRAME_AUDIO, audio))
+        except (ServiceUnavailableError, audio_format.UnsupportedFormatError) as err:
+            status = 406 if isinstance(err, audio_format.UnsupportedFormatError) else 503
+            telemetry["tts_error"] = str(err)
+            await frames.put(meta_frame({"type": "error", "status": status, "detail": str(err), "stage": "tts"}))
+        finally:
+            await frames.put(None)
+
+    async def stream():
+        tasks = [asyncio.create_task(run_turn()), asyncio.create_task(relay_speech())]
+        open_producers = len(tasks)
+        try:
+            while open_producers:
+                frame = await frames.get()
+                if frame is None:
+                    open_producers -= 1
+                    continue
+                yield frame
+            telemetry.update({"segments": timings, "total_ms": elapsed_ms()})
+            yield meta_frame({"type": "done", **telemetry})
+            logs.log_speech_turn(telemetry)
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    return StreamingResponse(
+        stream(),
+        media_type=FRAME_MEDIA_TYPE,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-AIOS-Audio-Format": fmt},
+    )
+
+
+def _unspoken_segments(final_text: str, spoken: List[str], tail: List[str]) -> List[str]:
+    """What is left to say once the turn is final.
+
+    The final text is authoritative (tool results, tone fixes); when it still
+    begins with what was already spoken, the rest of it is said, otherwise only
+    the unspoken tail of the streamed reply.
+    """
+    final = " ".join(final_text.split())
+    said = " ".join(" ".join(spoken).split())
+    if final.startswith(said):
+        return split_sentences(final[len(said) :])
+    return tail
+
+
+def _fast_path_eligible(tool_name: str) -> bool:
+    return any(fnmatch.fnmatchcase(tool_name, pattern) for pattern in FAST_PATH_TOOLS)
+
+
+def _start_speculation(hint: Dict[str, Any]) -> Optional[speculation.Speculation]:
+    """Run the predicted tool ahead of the model when it is read-only and already permitted."""
+    name = hint.get("name") or ""
+    args = hint.get("arguments") or {}
+    tool = registry.load_tools().get(name)
+    if not tool or not tool.speculation_safe(args):
+        return None
+    if any(not permissions.is_allowed(perm) for perm in tool.permissions):
+        return None
+    return speculation.Speculation(name, args, lambda: registry.execute(name, args))
+
+
+def _request_priority(header: Optional[str], latency_ms: Optional[int]) -> int:
+    """``X-AIOS-Priority: background`` queues last; small ``latency_ms`` budgets queue first."""
+    return admission.priority_for(latency_ms, background=(header or "").strip().lower() == "background")
+
+
+def _generation_profile(has_tools: bool, intent_conf: float, model: str, priority: int) -> str:
+    """Turn type for ``generation.PROFILES``: tool call, clarifier, spoken reply, deep answer or chat."""
+    if has_tools:
+        return "clarify" if 0.6 <= intent_conf < 0.8 else "tool"
+    if priority == admission.INTERACTIVE:
+        return "voice"
+    info = model_info(model)
+    if info and info.tier == "deep":
+        return "deep"
+    return "chat"
+
+
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _stream_reply(
+    messages_payload: List[Dict[str, Any]],
+    model: str,
+    temperature: float,
+    on_token: TokenCallback,
+    log_context: Dict[str, Any],
+    turn_start: float,
+    priority: int = admission.NORMAL,
+    latency_budget_ms: Optional[int] = None,
+    plan: Optional[GenerationPlan] = None,
+) -> str:
+    """Relay streamed chunks to ``on_token`` and return the full reply.
+
+    Replies that open with ``{`` are held back so tool-call JSON never reaches
+    the UI as text; the final event carries the parsed outcome instead. A held
+    reply is cut off once it forms a complete tool call, cancelling the stream.
+    """
+    stats: Dict[str, Any] = {}
+    parts: List[str] = []
+    mode: Optional[str] = None  # None until the first visible char, then "relay" | "hold"
+    scanner = ToolCallScanner() if TOOL_EARLY_STOP_ENABLED else None
+    try:
+        async with aclosing(
+            stream_generate(
+                messages_payload,
+                model=model,
+                temperature=temperature,
+                stats=stats,
+                priority=priority,
+                latency_budget_ms=latency_budget_ms,
+                plan=plan,
+            )
+        ) as chunks:
+            async for chunk in chunks:
+                parts.append(chunk)
+                if mode is None:
+                    head = "".join(parts).lstrip()
+                    if not head:
+                        continue
+                    mode = "hold" if head.startswith("{") else "relay"
+                    if mode == "relay":
+                        log_context["ttft_ms"] = (time.perf_counter() - turn_start) * 1000
+                        await on_token("".join(parts))
+                elif mode == "relay":
+                    await on_token(chunk)
+                if scanner is not None and mode != "relay" and scanner.feed(chunk) is not None:
+                    stats["tool_call_early_stop"] = True
+                    return scanner.text
+    finally:
+        log_context["stream"] = True
+        log_context.update(stats)
+    return "".join(parts).strip()
+
+
+async def _chat_turn(
+    body: ChatRequest,
+    x_aios_model: Optional[str],
+    latency_ms: Optional[int],
+    on_token: Optional[TokenCallback] = None,
+    priority: int = admission.NORMAL,
+) -> ChatResponse:
+    """Run one chat turn; passing ``on_token`` switches generation to Ollama streaming."""
     turn_start = time.perf_counter()
     tools_info = list_tools()
     available_names = {tool["name"] for tool in tools_info}
@@ -663,6 +1068,13 @@ async def chat_route(
         intent_hint = {"name": "prompt_dump", "arguments": {}}
         candidate_conf = 1.0
 
+    speculative_run: Optional[speculation.Speculation] = None
+    if intent_hint and not clarify_payload and speculation.in_band(candidate_conf):
+        speculative_run = _start_speculation(intent_hint)
+        if speculative_run:
+            # The model can only confirm the guess if it sees the tool.
+            allowed_tool_names = set(allowed_tool_names) | {speculative_run.name}
+
     allowed_tools = [tool for tool in tools_info if tool["name"] in allowed_tool_names]
     schemas_sent = [tool["name"] for tool in allowed_tools]
     temperature = 0.2 if allowed_tools else (0.6 if PERSONA_V1_ENABLED else 0.7)
@@ -743,6 +1155,167 @@ async def chat_route(
         if alias_entry:
             log_context["aliases_hit"] = True
 
+    logged = False
+
+    def emit_log(response_type: str, **extra: Any) -> None:
+        nonlocal logged
+        if logged:
+            return
+        payload = dict(log_context)
+        payload["response_type"] = response_type
+        payload["latency_ms"] = (time.perf_counter() - turn_start) * 1000
+        stats = runtime_cache.stats_snapshot()
+        payload["cache_hits"] = stats.get("hits", 0)
+        payload["cache_misses"] = stats.get("misses", 0)
+        payload["ollama_pool"] = ollama_client.pool_stats()
+        baseline_ms = payload.get("fast_path_baseline_ms")
+        if isinstance(baseline_ms, (int, float)):
+            # The generation this turn skipped; tool time is paid either way.
+            payload["fast_path_saved_ms"] = round(baseline_ms, 1)
+        coalesced = singleflight.joined_so_far()
+        if coalesced:
+            payload["coalesced"] = coalesced
+        reasons = []
+        for key in ("intent_parse_ms", "resolver_ms", "index_lookup_ms"):
+            ms_val = payload.get(key)
+            if isinstance(ms_val, (int, float)) and ms_val and ms_val > 150:
+                reasons.append(f"{key}>{int(ms_val)}ms")
+        if reasons:
+            payload["perf_warn"] = True
+            payload["warn_reason"] = "; ".join(reasons)
+        payload.update(extra)
+        logs.log_chat_turn(payload)
+        latency_router.observe_turn(payload)
+        logged = True
+
+    async def execute_tool_call(
+        tool_call: Dict[str, Any],
+        synthesized_note: Optional[str],
+        model_name: Optional[str],
+        response_type: str = "executed_tool",
+    ) -> ChatResponse:
+        tool_name = tool_call.get("name")
+        args = tool_call.get("arguments") or {}
+        tools_map = registry.load_tools()
+        tool = tools_map.get(tool_name) if tool_name else None
+        if not tool:
+            emit_log("tool_missing", error=f"unknown tool {tool_name}")
+            return ChatResponse(text="Tool unavailable right now.", model=model_name)
+
+        missing = [perm for perm in tool.permissions if not permissions.is_allowed(perm)]
+        if missing:
+            emit_log("tool_call", missing_perms=missing)
+            return ChatResponse(model=model_name, tool_call=tool_call, note=synthesized_note)
+
+        start = time.perf_counter()
+        try:
+            if speculative_run is not None and speculative_run.matches(tool_call):
+                result, saved_ms = await speculative_run.commit()
+                log_context["speculation"] = {"tool": tool.name, "hit": True, "saved_ms": round(saved_ms, 1)}
+            else:
+                result = await registry.execute(tool.name, args)
+            duration = (time.perf_counter() - start) * 1000
+            log_context["tool_ms"] = round(duration, 1)
+            logs.log_tool_execution(tool.name, args, ok=True, result=result, duration_ms=duration)
+            message = format_tool_result(tool.name, result)
+            if isinstance(result, dict):
+                log_context["channel_chosen"] = result.get("channel")
+                log_context["reason"] = result.get("note") or result.get("reason")
+                log_context["note"] = result.get("note") or message
+                if result.get("resolver_ms") is not None:
+                    log_context["resolver_ms"] = result.get("resolver_ms")
+                if result.get("alias_promoted"):
+                    log_context["alias_promoted"] = True
+                if (
+                    PERSONA_V1_ENABLED
+                    and tone_pref in {"playful", "dry"}
+                    and result.get("ok")
+                ):
+                    tone_sentence = tone_remark(tone_pref, "tool")
+                    if tone_sentence:
+                        message = f"{message} {tone_sentence}"
+                        log_context["remark"] = tone_sentence
+                if (
+                    log_context.get("default_target")
+                    and tool.name == "open_app"
+                    and result.get("app") == log_context.get("default_target")
+                ):
+                    log_context["default_used"] = True
+            else:
+                log_context["note"] = message
+
+            refreshed = False
+            refresh_reason = None
+            if isinstance(result, dict) and result.get("refreshed"):
+                refreshed = bool(result.get("refreshed"))
+                refresh_reason = tool.name
+            elif tool.name in REFRESH_TRIGGER_TOOLS:
+                if maybe_refresh_system(tool.name):
+                    refreshed = True
+                    refresh_reason = tool.name
+            elif isinstance(result, dict) and result.get("reindexed"):
+                reason = f"{tool.name}:reindexed"
+                if maybe_refresh_system(reason):
+                    refreshed = True
+                    refresh_reason = reason
+
+            if refreshed:
+                log_context["system_refreshed"] = True
+                log_context["refresh_reason"] = refresh_reason
+
+            regulated_message, tone_applied = apply_tone_regulation(message)
+            if tone_applied:
+                message = regulated_message
+                log_context["tone_regulated"] = True
+
+            log_context["note"] = message
+            log_context["executed_tool"] = tool.name
+            log_context["confirmed"] = True
+            runtime_cache.push_conversation_turn(latest_user_text, message)
+            if short_term:
+                short_term.push(latest_user_text, message)
+            stored_summary = maybe_store_memory_entry(
+                ltm_store if MEMORY_LTM_ENABLED else None,
+                MemoryCandidate(
+                    user_message=latest_user_text,
+                    assistant_message=message,
+                    goal=stm_snapshot,
+                ),
+                profile_store=memory_store if MEMORY_DB_ENABLED else None,
+            )
+            if stored_summary:
+                log_context["memory_written"] = stored_summary
+            emit_log(response_type)
+            return ChatResponse(text=message, model=model_name, tool_result=result)
+        except Exception as exc:  # noqa: BLE001
+            duration = (time.perf_counter() - start) * 1000
+            logs.log_tool_execution(tool.name, args, ok=False, error=str(exc), duration_ms=duration)
+            log_context["reason"] = str(exc)
+            emit_log("tool_error", error=str(exc))
+            return ChatResponse(text=f"Tool error: {exc}", model=model_name)
+
+    if (
+        FAST_PATH_ENABLED
+        and intent_hint
+        and not clarify_payload
+        and candidate_conf >= FAST_PATH_MIN_CONF
+        and _fast_path_eligible(intent_hint.get("name") or "")
+    ):
+        log_context["fast_path"] = True
+        log_context["synthesized_tool_call"] = True
+        log_context["fast_path_baseline_ms"] = latency_router.typical_latency_ms("tool")
+        return await execute_tool_call(
+            {"name": intent_hint["name"], "arguments": intent_hint.get("arguments") or {}},
+            "fast_path",
+            "fast_path",
+            response_type="fast_path",
+        )
+
+    prompt_start = time.perf_counter()
+    dialog_history = _prepare_dialog_history(body.messages)
+    has_prior_dialog = len(dialog_history) > 1
+    token_model = budget_model(x_aios_model)
+    token_counter = counter_for(token_model)
     prompt_bundle = None
     if CONTEXT_V2_ENABLED:
         try:
@@ -766,6 +1339,12 @@ async def chat_route(
                 redact_fn=_redact,
                 redact_string_fn=_redact_string,
                 scene_state=scene_snapshot,
+                layout=PROMPT_LAYOUT,
+                profile=PROMPT_PROFILE,
+                token_counter=token_counter,
+                context_window=context_window(token_model),
+                history_tokens=sum(token_counter.count(m["content"]) for m in dialog_history),
+                tools_version=registry.registry_version(),
             )
             prompt_bundle = build_prompt(prompt_ctx)
         except Exception as exc:  # noqa: BLE001
@@ -793,11 +1372,20 @@ async def chat_route(
             get_system_card=get_system_card,
             get_persona_card=get_persona_card,
             ltm_store=ltm_store,
+            token_counter=token_counter,
+            context_window=context_window(token_model),
+            history_tokens=sum(token_counter.count(m["content"]) for m in dialog_history),
         )
         log_context.update(legacy_metrics)
         if "prompt_metrics" in legacy_metrics:
             log_context["prompt_metrics"] = legacy_metrics["prompt_metrics"]
         messages_payload = [{"role": "system", "content": system_message}]
+    prefix_bytes = common_prefix_bytes(runtime_cache.get_last_system_prompt(), system_message)
+    system_bytes = len(system_message.encode("utf-8"))
+    log_context["prefix_match_bytes"] = prefix_bytes
+    log_context["prefix_match_ratio"] = round(prefix_bytes / system_bytes, 3) if system_bytes else 0.0
+    if isinstance(log_context.get("prompt_metrics"), dict):
+        log_context["prompt_metrics"]["prefix_match_bytes"] = prefix_bytes
     runtime_cache.set_last_system_prompt(system_message)
     dump_prompt(system_message, DEBUG_PROMPT_DUMP)
     ltm_debug_entries = prompt_bundle.ltm_entries if prompt_bundle else []
@@ -835,20 +1423,37 @@ async def chat_route(
         updated_ts=time.time(),
     )
     runtime_cache.set_last_context_snapshot(context_snapshot)
-    dialog_history = _prepare_dialog_history(body.messages)
+    if prompt_bundle and prompt_bundle.budget and dialog_history:
+        history_quota = prompt_bundle.budget.quotas.get("history", 0)
+        kept = _trim_history_to_tokens(dialog_history, history_quota, token_counter)
+        if len(kept) < len(dialog_history):
+            log_context["history_trimmed"] = len(dialog_history) - len(kept)
+            dialog_history = kept
     if dialog_history:
         messages_payload.extend(dialog_history)
     else:
         messages_payload.append({"role": "user", "content": latest_user_text})
+    log_context["prompt_ms"] = round((time.perf_counter() - prompt_start) * 1000, 1)
     chosen_model = select_model(
         messages_payload,
         latency_budget_ms=latency_ms,
         force=x_aios_model,
+        turn_kind="tool" if allowed_tools else "text",
     )
 
     log_context["model"] = chosen_model
-
-    logged = False
+    log_context["prompt_bytes"] = prompt_bytes(messages_payload)
+    log_context["prompt_tokens"] = sum(token_counter.count(m.get("content") or "") for m in messages_payload)
+    log_context["token_counter"] = token_counter.name
+    log_context["latency_budget_ms"] = latency_ms
+    if residency.known():
+        log_context["model_resident"] = residency.is_resident(chosen_model)
+    gen_plan = plan_for(
+        _generation_profile(bool(allowed_tools), candidate_conf, chosen_model, priority),
+        log_context["prompt_tokens"],
+    )
+    if gen_plan is not None:
+        log_context["gen_profile"] = gen_plan.describe(chosen_model)
 
     if clarify_payload:
         log_context["clarify"] = True
@@ -871,33 +1476,93 @@ async def chat_route(
             clarify=clarify_payload,
         )
 
-    def emit_log(response_type: str, **extra: Any) -> None:
-        nonlocal logged
-        if logged:
-            return
-        payload = dict(log_context)
-        payload["response_type"] = response_type
-        payload["latency_ms"] = (time.perf_counter() - turn_start) * 1000
-        stats = runtime_cache.stats_snapshot()
-        payload["cache_hits"] = stats.get("hits", 0)
-        payload["cache_misses"] = stats.get("misses", 0)
-        reasons = []
-        for key in ("intent_parse_ms", "resolver_ms", "index_lookup_ms"):
-            ms_val = payload.get(key)
-            if isinstance(ms_val, (int, float)) and ms_val and ms_val > 150:
-                reasons.append(f"{key}>{int(ms_val)}ms")
-        if reasons:
-            payload["perf_warn"] = True
-            payload["warn_reason"] = "; ".join(reasons)
-        payload.update(extra)
-        logs.log_chat_turn(payload)
-        logged = True
+    gen_stats: Dict[str, Any] = {}
+    gen_start = time.perf_counter()
+
+    async def generate_draft(model_name: str, stats: Dict[str, Any]) -> str:
+        remaining_ms = latency_ms
+        if latency_ms is not None:
+            remaining_ms = max(0, latency_ms - int((time.perf_counter() - gen_start) * 1000))
+        return await generate(
+            messages=messages_payload,
+            model=model_name,
+            temperature=temperature,
+            stats=stats,
+            priority=priority,
+            latency_budget_ms=remaining_ms,
+            format=tool_call_schema(allowed_tools) if allowed_tools and TOOL_FORMAT_ENABLED else None,
+            stop_on_tool_call=bool(allowed_tools) and TOOL_EARLY_STOP_ENABLED,
+            plan=gen_plan,
+            logprobs=cascade.CASCADE_ENABLED and cascade.MIN_LOGPROB is not None,
+        )
+
+    def judge_draft(draft: str, stats: Dict[str, Any]) -> Optional[str]:
+        return cascade.score_draft(
+            draft,
+            stats,
+            schemas_sent,
+            (lambda text: verify_number_reply(text, number_hints)) if number_context else None,
+        )
+
+    cache_key: Optional[str] = None
+    cache_scope = ""
+    cache_vector: Any = None
+    cached: Optional[Tuple[str, str, float]] = None
+    if response_cache.RESPONSE_CACHE_ENABLED:
+        volatile = response_cache.volatile_reason(messages_payload)
+        if volatile:
+            response_cache.bypass()
+            log_context["response_cache"] = {"bypass": volatile}
+        else:
+            cache_key = response_cache.exact_key(messages_payload, chosen_model, temperature)
+            cache_scope = response_cache.scope_key(chosen_model, schemas_sent)
+            stm_used = (log_context.get("prompt_metrics") or {}).get("memory_used_flags", {}).get("stm")
+            # The semantic tier matches on the latest user text alone, so a "yes" or "do it" would
+            # replay a reply from another conversation; only opening turns may use it.
+            if response_cache.SEMANTIC_ENABLED and not has_prior_dialog and not stm_used:
+                cache_vector = await asyncio.to_thread(response_cache.embed, latest_user_text)
+            cached = response_cache.lookup(cache_key, cache_scope, cache_vector)
 
     try:
-        reply = await generate(messages=messages_payload, model=chosen_model, temperature=temperature)
+        if cached is not None:
+            reply, cache_tier, cache_similarity = cached
+            log_context["response_cache"] = {"hit": cache_tier, "similarity": cache_similarity}
+            if on_token is not None and not reply.lstrip().startswith("{"):
+                log_context["ttft_ms"] = (time.perf_counter() - turn_start) * 1000
+                await on_token(reply)
+        elif on_token is None:
+            if cascade.CASCADE_ENABLED and not x_aios_model and cascade.rungs(chosen_model):
+                reply, gen_stats, cascade_trace = await cascade.run(chosen_model, generate_draft, judge_draft)
+                log_context["cascade"] = cascade_trace
+                chosen_model = log_context["model"] = cascade_trace["accepted"]
+            else:
+                reply = await generate_draft(chosen_model, gen_stats)
+            log_context.update(gen_stats)
+        else:
+            reply = await _stream_reply(
+                messages_payload,
+                chosen_model,
+                temperature,
+                on_token,
+                log_context,
+                turn_start,
+                priority=priority,
+                latency_budget_ms=latency_ms,
+                plan=gen_plan,
+            )
     except ServiceUnavailableError as err:
+        log_context.update(gen_stats)
+        if speculative_run is not None:
+            speculative_run.discard()
         emit_log("error", error=str(err))
         raise HTTPException(status_code=503, detail=str(err)) from err
+    if cached is None:
+        log_context["generate_ms"] = round((time.perf_counter() - gen_start) * 1000, 1)
+    else:
+        # No model ran; a near-zero generate_ms would drag the learned latencies toward zero.
+        log_context["cache_hit"] = True
+    if cache_key is not None and cached is None and reply:
+        response_cache.store(cache_key, cache_scope, reply, cache_vector)
 
     tool_call: Optional[Dict[str, Any]] = None
     if reply:
@@ -906,6 +1571,9 @@ async def chat_route(
             if isinstance(parsed, dict) and "tool_call" in parsed:
                 tool_call = parsed["tool_call"]
                 log_context["model_tool_call"] = True
+            elif isinstance(parsed, dict) and isinstance(parsed.get("reply"), str):
+                # Schema-constrained (AIOS_TOOL_FORMAT) answers wrap prose as {"reply": ...}.
+                reply = parsed["reply"].strip()
         except json.JSONDecodeError:
             tool_call = None
 
@@ -918,101 +1586,24 @@ async def chat_route(
         synthesized_note = "synthesized_from_intent"
         log_context["synthesized_tool_call"] = True
 
-    if tool_call:
-        tool_name = tool_call.get("name")
-        args = tool_call.get("arguments") or {}
-        tools_map = registry.load_tools()
-        tool = tools_map.get(tool_name) if tool_name else None
-        if not tool:
-            emit_log("tool_missing", error=f"unknown tool {tool_name}")
-            return ChatResponse(text="Tool unavailable right now.", model=chosen_model)
-
-        missing = [perm for perm in tool.permissions if not permissions.is_allowed(perm)]
-        if missing:
-            emit_log("tool_call", missing_perms=missing)
-            return ChatResponse(model=chosen_model, tool_call=tool_call, note=synthesized_note)
-
-        start = time.perf_counter()
-        try:
-            result = await registry.execute(tool.name, args)
-            duration = (time.perf_counter() - start) * 1000
-            logs.log_tool_execution(tool.name, args, ok=True, result=result, duration_ms=duration)
-            message = format_tool_result(tool.name, result)
-            if isinstance(result, dict):
-                log_context["channel_chosen"] = result.get("channel")
-                log_context["reason"] = result.get("note") or result.get("reason")
-                log_context["note"] = result.get("note") or message
-                if result.get("resolver_ms") is not None:
-                    log_context["resolver_ms"] = result.get("resolver_ms")
-                if result.get("alias_promoted"):
-                    log_context["alias_promoted"] = True
-                if (
-                    PERSONA_V1_ENABLED
-                    and tone_pref in {"playful", "dry"}
-                    and result.get("ok")
-                ):
-                    tone_sentence = tone_remark(tone_pref, "tool")
-                    if tone_sentence:
-                        message = f"{message} {tone_sentence}"
-                        log_context["remark"] = tone_sentence
-                if (
-                    log_context.get("default_target")
-                    and tool.name == "open_app"
-                    and result.get("app") == log_context.get("default_target")
-                ):
-                    log_context["default_used"] = True
-            else:
-                log_context["note"] = message
-
-            refreshed = False
-            refresh_reason = None
-            if isinstance(result, dict) and result.get("refreshed"):
-                refreshed = bool(result.get("refreshed"))
-                refresh_reason = tool.name
-            elif tool.name in REFRESH_TRIGGER_TOOLS:
-                if maybe_refresh_system(tool.name):
-                    refreshed = True
-                    refresh_reason = tool.name
-            elif isinstance(result, dict) and result.get("reindexed"):
-                reason = f"{tool.name}:reindexed"
-                if maybe_refresh_system(reason):
-                    refreshed = True
-                    refresh_reason = reason
-
-            if refreshed:
-                log_context["system_refreshed"] = True
-                log_context["refresh_reason"] = refresh_reason
+    if speculative_run is not None and not speculative_run.matches(tool_call):
+        wasted_ms = speculative_run.discard()
+        log_context["speculation"] = {
+            "tool": speculative_run.name,
+            "hit": False,
+            "wasted_ms": round(wasted_ms or 0.0, 1),
+        }
 
-            regulated_message, tone_applied = apply_tone_regulation(message)
-            if tone_applied:
-                message = regulated_message
-                log_context["tone_regulated"] = True
+    if tool_call:
+        return await execute_tool_call(tool_call, synthesized_note, chosen_model)
 
-            log_context["note"] = message
-            log_context["executed_tool"] = tool.name
-            log_context["confirmed"] = True
-            runtime_cache.push_conversation_turn(latest_user_text, message)
-            if short_term:
-                short_term.push(latest_user_text, message)
-            stored_summary = maybe_store_memory_entry(
-                ltm_store if MEMORY_LTM_ENABLED else None,
-                MemoryCandidate(
-                    user_message=latest_user_text,
-                    assistant_message=message,
-                    goal=stm_snapshot,
-                ),
-                profile_store=memory_store if MEMORY_DB_ENABLED else None,
-            )
-            if stored_summary:
-                log_context["memory_written"] = stored_summary
-            emit_log("executed_tool")
-            return ChatResponse(text=message, model=chosen_model, tool_result=result)
-        except Exception as exc:  # noqa: BLE001
-            duration = (time.perf_counter() - start) * 1000
-            logs.log_tool_execution(tool.name, args, ok=False, error=str(exc), duration_ms=duration)
-            log_context["reason"] = str(exc)
-            emit_log("tool_error", error=str(exc))
-            return ChatResponse(text=f"Tool error: {exc}", model=chosen_model)
+    if log_context.get("done_reason") == "length" and isinstance(reply, str):
+        # The reply ran into num_predict. A streamed one is already on screen; otherwise drop the
+        # dangling half sentence rather than speak it.
+        log_context["reply_truncated"] = True
+        if on_token is None and cached is None:
+            reply = trim_truncated(reply)
+        LOGGER.info("reply_truncated", extra={"model": chosen_model, "stream": on_token is not None})
 
     remark: Optional[str] = None
     if isinstance(reply, str):
@@ -1054,13 +1645,100 @@ async def chat_route(
 
 
 @app.post("/tts")
-async def tts_route(body: TTSRequest) -> Response:
+async def tts_route(
+    body: TTSRequest,
+    format: str | None = Query(default=None),
+    accept: str | None = Header(default=None),
+) -> Response:
+    """Speech for ``body.text`` as WAV, or the ``?format=``/``Accept`` choice of pcm, flac or opus."""
+    fmt = _audio_format(format, accept)
     try:
-        audio_bytes = await piper_say(body.text)
+        key = singleflight.request_key(body.text.strip(), fmt)
+        audio_bytes, sample_rate = await singleflight.tts_flights.do(key, lambda: synthesize(body.text, fmt))
+    except audio_format.UnsupportedFormatError as err:
+        # The negotiated encoder went missing between negotiation and encoding.
+        raise HTTPException(status_code=406, detail=str(err)) from err
     except ServiceUnavailableError as err:
         raise HTTPException(status_code=503, detail=str(err)) from err
 
-    return Response(content=audio_bytes, media_type="audio/wav")
+    return Response(
+        content=audio_bytes,
+        media_type=audio_format.media_type(fmt, sample_rate),
+        headers={"X-AIOS-Audio-Format": fmt},
+    )
+
+
+def _audio_format(query: Optional[str], accept: Optional[str], default: str = audio_format.DEFAULT_FORMAT) -> str:
+    try:
+        return audio_format.negotiate(query, accept, default)
+    except audio_format.UnsupportedFormatError as err:
+        raise HTTPException(status_code=406, detail=str(err)) from err
+
+
+@app.post("/tts/stream")
+async def tts_stream_route(
+    body: TTSRequest,
+    format: str | None = Query(default=None),
+    accept: str | None = Header(default=None),
+) -> StreamingResponse:
+    """Sentence-chunked /tts: audio for each sentence is sent as soon as it is synthesized.
+
+    The body is a sequence of frames (``tts.audio_frame``): a ``m`` JSON frame
+    per chunk (``index``, ``text``, ``format``, ``sample_rate``, ``synth_ms``)
+    followed by an ``a`` frame holding the chunk's audio (16-bit mono PCM by
+    default, otherwise a self-contained file in the negotiated format), then a
+    closing ``m`` frame with ``done`` (or ``error``). Failure before the first
+    chunk is a plain 503.
+    """
+    fmt = _audio_format(format, accept, default="pcm")
+    chunks = split_sentences(body.text)
+    start = time.perf_counter()
+    pieces = stream_audio(chunks, fmt)
+    try:
+        first = await anext(pieces, None)
+    except audio_format.UnsupportedFormatError as err:
+        await pieces.aclose()
+        raise HTTPException(status_code=406, detail=str(err)) from err
+    except ServiceUnavailableError as err:
+        await pieces.aclose()
+        raise HTTPException(status_code=503, detail=str(err)) from err
+
+    async def frames():
+        item = first
+        sent = 0
+        try:
+            while item is not None:
+                index, text, audio, sample_rate, synth_ms = item
+                yield meta_frame(
+                    {
+                        "index": index,
+                        "text": text,
+                        "format": fmt,
+                        "sample_rate": sample_rate,
+                        "synth_ms": round(synth_ms, 1),
+                        "at_ms": round((time.perf_counter() - start) * 1000, 1),
+                    }
+                )
+                yield audio_frame(FRAME_AUDIO, audio)
+                sent += 1
+                item = await anext(pieces, None)
+            total_ms = round((time.perf_counter() - start) * 1000, 1)
+            yield meta_frame({"done": True, "chunks": sent, "total_ms": total_ms})
+        except (ServiceUnavailableError, audio_format.UnsupportedFormatError) as err:
+            yield meta_frame({"error": str(err), "chunks": sent})
+        finally:
+            await pieces.aclose()
+
+    return StreamingResponse(
+        frames(),
+        media_type=FRAME_MEDIA_TYPE,
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+            "X-AIOS-TTS-Chunks": str(len(chunks)),
+            "X-AIOS-Audio-Format": fmt,
+        },
+    )
 
 
 def build_legacy_prompt(
@@ -1076,7 +1754,18 @@ def build_legacy_prompt(
     get_system_card,
     get_persona_card,
     ltm_store,
+    token_counter: Optional[TokenCounter] = None,
+    context_window: Optional[int] = None,
+    history_tokens: int = 0,
 ) -> Tuple[str, Dict[str, Any]]:
+    """The pre-assembler system prompt, budgeted like ``build_prompt`` when given a counter and window.
+
+    Memory, persona and tools share the window by ``context/budget.py`` quota; without a
+    window the persona card keeps its old 1 KB cap.
+    """
+    started = time.perf_counter()
+    tally = section_cache.Tally()
+    budgeted = token_counter is not None and bool(context_window)
     prompt_metrics = {
         "stm_bytes": 0,
         "stm_tokens_est": 0,
@@ -1103,7 +1792,8 @@ def build_legacy_prompt(
     short_summary = short_term.get_summary() if short_term else ""
     short_summary = _redact_string(short_summary[:200]) if short_summary else ""
     prompt_metrics["stm_bytes"] = len(short_summary.encode("utf-8"))
-    prompt_metrics["stm_tokens_est"] = prompt_metrics["stm_bytes"] // 4 if short_summary else 0
+    stm_counter = token_counter or counter_for(budget_model())
+    prompt_metrics["stm_tokens_est"] = stm_counter.count(short_summary) if short_summary else 0
     prompt_metrics["memory_used_flags"]["stm"] = bool(short_summary)
 
     long_term_hits: List[str] = []
@@ -1137,7 +1827,7 @@ def build_legacy_prompt(
             if persona_card:
                 persona_bytes = json.dumps(persona_card).encode("utf-8")
                 prompt_metrics["persona_bytes"] = len(persona_bytes)
-                if len(persona_bytes) > 1024:
+                if len(persona_bytes) > 1024 and not budgeted:
                     trimmed = persona_bytes[:1000].decode("utf-8", errors="ignore")
                     persona_card_blob = f"PERSONALITY CARD: {trimmed}...[truncated]"
                 else:
@@ -1159,27 +1849,60 @@ def build_legacy_prompt(
         '"memory_summary":"legacy"}'
     )
 
-    sections = [
-        "You are the voice interface of a local desktop.",
-        memory_context_blob.strip(),
-        (persona_card_blob or persona_stub).strip(),
-        behavior_guidelines.strip(),
-        SYSTEM_PERSONA.strip(),
-    ]
-
-    if allowed_tools:
-        tool_block = (
-            "Available tools this turn:\n"
-            f"{tool_catalog(allowed_tools)}\n"
-            f"Tool catalog JSON:\n{json.dumps(allowed_tools, indent=2)}\n"
-            "When calling a tool respond exactly with JSON (no prose)."
+    def legacy_tool_block(include_catalog_json: bool) -> str:
+        variant = "legacy" if include_catalog_json else "legacy_compact"
+        catalog_json = ""
+        if include_catalog_json:
+            catalog_json = f"Tool catalog JSON:\n{json.dumps(allowed_tools, indent=2)}\n"
+        tool_names = (tool["name"] for tool in allowed_tools)
+        return section_cache.tool_block(
+            section_cache.tool_key(tool_names, registry.registry_version(), variant),
+            lambda: (
+                "Available tools this turn:\n"
+                f"{tool_catalog(allowed_tools)}\n"
+                f"{catalog_json}"
+                "When calling a tool respond exactly with JSON (no prose)."
+            ),
+            tally,
         )
-        sections.extend([tool_block, AIOS_POLICY_TEXT.strip()])
-        prompt_metrics["tools_bytes"] = len(tool_block.encode("utf-8"))
-    else:
-        sections.append("No automation tools are available this turn; respond conversationally.")
 
-    system_message = "\n\n".join(section for section in sections if section)
+    sections = {
+        "system": "You are the voice interface of a local desktop.",
+        "memory_context": memory_context_blob.strip(),
+        "persona": (persona_card_blob or persona_stub).strip(),
+        "behavior": f"{behavior_guidelines.strip()}\n\n{SYSTEM_PERSONA.strip()}",
+        "tools": legacy_tool_block(True) if allowed_tools else "",
+        "policy": (
+            AIOS_POLICY_TEXT.strip()
+            if allowed_tools
+            else "No automation tools are available this turn; respond conversationally."
+        ),
+    }
+    if token_counter is not None:
+        tokens = {name: token_counter.count(text) for name, text in sections.items()}
+        prompt_metrics["tokens"] = tokens
+        prompt_metrics["token_counter"] = token_counter.name
+        if budgeted:
+            budget, clamped = fit_sections(
+                token_counter,
+                sections,
+                tokens,
+                ("system", "behavior", "policy"),
+                context_window,
+                {"history": history_tokens},
+                # Drop the pretty-printed JSON catalog first, as the assembler does.
+                compact={"tools": lambda: legacy_tool_block(False)},
+            )
+            for name in clamped:
+                prompt_metrics["clamped"][name] = True
+            prompt_metrics["token_budget"] = budget.as_dict()
+    prompt_metrics["tools_bytes"] = len(sections["tools"].encode("utf-8"))
+
+    system_message = "\n\n".join(section for section in sections.values() if section)
+    if token_counter is not None:
+        prompt_metrics["prompt_tokens"] = token_counter.count(system_message)
+    prompt_metrics["section_cache"] = tally.as_dict()
+    prompt_metrics["assembly_ms"] = round((time.perf_counter() - started) * 1000, 3)
     legacy_updates = {
         "prompt_metrics": prompt_metrics,
         "system_card_bytes": prompt_metrics["system_card_bytes"],
@@ -0,0 +1,192 @@
+"""Output formats for synthesized speech: raw PCM, WAV, FLAC and Opus in Ogg.
+
+Piper produces 16-bit mono PCM; WAV is wrapped in memory and the compressed
+formats go through a local encoder process (``ffmpeg``, else the ``flac`` /
+``opusenc`` command-line tools), so encoding never blocks the event loop.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import io
+import os
+import shutil
+import wave
+from typing import Dict, List, Optional, Sequence
+
+from .errors import ServiceUnavailableError
+
+DEFAULT_FORMAT = os.getenv("AIOS_TTS_FORMAT", "wav").strip().lower() or "wav"
+OPUS_KBPS = int(os.getenv("AIOS_TTS_OPUS_KBPS", "24") or "24")
+ENCODE_TIMEOUT_SECONDS = 30.0
+
+FORMATS = ("pcm", "wav", "flac", "opus")
+COMPRESSED = ("flac", "opus")
+_MEDIA_TYPES = {
+    "wav": "audio/wav",
+    "flac": "audio/flac",
+    "opus": "audio/ogg; codecs=opus",
+}
+_ACCEPT_ALIASES = {
+    "audio/wav": "wav",
+    "audio/x-wav": "wav",
+    "audio/wave": "wav",
+    "audio/flac": "flac",
+    "audio/x-flac": "flac",
+    "audio/ogg": "opus",
+    "audio/opus": "opus",
+    "audio/pcm": "pcm",
+}
+
+
+class UnsupportedFormatError(ValueError):
+    """The requested audio format is unknown or has no encoder installed."""
+
+
+def wav_bytes(pcm: bytes, sample_rate: int) -> bytes:
+    """Wrap 16-bit mono PCM in a WAV header, in memory."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(sample_rate)
+        out.writeframes(pcm)
+    return buffer.getvalue()
+
+
+def _encoder_command(fmt: str, sample_rate: int) -> Optional[List[str]]:
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg:
+        source = [ffmpeg, "-hide_banner", "-loglevel", "error", "-f", "s16le", "-ar", str(sample_rate), "-ac", "1"]
+        if fmt == "flac":
+            return [*source, "-i", "pipe:0", "-c:a", "flac", "-f", "flac", "pipe:1"]
+        return [
+            *source,
+            "-i",
+            "pipe:0",
+            "-c:a",
+            "libopus",
+            "-b:a",
+            f"{OPUS_KBPS}k",
+            "-application",
+            "voip",
+            "-f",
+            "ogg",
+            "pipe:1",
+        ]
+    if fmt == "flac" and shutil.which("flac"):
+        return [
+            "flac",
+            "--silent",
+            "--force-raw-format",
+            "--endian=little",
+            "--sign=signed",
+            "--channels=1",
+            "--bps=16",
+            f"--sample-rate={sample_rate}",
+            "--stdout",
+            "-",
+        ]
+    if fmt == "opus" and shutil.which("opusenc"):
+        return [
+            "opusenc",
+            "--quiet",
+            "--raw",
+            f"--raw-rate={sample_rate}",
+            "--raw-chan=1",
+            "--raw-bits=16",
+            "--bitrate",
+            str(OPUS_KBPS),
+            "--speech",
+            "-",
+            "-",
+        ]
+    return None
+
+
+def available() -> List[str]:
+    return [fmt for fmt in FORMATS if fmt not in COMPRESSED or _encoder_command(fmt, 22050)]
+
+
+def media_type(fmt: str, sample_rate: Optional[int] = None) -> str:
+    if fmt == "pcm":
+        # Little-endian, unlike RFC 2586 audio/L16.
+        return f"audio/pcm; encoding=s16le; channels=1; rate={sample_rate or 0}"
+    return _MEDIA_TYPES[fmt]
+
+
+def _parse_accept(accept: str) -> List[tuple]:
+    ranked = []
+    for position, item in enumerate(accept.split(",")):
+        parts = [part.strip() for part in item.split(";")]
+        mime = parts[0].lower()
+        quality = 1.0
+        for param in parts[1:]:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        ranked.append((-quality, position, mime))
+    ranked.sort()
+    return [(mime, -neg_q) for neg_q, _, mime in ranked]
+
+
+def negotiate(query: Optional[str], accept: Optional[str], default: str = DEFAULT_FORMAT) -> str:
+    """Pick the output format: an explicit ``?format=`` wins, then the best ``Accept`` match.
+
+    Raises ``UnsupportedFormatError`` for an unknown or unencodable ``?format=``.
+    Accept entries this backend cannot produce are skipped.
+    """
+    usable: Sequence[str] = available()
+    if query:
+        fmt = query.strip().lower()
+        if fmt not in FORMATS:
+            raise UnsupportedFormatError(f"unknown audio format '{fmt}' (choose from {', '.join(FORMATS)})")
+        if fmt not in usable:
+            raise UnsupportedFormatError(f"no local encoder for '{fmt}' (install ffmpeg, flac or opus-tools)")
+        return fmt
+    for mime, quality in _parse_accept(accept or ""):
+        if quality <= 0:
+            continue
+        fmt = _ACCEPT_ALIASES.get(mime)
+        if fmt in usable:
+            return fmt
+        if mime in ("*/*", "audio/*"):
+            break
+    return default if default in usable else "wav"
+
+
+async def encode(pcm: bytes, sample_rate: int, fmt: str) -> bytes:
+    """``pcm`` (16-bit mono) in ``fmt``; compressed formats run in an encoder subprocess."""
+    if fmt == "pcm":
+        return pcm
+    if fmt == "wav":
+        return wav_bytes(pcm, sample_rate)
+    command = _encoder_command(fmt, sample_rate)
+    if command is None:
+        raise UnsupportedFormatError(f"no local encoder for '{fmt}'")
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        data, stderr = await asyncio.wait_for(process.communicate(pcm), ENCODE_TIMEOUT_SECONDS)
+    except FileNotFoundError as exc:
+        raise ServiceUnavailableError(f"{fmt} encoder not found") from exc
+    except asyncio.TimeoutError as exc:
+        process.kill()
+        # Reap the encoder so it does not linger as a zombie with its pipes open.
+        await process.wait()
+        raise ServiceUnavailableError(f"{fmt} encoding timed out") from exc
+    if process.returncode != 0 or not data:
+        raise ServiceUnavailableError(
+            f"{fmt} encoder failed with code {process.returncode}: {stderr.decode('utf-8', 'ignore')[:400]}"
+        )
+    return data
+
+
+def snapshot() -> Dict[str, object]:
+    return {"default": DEFAULT_FORMAT, "available": available(), "opus_kbps": OPUS_KBPS}
@@ -0,0 +1 @@
+"""Offline benchmarks that run against a local Ollama stand-in."""
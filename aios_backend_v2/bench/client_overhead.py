@@ -0,0 +1,73 @@
+"""Per-turn client overhead: fresh httpx client per call vs the pooled Ollama client.
+
+Usage: python -m aios_backend_v2.bench.client_overhead [--turns 200]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import Dict, List
+
+import httpx
+
+from .. import llm, ollama_client
+from .stub_ollama import StubServer
+
+MESSAGES = [{"role": "user", "content": "open firefox"}]
+
+
+def _summary(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "mean_ms": round(statistics.fmean(ordered), 3),
+        "p50_ms": round(ordered[len(ordered) // 2], 3),
+        "p95_ms": round(ordered[int(len(ordered) * 0.95) - 1], 3),
+    }
+
+
+async def _fresh_client_turn(url: str) -> None:
+    # Mirrors the previous llm.generate(): one AsyncClient per turn.
+    async with httpx.AsyncClient() as client:
+        response = await client.post(
+            f"{url}/api/chat",
+            json={"model": llm.DEFAULT_MODEL, "messages": MESSAGES, "stream": False},
+            timeout=60.0,
+        )
+        response.raise_for_status()
+
+
+async def run(turns: int) -> Dict[str, Dict[str, float]]:
+    async with StubServer() as stub:
+        before: List[float] = []
+        for _ in range(turns):
+            start = time.perf_counter()
+            await _fresh_client_turn(stub.url)
+            before.append((time.perf_counter() - start) * 1000)
+
+        await ollama_client.startup(stub.url)
+        after: List[float] = []
+        try:
+            for _ in range(turns):
+                start = time.perf_counter()
+                await llm.generate(MESSAGES, model=llm.DEFAULT_MODEL)
+                after.append((time.perf_counter() - start) * 1000)
+            pool = ollama_client.pool_stats()
+        finally:
+            await ollama_client.shutdown()
+
+    return {"fresh_client": _summary(before), "pooled_client": _summary(after), "pool": pool}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=200)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.turns)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
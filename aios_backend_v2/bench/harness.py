@@ -0,0 +1,340 @@
+"""End-to-end latency of /chat, /chat/stream and /tts with Ollama and Piper replaced by stubs.
+
+Usage: python -m aios_backend_v2.bench.harness [--requests 40] [--concurrency 4] [--out bench.json]
+       python -m aios_backend_v2.bench.harness --url http://127.0.0.1:8000 [--chat-log PATH]
+       python -m aios_backend_v2.bench.harness --compare before.json after.json
+
+In-process runs start the stub Ollama server and a ``piper`` shim, point a
+scratch ``AIOS_DATA_DIR`` at a temporary directory and serve the FastAPI app
+on a local port, so streamed events are timed as they arrive. With ``--url``
+a running backend is driven instead; it must already be using a stub
+(``python -m aios_backend_v2.bench.stub_ollama``) for the numbers to be
+comparable. Per-stage timings come from the turns the backend
+appended to ``chat_turns.ndjson`` during the run.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import statistics
+import subprocess
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from .stub_ollama import LocalServer, StubConfig, StubServer
+from .stub_piper import install_shim
+
+UTTERANCES = [
+    "hi there",
+    "what can you do",
+    "what time is it",
+    "open firefox",
+    "tell me a joke about linux",
+    "compare btrfs and ext4 for a laptop",
+    "how much disk space do I have",
+    "remember that my favourite editor is helix",
+]
+TTS_TEXTS = ["Opening Firefox.", "It is half past three.", "Sure, I can help with that."]
+STAGE_FIELDS = (
+    "intent_parse_ms",
+    "prompt_ms",
+    "queue_wait_ms",
+    "gen_ttft_ms",
+    "generate_ms",
+    "tool_ms",
+    "latency_ms",
+)
+
+
+def percentiles(samples: List[float]) -> Dict[str, Any]:
+    """Count, mean and nearest-rank p50/p95/p99 in milliseconds."""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def rank(q: float) -> float:
+        return round(ordered[max(0, math.ceil(q * len(ordered)) - 1)], 2)
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered), 2),
+        "p50_ms": rank(0.50),
+        "p95_ms": rank(0.95),
+        "p99_ms": rank(0.99),
+    }
+
+
+class EndpointStats:
+    def __init__(self) -> None:
+        self.latency: List[float] = []
+        self.ttft: List[float] = []
+        self.errors: Dict[str, int] = {}
+
+    def error(self, kind: str) -> None:
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def summary(self) -> Dict[str, Any]:
+        total = len(self.latency) + sum(self.errors.values())
+        data: Dict[str, Any] = {
+            "requests": total,
+            "errors": dict(self.errors),
+            "error_rate": round(sum(self.errors.values()) / total, 4) if total else 0.0,
+            "latency": percentiles(self.latency),
+        }
+        if self.ttft:
+            data["ttft"] = percentiles(self.ttft)
+        return data
+
+
+def _chat_body(text: str) -> Dict[str, Any]:
+    return {"messages": [{"role": "user", "content": text}]}
+
+
+async def chat_once(client: httpx.AsyncClient, text: str, stats: EndpointStats) -> None:
+    start = time.perf_counter()
+    try:
+        response = await client.post("/chat", json=_chat_body(text))
+    except httpx.HTTPError as exc:
+        stats.error(type(exc).__name__)
+        return
+    if response.status_code != 200:
+        stats.error(str(response.status_code))
+        return
+    stats.latency.append((time.perf_counter() - start) * 1000)
+
+
+async def chat_stream_once(client: httpx.AsyncClient, text: str, stats: EndpointStats) -> None:
+    """TTFT is the first ``token`` event, or the ``final`` event for turns that stream no text."""
+    start = time.perf_counter()
+    first: Optional[float] = None
+    event = ""
+    try:
+        async with client.stream("POST", "/chat/stream", json=_chat_body(text)) as response:
+            if response.status_code != 200:
+                stats.error(str(response.status_code))
+                return
+            async for line in response.aiter_lines():
+                if line.startswith("event: "):
+                    event = line[len("event: ") :]
+                    if event in ("token", "final") and first is None:
+                        first = time.perf_counter()
+                    if event == "error":
+                        stats.error("stream_error")
+                        return
+    except httpx.HTTPError as exc:
+        stats.error(type(exc).__name__)
+        return
+    end = time.perf_counter()
+    stats.latency.append((end - start) * 1000)
+    stats.ttft.append(((first or end) - start) * 1000)
+
+
+async def tts_once(client: httpx.AsyncClient, text: str, stats: EndpointStats) -> None:
+    start = time.perf_counter()
+    try:
+        response = await client.post("/tts", json={"text": text})
+    except httpx.HTTPError as exc:
+        stats.error(type(exc).__name__)
+        return
+    if response.status_code != 200:
+        stats.error(str(response.status_code))
+        return
+    stats.latency.append((time.perf_counter() - start) * 1000)
+
+
+async def drive(
+    requests: int,
+    concurrency: int,
+    call: Callable[[int], Awaitable[None]],
+) -> float:
+    """Run ``call(i)`` for ``i`` in ``range(requests)`` with at most ``concurrency`` in flight; returns seconds."""
+    counter = iter(range(requests))
+
+    async def worker() -> None:
+        for idx in counter:
+            await call(idx)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    return time.perf_counter() - start
+
+
+def read_stages(path: Optional[Path], offset: int = 0) -> Dict[str, Dict[str, Any]]:
+    """Percentiles of the per-stage timings logged after byte ``offset`` of ``chat_turns.ndjson``."""
+    samples: Dict[str, List[float]] = {name: [] for name in STAGE_FIELDS}
+    if path is None or not path.exists():
+        return {}
+    with path.open("rb") as fh:
+        fh.seek(offset)
+        for raw in fh:
+            try:
+                turn = json.loads(raw)
+            except ValueError:
+                continue
+            for name in STAGE_FIELDS:
+                value = turn.get(name)
+                if isinstance(value, (int, float)):
+                    samples[name].append(float(value))
+    return {name: percentiles(values) for name, values in samples.items() if values}
+
+
+@asynccontextmanager
+async def in_process_backend(
+    config: StubConfig,
+    workdir: Path,
+    env: Optional[Dict[str, str]] = None,
+) -> AsyncIterator[Tuple[httpx.AsyncClient, Path]]:
+    """The FastAPI app on a local port, backed by the stub Ollama server and the Piper shim.
+
+    The data, log, database and LTM paths all point into ``workdir`` so a run never touches the
+    developer's own store; ``env`` is applied last. Environment is set before the app is imported
+    and the app's lifespan runs, so call this once per process.
+    """
+    voice = install_shim(workdir / "bin")
+    data_dir = workdir / "data"
+    os.environ["AIOS_DATA_DIR"] = str(data_dir)
+    os.environ["AIOS_LOG_DIR"] = str(data_dir / "logs")
+    os.environ["AIOS_DB_PATH"] = str(data_dir / "aios.db")
+    os.environ["AIOS_LTM_STORE"] = str(data_dir / "ltm")
+    os.environ["PATH"] = f"{workdir / 'bin'}{os.pathsep}{os.environ.get('PATH', '')}"
+    os.environ["PIPER_VOICE"] = str(voice)
+    os.environ.update(env or {})
+    async with StubServer(config) as stub:
+        os.environ["OLLAMA_URL"] = stub.url
+        from .. import logs
+        from ..app import app
+
+        async with LocalServer(app, lifespan="on") as server:
+            async with httpx.AsyncClient(base_url=server.url, timeout=120.0) as client:
+                yield client, Path(logs.CHAT_LOG_PATH)
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).resolve().parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except Exception:  # noqa: BLE001
+        return None
+
+
+async def run_suite(client: httpx.AsyncClient, args: argparse.Namespace, chat_log: Optional[Path]) -> Dict[str, Any]:
+    offset = chat_log.stat().st_size if chat_log and chat_log.exists() else 0
+    endpoints = {"chat": EndpointStats(), "chat_stream": EndpointStats(), "tts": EndpointStats()}
+    durations: Dict[str, float] = {}
+
+    durations["chat"] = await drive(
+        args.requests,
+        args.concurrency,
+        lambda i: chat_once(client, UTTERANCES[i % len(UTTERANCES)], endpoints["chat"]),
+    )
+    durations["chat_stream"] = await drive(
+        args.requests,
+        args.concurrency,
+        lambda i: chat_stream_once(client, UTTERANCES[i % len(UTTERANCES)], endpoints["chat_stream"]),
+    )
+    durations["tts"] = await drive(
+        args.tts_requests,
+        args.concurrency,
+        lambda i: tts_once(client, TTS_TEXTS[i % len(TTS_TEXTS)], endpoints["tts"]),
+    )
+    results = {}
+    for name, stats in endpoints.items():
+        summary = stats.summary()
+        summary["throughput_rps"] = round(len(stats.latency) / durations[name], 2) if durations[name] else None
+        results[name] = summary
+    return {"endpoints": results, "stages": read_stages(chat_log, offset)}
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    meta = {
+        "revision": _git_revision(),
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "requests": args.requests,
+        "tts_requests": args.tts_requests,
+        "concurrency": args.concurrency,
+    }
+    if args.url:
+        chat_log = Path(args.chat_log) if args.chat_log else None
+        async with httpx.AsyncClient(base_url=args.url, timeout=120.0) as client:
+            return {"meta": {**meta, "url": args.url}, **await run_suite(client, args, chat_log)}
+
+    config = StubConfig(
+        first_token_ms=args.first_token_ms,
+        tokens_per_sec=args.tokens_per_sec,
+        reply=args.reply,
+        error_rate=args.error_rate,
+        drop_rate=args.drop_rate,
+        seed=args.seed,
+    )
+    meta["stub"] = {key: value for key, value in vars(config).items() if not isinstance(value, dict)}
+    with tempfile.TemporaryDirectory(prefix="aios-bench-") as tmp:
+        async with in_process_backend(config, Path(tmp)) as (client, chat_log):
+            return {"meta": meta, **await run_suite(client, args, chat_log)}
+
+
+def compare(before: Dict[str, Any], after: Dict[str, Any]) -> List[str]:
+    """One line per endpoint/stage percentile: before, after and the relative change."""
+    lines = [f"{before['meta'].get('revision')} -> {after['meta'].get('revision')}"]
+    sections = [("endpoints", name, "latency") for name in after.get("endpoints", {})]
+    sections += [("endpoints", name, "ttft") for name, data in after.get("endpoints", {}).items() if "ttft" in data]
+    sections += [("stages", name, None) for name in after.get("stages", {})]
+    for section, name, metric in sections:
+        old = before.get(section, {}).get(name, {})
+        new = after[section][name]
+        if metric:
+            old, new = old.get(metric, {}), new.get(metric, {})
+        label = f"{name}.{metric}" if metric else f"stage.{name}"
+        for q in ("p50_ms", "p95_ms", "p99_ms"):
+            if q not in new:
+                continue
+            prev = old.get(q)
+            delta = f"{(new[q] - prev) / prev * 100:+.1f}%" if prev else "n/a"
+            lines.append(f"{label:<28} {q:<7} {prev if prev is not None else '-':>10} {new[q]:>10} {delta:>8}")
+    return lines
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=40, help="requests per chat endpoint")
+    parser.add_argument("--tts-requests", type=int, default=12)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--first-token-ms", type=float, default=150.0)
+    parser.add_argument("--tokens-per-sec", type=float, default=40.0)
+    parser.add_argument("--reply", default="Sure, here is a short answer to that question.")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--url", help="drive a running backend instead of an in-process app")
+    parser.add_argument("--chat-log", help="chat_turns.ndjson of the --url backend, for stage timings")
+    parser.add_argument("--out", help="write the JSON results here")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    args = parser.parse_args()
+
+    if args.compare:
+        before, after = (json.loads(Path(path).read_text(encoding="utf-8")) for path in args.compare)
+        print("\n".join(compare(before, after)))
+        return
+    results = asyncio.run(run(args))
+    blob = json.dumps(results, indent=2, sort_keys=True)
+    if args.out:
+        Path(args.out).write_text(blob + "\n", encoding="utf-8")
+    print(blob)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""Concurrent load test: replay the logged utterance mix against /chat, /chat/stream and /tts.
+
+Usage: python -m aios_backend_v2.bench.load_test [--ramp 1,2,4,8] [--step-seconds 10] [--out load.json]
+       python -m aios_backend_v2.bench.load_test --url http://127.0.0.1:8000 [--log PATH]
+
+Utterances are sampled with their logged frequency from ``chat_turns.ndjson``
+(``--log``; the built-in harness utterances when it is missing). Each ramp step
+runs that many virtual clients for ``--step-seconds``; every client picks an
+endpoint by ``--stream-share``/``--tts-share`` and an utterance, sends it and
+loops. Without ``--url`` the app runs in-process against the stub Ollama server
+and the piper shim (see ``bench.harness``). Event-loop lag is read from the
+backend's ``/health`` (``AIOS_LOOP_LAG_MONITOR=on``) at the end of each step.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import collections
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import httpx
+
+from .harness import UTTERANCES, EndpointStats, chat_once, chat_stream_once, in_process_backend, tts_once
+from .stub_ollama import StubConfig
+
+DEFAULT_LOG = Path(__file__).resolve().parents[2] / "var" / "aios" / "logs" / "chat_turns.ndjson"
+
+
+def load_mix(path: Path, limit: int = 200) -> List[Tuple[str, int]]:
+    """``(utterance, count)`` for the ``limit`` most frequent logged user texts."""
+    counts: collections.Counter = collections.Counter()
+    if path.exists():
+        with path.open("r", encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    text = (json.loads(line).get("user_text") or "").strip()
+                except ValueError:
+                    continue
+                if text:
+                    counts[text] += 1
+    return counts.most_common(limit)
+
+
+async def _client_loop(
+    client: httpx.AsyncClient,
+    texts: List[str],
+    weights: List[int],
+    args: argparse.Namespace,
+    rng: random.Random,
+    deadline: float,
+    endpoints: Dict[str, EndpointStats],
+) -> None:
+    while time.perf_counter() < deadline:
+        text = rng.choices(texts, weights)[0]
+        roll = rng.random()
+        if roll < args.tts_share:
+            await tts_once(client, text[:200], endpoints["tts"])
+        elif roll < args.tts_share + args.stream_share:
+            await chat_stream_once(client, text, endpoints["chat_stream"])
+        else:
+            await chat_once(client, text, endpoints["chat"])
+
+
+async def _health(client: httpx.AsyncClient) -> Dict[str, Any]:
+    try:
+        response = await client.get("/health")
+        return response.json() if response.status_code == 200 else {}
+    except (httpx.HTTPError, ValueError):
+        return {}
+
+
+async def run_step(
+    client: httpx.AsyncClient,
+    mix: List[Tuple[str, int]],
+    concurrency: int,
+    args: argparse.Namespace,
+    rng: random.Random,
+) -> Dict[str, Any]:
+    texts = [text for text, _ in mix]
+    weights = [count for _, count in mix]
+    endpoints = {"chat": EndpointStats(), "chat_stream": EndpointStats(), "tts": EndpointStats()}
+    start = time.perf_counter()
+    deadline = start + args.step_seconds
+    seeds = [rng.random() for _ in range(concurrency)]
+    await asyncio.gather(
+        *(
+            _client_loop(client, texts, weights, args, random.Random(seed), deadline, endpoints)
+            for seed in seeds
+        )
+    )
+    elapsed = time.perf_counter() - start
+    health = await _health(client)
+    results: Dict[str, Any] = {}
+    completed = errors = 0
+    for name, stats in endpoints.items():
+        summary = stats.summary()
+        if not summary["requests"]:
+            continue
+        summary["throughput_rps"] = round(len(stats.latency) / elapsed, 2)
+        results[name] = summary
+        completed += len(stats.latency)
+        errors += sum(stats.errors.values())
+    return {
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 2),
+        "throughput_rps": round(completed / elapsed, 2),
+        "error_rate": round(errors / (completed + errors), 4) if completed + errors else 0.0,
+        "endpoints": results,
+        "event_loop": health.get("event_loop", {}),
+        "admission": health.get("admission", {}),
+    }
+
+
+async def run_ramp(
+    client: httpx.AsyncClient, mix: List[Tuple[str, int]], args: argparse.Namespace
+) -> List[Dict[str, Any]]:
+    rng = random.Random(args.seed)
+    steps = []
+    for concurrency in args.ramp:
+        step = await run_step(client, mix, concurrency, args, rng)
+        steps.append(step)
+        print(
+            f"c={concurrency:<3} {step['throughput_rps']:>7} rps  errors {step['error_rate']:.2%}  "
+            f"loop p99 {step['event_loop'].get('p99_ms', '-')} ms",
+            flush=True,
+        )
+    return steps
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    log_path = Path(args.log) if args.log else DEFAULT_LOG
+    mix = load_mix(log_path)
+    meta: Dict[str, Any] = {
+        "log": str(log_path),
+        "utterances": len(mix),
+        "ramp": args.ramp,
+        "step_seconds": args.step_seconds,
+        "stream_share": args.stream_share,
+        "tts_share": args.tts_share,
+    }
+    if not mix:
+        mix = [(text, 1) for text in UTTERANCES]
+        meta["utterances"] = f"{len(mix)} (built-in, log empty)"
+
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=120.0) as client:
+            return {"meta": {**meta, "url": args.url}, "steps": await run_ramp(client, mix, args)}
+
+    config = StubConfig(first_token_ms=args.first_token_ms, tokens_per_sec=args.tokens_per_sec, seed=args.seed)
+    env = {"AIOS_LOOP_LAG_MONITOR": "on", "AIOS_LOOP_LAG_WINDOW_S": str(args.step_seconds)}
+    with tempfile.TemporaryDirectory(prefix="aios-load-") as tmp:
+        async with in_process_backend(config, Path(tmp), env) as (client, _):
+            steps = await run_ramp(client, mix, args)
+    meta["stub"] = {"first_token_ms": args.first_token_ms, "tokens_per_sec": args.tokens_per_sec}
+    return {"meta": meta, "steps": steps}
+
+
+def _ramp(value: str) -> List[int]:
+    return [int(part) for part in value.split(",") if part.strip()]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--log", help=f"chat_turns.ndjson to sample utterances from (default {DEFAULT_LOG})")
+    parser.add_argument("--ramp", type=_ramp, default=[1, 2, 4, 8])
+    parser.add_argument("--step-seconds", type=float, default=10.0)
+    parser.add_argument("--stream-share", type=float, default=0.3)
+    parser.add_argument("--tts-share", type=float, default=0.1)
+    parser.add_argument("--first-token-ms", type=float, default=150.0)
+    parser.add_argument("--tokens-per-sec", type=float, default=40.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--url", help="load a running backend instead of an in-process app")
+    parser.add_argument("--out", help="write the JSON results here")
+    args = parser.parse_args()
+    results = asyncio.run(run(args))
+    blob = json.dumps(results, indent=2, sort_keys=True)
+    if args.out:
+        Path(args.out).write_text(blob + "\n", encoding="utf-8")
+    else:
+        print(blob)
+
+
+if __name__ == "__main__":
+    main()
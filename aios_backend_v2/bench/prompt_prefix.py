@@ -0,0 +1,128 @@
+"""Prefix reuse of the default vs prefix-stable prompt layouts.
+
+Builds a scripted conversation with the real assembler in each layout and sends
+it to the stub, which charges prompt-eval time only for bytes past the prefix
+shared with the previous prompt (the way Ollama reuses its KV cache).
+
+Usage: python -m aios_backend_v2.bench.prompt_prefix [--turns 40] [--ms-per-kb 40]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import Any, Dict, List
+
+from .. import llm, ollama_client
+from ..context import RequestContext, build_prompt, common_prefix_bytes
+from ..context.assembler import LAYOUT_DEFAULT, LAYOUT_PREFIX_STABLE
+from ..prompt import SYSTEM_PERSONA, tool_catalog
+from ..tools.registry import list_tools
+from .stub_ollama import StubConfig, StubServer
+
+UTTERANCES = [
+    "open firefox",
+    "what time is it",
+    "set volume to 40",
+    "is vlc installed",
+    "tell me a joke",
+    "open the terminal",
+    "what did I just open",
+    "search for a markdown editor",
+]
+POLICY_TEXT = (
+    "Use only the allowed tools. Reply with a single JSON tool_call when acting; "
+    "otherwise answer in plain text. Never invent tool names or arguments."
+)
+
+
+class _ScriptedSTM:
+    def __init__(self) -> None:
+        self.turns: List[str] = []
+
+    def get_summary(self, _clamp: bool) -> Dict[str, Any]:
+        return {"summary": " | ".join(self.turns[-4:]), "clamped": False}
+
+
+def _context(layout: str, turn: int, stm: _ScriptedSTM, tools: List[Dict[str, Any]]) -> RequestContext:
+    text = UTTERANCES[turn % len(UTTERANCES)]
+    # Tool-bearing and chat-only turns alternate, as the gate does in practice.
+    allowed = tools if turn % 3 else []
+    recent = [UTTERANCES[(turn - i) % len(UTTERANCES)].split()[-1] for i in range(1, 3)]
+    return RequestContext(
+        latest_user_text=text,
+        allowed_tools=allowed,
+        tool_catalog=tool_catalog,
+        policy_text=POLICY_TEXT,
+        system_persona=SYSTEM_PERSONA,
+        user_profile={"name": "bench", "tone": "dry"},
+        short_term=stm,
+        memory_store=None,
+        system_card_enabled=True,
+        get_system_card=lambda: {"os": {"name": "Ubuntu 24.04"}, "recent_launches": recent},
+        persona_enabled=False,
+        get_persona_card=lambda *_: {},
+        memory_ltm_enabled=False,
+        ltm_store=None,
+        ltm_k=0,
+        ltm_bytes_cap=800,
+        redact_fn=lambda s: s,
+        redact_string_fn=lambda s: s,
+        scene_state={"last_action": text, "turn": turn},
+        layout=layout,
+    )
+
+
+async def _run_layout(layout: str, turns: int, tools: List[Dict[str, Any]]) -> Dict[str, Any]:
+    stm = _ScriptedSTM()
+    previous = ""
+    prefix_ratios: List[float] = []
+    latencies: List[float] = []
+    for turn in range(turns):
+        bundle = build_prompt(_context(layout, turn, stm, tools))
+        system_message = bundle.messages[0]["content"]
+        prefix = common_prefix_bytes(previous, system_message)
+        previous = system_message
+        if turn:
+            prefix_ratios.append(prefix / len(system_message.encode("utf-8")))
+        messages = bundle.messages + [{"role": "user", "content": UTTERANCES[turn % len(UTTERANCES)]}]
+        start = time.perf_counter()
+        await llm.generate(messages, model=llm.DEFAULT_MODEL)
+        if turn:
+            latencies.append((time.perf_counter() - start) * 1000)
+        stm.turns.append(UTTERANCES[turn % len(UTTERANCES)])
+    ordered = sorted(latencies)
+    return {
+        "prefix_match_ratio_mean": round(statistics.fmean(prefix_ratios), 3),
+        "latency_mean_ms": round(statistics.fmean(ordered), 2),
+        "latency_p95_ms": round(ordered[int(len(ordered) * 0.95) - 1], 2),
+    }
+
+
+async def run(turns: int, ms_per_kb: float) -> Dict[str, Any]:
+    tools = list_tools()
+    results: Dict[str, Any] = {"turns": turns, "prompt_ms_per_kb": ms_per_kb}
+    for layout in (LAYOUT_DEFAULT, LAYOUT_PREFIX_STABLE):
+        # A fresh stub per layout so the simulated KV cache starts cold.
+        async with StubServer(StubConfig(prompt_ms_per_kb=ms_per_kb)) as stub:
+            await ollama_client.startup(stub.url)
+            try:
+                results[layout] = await _run_layout(layout, turns, tools)
+            finally:
+                await ollama_client.shutdown()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--ms-per-kb", type=float, default=40.0)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.turns, args.ms_per_kb)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""Prompt tokens and tool-call accuracy of the full vs compact assembler profiles on logged turns.
+
+Usage: python -m aios_backend_v2.bench.prompt_profiles [--log PATH] [--limit 80] [--tokens-only] [--out profiles.json]
+       OLLAMA_URL=http://127.0.0.1:11434 python -m aios_backend_v2.bench.prompt_profiles --model llama3.2:3b
+
+Cases are the distinct ``(user_text, schemas_sent)`` pairs in ``chat_turns.ndjson``.
+Each is assembled by the real assembler in both profiles with the tools that turn
+was shown, and counted with the model's token counter. Unless ``--tokens-only``,
+the prompt is sent to Ollama and the reply parsed the way /chat parses it. Cases
+that were shown tools are labelled with the tool the turn executed, or with no
+tool when it ended as a text reply; tool errors and missing tools stay unlabelled
+and only count towards token totals.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .. import llm, ollama_client
+from ..context import RequestContext, build_prompt
+from ..context.assembler import PROFILE_COMPACT, PROFILE_FULL
+from ..context.tokens import TokenCounter, counter_for
+from ..prompt import SYSTEM_PERSONA, tool_catalog
+from ..tools.registry import list_tools, registry_version
+from .load_test import DEFAULT_LOG
+
+LABELLED_TYPES = {"executed_tool", "text_reply"}
+
+
+def load_cases(path: Path, limit: int) -> List[Dict[str, Any]]:
+    """One case per distinct ``(user_text, schemas_sent)``, in first-seen order."""
+    cases: Dict[Tuple[str, Tuple[str, ...]], Dict[str, Any]] = {}
+    if not path.exists():
+        return []
+    with path.open("r", encoding="utf-8") as fh:
+        for line in fh:
+            try:
+                turn = json.loads(line)
+            except ValueError:
+                continue
+            text = (turn.get("user_text") or "").strip()
+            tools = tuple(sorted(turn.get("schemas_sent") or []))
+            if not text or (text, tools) in cases:
+                continue
+            response_type = turn.get("response_type")
+            labelled = bool(tools) and response_type in LABELLED_TYPES
+            cases[(text, tools)] = {
+                "text": text,
+                "tools": list(tools),
+                "labelled": labelled,
+                "expect": turn.get("executed_tool") if response_type == "executed_tool" else None,
+            }
+    return list(cases.values())[:limit]
+
+
+def _context(case: Dict[str, Any], profile: str, tools: List[Dict[str, Any]], policy_text: str, counter: TokenCounter):
+    return RequestContext(
+        latest_user_text=case["text"],
+        allowed_tools=[tool for tool in tools if tool["name"] in case["tools"]],
+        tool_catalog=tool_catalog,
+        policy_text=policy_text,
+        system_persona=SYSTEM_PERSONA,
+        user_profile={},
+        short_term=None,
+        memory_store=None,
+        system_card_enabled=False,
+        get_system_card=lambda: {},
+        persona_enabled=False,
+        get_persona_card=lambda *_: {},
+        memory_ltm_enabled=False,
+        ltm_store=None,
+        ltm_k=0,
+        ltm_bytes_cap=800,
+        redact_fn=lambda s: s,
+        redact_string_fn=lambda s: s,
+        token_counter=counter,
+        tools_version=registry_version(),
+        profile=profile,
+    )
+
+
+def parse_tool_call(reply: str) -> Tuple[bool, Optional[str]]:
+    """``(valid_json, tool name)`` for a reply, using the same strict parse as /chat."""
+    try:
+        parsed = json.loads(reply)
+    except ValueError:
+        return False, None
+    if isinstance(parsed, dict) and isinstance(parsed.get("tool_call"), dict):
+        return True, parsed["tool_call"].get("name")
+    return True, None
+
+
+async def run_profile(
+    profile: str,
+    cases: List[Dict[str, Any]],
+    model: str,
+    counter: TokenCounter,
+    tokens_only: bool,
+) -> Dict[str, Any]:
+    from ..app import AIOS_POLICY_TEXT
+
+    tools = list_tools()
+    prompt_tokens: List[int] = []
+    section_tokens: Dict[str, List[int]] = {"tools": [], "behavior": []}
+    latencies: List[float] = []
+    scored = correct = tool_cases = tool_correct = valid_json = errors = 0
+    misses: List[Dict[str, Any]] = []
+    for case in cases:
+        bundle = build_prompt(_context(case, profile, tools, AIOS_POLICY_TEXT, counter))
+        prompt_tokens.append(bundle.metrics["prompt_tokens"])
+        for name in section_tokens:
+            section_tokens[name].append(bundle.metrics["tokens"][name])
+        if tokens_only or not case["labelled"]:
+            continue
+        messages = bundle.messages + [{"role": "user", "content": case["text"]}]
+        start = time.perf_counter()
+        try:
+            reply = await llm.generate(messages, model=model, temperature=0.2)
+        except Exception as exc:  # noqa: BLE001
+            errors += 1
+            misses.append({"text": case["text"], "error": str(exc)})
+            continue
+        latencies.append((time.perf_counter() - start) * 1000)
+        is_json, called = parse_tool_call(reply.strip())
+        scored += 1
+        if case["expect"]:
+            tool_cases += 1
+            valid_json += is_json
+        if called == case["expect"]:
+            correct += 1
+            tool_correct += bool(case["expect"])
+        elif len(misses) < 20:
+            misses.append({"text": case["text"], "expect": case["expect"], "got": called, "reply": reply[:200]})
+
+    result: Dict[str, Any] = {
+        "prompt_tokens_mean": round(statistics.fmean(prompt_tokens), 1) if prompt_tokens else 0,
+        "prompt_tokens_total": sum(prompt_tokens),
+        "section_tokens_mean": {
+            name: round(statistics.fmean(values), 1) if values else 0 for name, values in section_tokens.items()
+        },
+    }
+    if not tokens_only:
+        result.update(
+            {
+                "scored": scored,
+                "errors": errors,
+                "accuracy": round(correct / scored, 3) if scored else None,
+                "tool_call_accuracy": round(tool_correct / tool_cases, 3) if tool_cases else None,
+                "valid_json_rate": round(valid_json / tool_cases, 3) if tool_cases else None,
+                "latency_mean_ms": round(statistics.fmean(latencies), 1) if latencies else None,
+                "misses": misses,
+            }
+        )
+    return result
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    log_path = Path(args.log) if args.log else DEFAULT_LOG
+    cases = load_cases(log_path, args.limit)
+    counter = counter_for(args.model)
+    report: Dict[str, Any] = {
+        "log": str(log_path),
+        "cases": len(cases),
+        "labelled": sum(1 for case in cases if case["labelled"]),
+        "model": args.model,
+        "token_counter": counter.name,
+    }
+    if not args.tokens_only:
+        await ollama_client.startup()
+    try:
+        for profile in (PROFILE_FULL, PROFILE_COMPACT):
+            report[profile] = await run_profile(profile, cases, args.model, counter, args.tokens_only)
+    finally:
+        if not args.tokens_only:
+            await ollama_client.shutdown()
+    full, compact = report[PROFILE_FULL], report[PROFILE_COMPACT]
+    if full["prompt_tokens_total"]:
+        report["token_reduction"] = round(1 - compact["prompt_tokens_total"] / full["prompt_tokens_total"], 3)
+    return report
+
+
+def _print(report: Dict[str, Any]) -> None:
+    print(f"{report['cases']} cases ({report['labelled']} labelled), {report['model']}, {report['token_counter']}")
+    for profile in (PROFILE_FULL, PROFILE_COMPACT):
+        row = report[profile]
+        line = (
+            f"{profile:<8} prompt {row['prompt_tokens_mean']:>7} tok  tools {row['section_tokens_mean']['tools']:>7}"
+            f"  rules {row['section_tokens_mean']['behavior']:>6}"
+        )
+        if "accuracy" in row:
+            line += f"  accuracy {row['accuracy']}  tool calls {row['tool_call_accuracy']}  errors {row['errors']}"
+        print(line)
+    if "token_reduction" in report:
+        print(f"compact saves {report['token_reduction']:.1%} of prompt tokens")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--log", help=f"chat_turns.ndjson to take cases from (default {DEFAULT_LOG})")
+    parser.add_argument("--limit", type=int, default=80)
+    parser.add_argument("--model", default=llm.DEFAULT_MODEL)
+    parser.add_argument("--tokens-only", action="store_true", help="count tokens without calling Ollama")
+    parser.add_argument("--out", help="write the JSON report here")
+    args = parser.parse_args()
+    report = asyncio.run(run(args))
+    _print(report)
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Replay chat_turns.ndjson through the heuristic and the learned latency router.
+
+The learned model is trained online in log order: each turn is routed with what
+was known before it, then its observed generation time is added. Generation time
+is ``latency_router.generation_ms_of``, the quantity the router learns and predicts
+(``generate_ms``, not whole-turn latency). Only the model that actually served a
+turn has a real time, so the comparison reports predicted p95 against the budget
+for both routers plus observed generation time where the router agreed with the
+logged model.
+
+Usage: python -m aios_backend_v2.bench.router_replay [--log PATH] [--budget 900]
+"""
+
+from __future__ import annotations
+
+import argparse
+import collections
+import json
+from typing import Any, Dict, List, Optional
+
+from .. import latency_router
+from ..llm_router import REGISTRY, _select_tier
+
+
+def _messages(record: Dict[str, Any]) -> List[Dict[str, str]]:
+    user_text = record.get("user_text") or ""
+    system_size = max(0, latency_router.prompt_bytes_of(record) - len(user_text.encode("utf-8")))
+    return [{"role": "system", "content": " " * system_size}, {"role": "user", "content": user_text}]
+
+
+def _tally() -> Dict[str, Any]:
+    return {
+        "turns": 0,
+        "predicted_within_budget": 0,
+        "predicted_unknown": 0,
+        "agreed_with_log": 0,
+        "observed_within_budget": 0,
+        "tiers": collections.Counter(),
+    }
+
+
+def _score(
+    tally: Dict[str, Any],
+    model: str,
+    record: Dict[str, Any],
+    kind: str,
+    observed_ms: float,
+    budget: float,
+    latency_model: latency_router.LatencyModel,
+) -> None:
+    tally["turns"] += 1
+    tally["tiers"][model] += 1
+    p95 = latency_model.percentile(model, kind, latency_router.prompt_bytes_of(record), 0.95)
+    if p95 is None:
+        tally["predicted_unknown"] += 1
+    elif p95 <= budget:
+        tally["predicted_within_budget"] += 1
+    logged_model = record.get("model_used") or record.get("model")
+    if model == logged_model:
+        tally["agreed_with_log"] += 1
+        if observed_ms <= budget:
+            tally["observed_within_budget"] += 1
+
+
+def replay(records: List[Dict[str, Any]], default_budget: float) -> Dict[str, Any]:
+    latency_model = latency_router.LatencyModel()
+    heuristic = _tally()
+    learned = _tally()
+    learned_fallbacks = 0
+    candidates = [REGISTRY[tier].name for tier in ("deep", "mid", "fast")]
+    for record in records:
+        kind = latency_router.turn_kind(record.get("response_type"))
+        observed_ms = latency_router.generation_ms_of(record, kind)
+        if kind is None or observed_ms is None:
+            continue
+        budget: Optional[float] = record.get("latency_budget_ms") or default_budget
+        messages = _messages(record)
+        heuristic_model = REGISTRY[_select_tier(messages, int(budget))].name
+        learned_model = latency_model.choose(
+            candidates, kind, latency_router.prompt_bytes_of(record), budget
+        )
+        if learned_model is None:
+            learned_fallbacks += 1
+            learned_model = heuristic_model
+        _score(heuristic, heuristic_model, record, kind, observed_ms, budget, latency_model)
+        _score(learned, learned_model, record, kind, observed_ms, budget, latency_model)
+        latency_model.observe_record(record)
+
+    for tally in (heuristic, learned):
+        tally["tiers"] = dict(tally["tiers"])
+    learned["fell_back_to_heuristic"] = learned_fallbacks
+    return {"heuristic": heuristic, "learned": learned, "final_model": latency_model.snapshot()}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--log", default=latency_router.CHAT_LOG_PATH)
+    parser.add_argument("--budget", type=float, default=900.0, help="budget for turns that did not log one")
+    args = parser.parse_args()
+    records = latency_router.read_log(args.log, limit=None)
+    print(json.dumps(replay(records, args.budget), indent=2))
+
+
+if __name__ == "__main__":
+    main()
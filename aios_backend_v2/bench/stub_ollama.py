@@ -0,0 +1,222 @@
+"""Minimal Ollama-compatible HTTP server used by the offline benchmarks."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import random
+import re
+import socket
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+@dataclass
+class StubConfig:
+    first_token_ms: float = 0.0
+    tokens_per_sec: float = 0.0  # 0 = emit every token at once
+    reply: str = "Sure, done."
+    model_first_token_ms: Dict[str, float] = field(default_factory=dict)  # per-model override
+    model_status: Dict[str, int] = field(default_factory=dict)  # e.g. {"llama3:8b": 404}
+    load_ms: float = 0.0  # paid once by the first request to a model that is not loaded
+    prompt_ms_per_kb: float = 0.0  # prompt-eval cost for bytes not covered by the prefix cache
+    prefix_cache: bool = True  # reuse the prefix shared with the model's previous prompt
+    error_rate: float = 0.0  # fraction of /api/chat requests answered with HTTP 500
+    drop_rate: float = 0.0  # fraction of streamed replies cut off halfway
+    seed: Optional[int] = None  # makes injected failures reproducible
+
+    def first_token_delay(self, model: Optional[str]) -> float:
+        return self.model_first_token_ms.get(model or "", self.first_token_ms) / 1000
+
+
+def _tokens(text: str) -> List[str]:
+    return re.findall(r"\S+\s*|\s+", text) or [text]
+
+
+def _render_prompt(messages: List[Dict[str, Any]]) -> bytes:
+    return "".join(f"<|{m.get('role')}|>{m.get('content') or ''}" for m in messages).encode("utf-8")
+
+
+def create_app(config: StubConfig) -> FastAPI:
+    stub = FastAPI(title="Ollama stub")
+    loaded: Dict[str, float] = {}
+    last_prompt: Dict[str, bytes] = {}
+    rng = random.Random(config.seed)
+
+    async def eval_prompt(model: Optional[str], messages: List[Dict[str, Any]]) -> Dict[str, int]:
+        # Mimics the llama.cpp KV cache: only bytes past the shared prefix are re-evaluated.
+        prompt = _render_prompt(messages)
+        cached = 0
+        if config.prefix_cache and model in last_prompt:
+            cached = len(os.path.commonprefix([last_prompt[model], prompt]))
+        last_prompt[model or ""] = prompt
+        delay = (len(prompt) - cached) / 1024 * config.prompt_ms_per_kb / 1000
+        await asyncio.sleep(delay)
+        return {
+            "prompt_eval_count": len(prompt) - cached,
+            "prompt_eval_duration": int(delay * 1e9),
+            "prompt_cached_bytes": cached,
+        }
+
+    async def ensure_loaded(model: Optional[str]) -> None:
+        if model and model not in loaded:
+            await asyncio.sleep(config.load_ms / 1000)
+            loaded[model] = time.time()
+
+    @stub.get("/api/tags")
+    async def tags() -> Dict[str, Any]:
+        return {"models": []}
+
+    @stub.get("/api/ps")
+    async def ps() -> Dict[str, Any]:
+        return {"models": [{"name": name, "model": name, "size": 0, "size_vram": 0} for name in loaded]}
+
+    @stub.post("/api/generate")
+    async def generate(request: Request):
+        body = await request.json()
+        model = body.get("model")
+        status = config.model_status.get(model or "")
+        if status:
+            return JSONResponse({"error": f"model '{model}' unavailable"}, status_code=status)
+        if body.get("keep_alive") in (0, "0"):
+            loaded.pop(model, None)
+        else:
+            await ensure_loaded(model)
+        return {"model": model, "response": "", "done": True}
+
+    async def stream_chat(model: str, messages: List[Dict[str, Any]]) -> AsyncIterator[bytes]:
+        start = time.perf_counter()
+        await ensure_loaded(model)
+        prompt_stats = await eval_prompt(model, messages)
+        await asyncio.sleep(config.first_token_delay(model))
+        tokens = _tokens(config.reply)
+        drop_at = len(tokens) // 2 if rng.random() < config.drop_rate else None
+        for idx, token in enumerate(tokens):
+            if idx == drop_at:
+                raise RuntimeError("stub: injected stream drop")
+            if idx and config.tokens_per_sec:
+                await asyncio.sleep(1 / config.tokens_per_sec)
+            chunk = {"model": model, "message": {"role": "assistant", "content": token}, "done": False}
+            yield (json.dumps(chunk) + "\n").encode("utf-8")
+        final = {
+            "model": model,
+            "message": {"role": "assistant", "content": ""},
+            "done": True,
+            "eval_count": len(tokens),
+            "eval_duration": int((time.perf_counter() - start) * 1e9),
+            **prompt_stats,
+        }
+        yield (json.dumps(final) + "\n").encode("utf-8")
+
+    @stub.post("/api/chat")
+    async def chat(request: Request):
+        body = await request.json()
+        model = body.get("model")
+        status = config.model_status.get(model or "")
+        if status:
+            return JSONResponse({"error": f"model '{model}' unavailable"}, status_code=status)
+        if rng.random() < config.error_rate:
+            return JSONResponse({"error": "stub: injected failure"}, status_code=500)
+        if body.get("stream", True):
+            return StreamingResponse(stream_chat(model, body.get("messages") or []), media_type="application/x-ndjson")
+        await ensure_loaded(model)
+        prompt_stats = await eval_prompt(model, body.get("messages") or [])
+        tokens = _tokens(config.reply)
+        delay = config.first_token_delay(model)
+        if config.tokens_per_sec:
+            delay += (len(tokens) - 1) / config.tokens_per_sec
+        await asyncio.sleep(delay)
+        return {
+            "model": model,
+            "message": {"role": "assistant", "content": config.reply},
+            "done": True,
+            "eval_count": len(tokens),
+            **prompt_stats,
+        }
+
+    return stub
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class LocalServer:
+    """Serve an ASGI app on an ephemeral localhost port inside the current event loop.
+
+    ``lifespan="on"`` runs the app's startup and shutdown hooks as ``uvicorn`` would in production.
+    """
+
+    def __init__(self, app: Any, port: Optional[int] = None, lifespan: str = "off") -> None:
+        self.port = port or _free_port()
+        self._server = uvicorn.Server(
+            uvicorn.Config(
+                app,
+                host="127.0.0.1",
+                port=self.port,
+                log_level="warning",
+                lifespan=lifespan,
+            )
+        )
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    async def __aenter__(self) -> "LocalServer":
+        self._task = asyncio.create_task(self._server.serve())
+        while not self._server.started:
+            if self._task.done():
+                self._task.result()
+                raise RuntimeError("server exited during startup")
+            await asyncio.sleep(0.01)
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        self._server.should_exit = True
+        if self._task is not None:
+            await self._task
+
+
+class StubServer(LocalServer):
+    """Run the stub on an ephemeral localhost port inside the current event loop."""
+
+    def __init__(self, config: Optional[StubConfig] = None, port: Optional[int] = None) -> None:
+        self.config = config or StubConfig()
+        super().__init__(create_app(self.config), port)
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve the Ollama stub for a backend started separately.")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--reply", default=StubConfig.reply)
+    parser.add_argument("--first-token-ms", type=float, default=0.0)
+    parser.add_argument("--tokens-per-sec", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    config = StubConfig(
+        first_token_ms=args.first_token_ms,
+        tokens_per_sec=args.tokens_per_sec,
+        reply=args.reply,
+        error_rate=args.error_rate,
+        drop_rate=args.drop_rate,
+        seed=args.seed,
+    )
+    uvicorn.run(create_app(config), host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
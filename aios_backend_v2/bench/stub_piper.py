@@ -0,0 +1,117 @@
+"""Piper stand-in for offline TTS benchmarks: same CLI, scripted latency, synthetic WAV output.
+
+Invoked through the ``piper`` shim written by ``install_shim``. Latency is
+``STUB_PIPER_START_MS`` (model load) plus ``STUB_PIPER_MS_PER_CHAR`` per input
+character; the WAV lasts ``STUB_PIPER_AUDIO_MS_PER_CHAR`` per character. It
+is silent unless ``STUB_PIPER_SIGNAL=babble``, which fills it with a voiced,
+syllable-paced signal so codec size comparisons are meaningful.
+With ``--json-input`` it stays up, pays the start cost once, and handles one
+JSON line per utterance the way the Piper worker pool drives it.
+"""
+
+from __future__ import annotations
+
+import argparse
+import array
+import io
+import json
+import math
+import random
+import os
+import stat
+import sys
+import time
+import wave
+from pathlib import Path
+
+SAMPLE_RATE = 22050
+
+
+def _env_ms(name: str, default: float) -> float:
+    return float(os.getenv(name, str(default)) or default)
+
+
+def _babble(text: str, frames: int) -> bytes:
+    """Speech-like samples: a gliding pitch with harmonics, shaped into ~180 ms syllables, plus breath noise."""
+    rng = random.Random(text)
+    syllable = int(SAMPLE_RATE * 0.18)
+    samples = array.array("h")
+    phase = 0.0
+    for start in range(0, frames, syllable):
+        pitch = rng.uniform(95.0, 160.0)
+        voiced = rng.random() > 0.2
+        length = min(syllable, frames - start)
+        for i in range(length):
+            envelope = math.sin(math.pi * i / length)
+            phase += 2 * math.pi * (pitch * (1 + 0.1 * i / length)) / SAMPLE_RATE
+            value = rng.gauss(0.0, 0.03)
+            if voiced:
+                value += 0.5 * math.sin(phase) + 0.25 * math.sin(2 * phase) + 0.12 * math.sin(3 * phase)
+            samples.append(int(max(-1.0, min(1.0, value * envelope)) * 20000))
+    if sys.byteorder != "little":
+        samples.byteswap()
+    return samples.tobytes()
+
+
+def synthetic_wav(text: str) -> bytes:
+    frames = max(int(SAMPLE_RATE * len(text) * _env_ms("STUB_PIPER_AUDIO_MS_PER_CHAR", 60.0) / 1000), 1)
+    if os.getenv("STUB_PIPER_SIGNAL", "silence").strip().lower() == "babble":
+        pcm = _babble(text, frames)
+    else:
+        pcm = b"\x00\x00" * frames
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(SAMPLE_RATE)
+        out.writeframes(pcm)
+    return buffer.getvalue()
+
+
+def _synthesize(text: str, output_file: str) -> None:
+    time.sleep(len(text) * _env_ms("STUB_PIPER_MS_PER_CHAR", 1.0) / 1000)
+    data = synthetic_wav(text)
+    if output_file == "/dev/stdout":
+        sys.stdout.buffer.write(data)
+    else:
+        Path(output_file).write_bytes(data)
+
+
+def install_shim(directory: Path) -> Path:
+    """Write an executable ``piper`` into ``directory`` that runs this module; returns a dummy voice path."""
+    directory.mkdir(parents=True, exist_ok=True)
+    shim = directory / "piper"
+    root = Path(__file__).resolve().parents[2]
+    shim.write_text(
+        f'#!/bin/sh\nPYTHONPATH="{root}${{PYTHONPATH:+:$PYTHONPATH}}" '
+        f'exec "{sys.executable}" -m aios_backend_v2.bench.stub_piper "$@"\n',
+        encoding="utf-8",
+    )
+    shim.chmod(shim.stat().st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    voice = directory / "stub-voice.onnx"
+    voice.write_bytes(b"")
+    return voice
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-m", "--model", required=True)
+    parser.add_argument("-f", "--output_file", required=True)
+    parser.add_argument("--json-input", action="store_true")
+    args, _ = parser.parse_known_args()
+    time.sleep(_env_ms("STUB_PIPER_START_MS", 150.0) / 1000)
+    if not args.json_input:
+        _synthesize(sys.stdin.read(), args.output_file)
+        return
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        request = json.loads(line)
+        output_file = request.get("output_file") or args.output_file
+        _synthesize(request.get("text") or "", output_file)
+        sys.stdout.buffer.write(output_file.encode("utf-8") + b"\n")
+        sys.stdout.buffer.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Size and latency of each /tts output format: encode time, bytes, and delivery time over a slow link.
+
+Usage: python -m aios_backend_v2.bench.tts_formats [--mbps 10] [--repeat 5] [--out formats.json]
+       python -m aios_backend_v2.bench.tts_formats --real   # piper and PIPER_VOICE from the environment
+
+Without ``--real`` the speech comes from the stub Piper with its syllable-paced
+``babble`` signal (silence would flatter the codecs). Each text is synthesized
+once, then encoded ``--repeat`` times per available format. ``delivery_ms`` is
+encode time plus transfer at ``--mbps``, the figure that matters for a remote
+client such as a phone on Wi-Fi.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from .. import audio_format
+from .harness import TTS_TEXTS
+from .stub_piper import install_shim
+
+LONG_TEXT = (
+    "Here is the plan for today. First, update the system packages and reboot if the kernel changed. "
+    "Then open the project in your editor, run the test suite, and check the failing benchmark. "
+    "After lunch, review the two pending pull requests and reply to the design thread."
+)
+
+
+async def measure(texts: List[str], repeat: int, mbps: float) -> Dict[str, Any]:
+    from .. import tts
+
+    formats = audio_format.available()
+    rows: Dict[str, Dict[str, List[float]]] = {fmt: {"bytes": [], "encode_ms": []} for fmt in formats}
+    audio_ms: List[float] = []
+    for text in texts:
+        pcm, sample_rate = await tts.synthesize_pcm(text)
+        audio_ms.append(len(pcm) / 2 / sample_rate * 1000)
+        for fmt in formats:
+            for _ in range(repeat):
+                start = time.perf_counter()
+                data = await audio_format.encode(pcm, sample_rate, fmt)
+                rows[fmt]["encode_ms"].append((time.perf_counter() - start) * 1000)
+            rows[fmt]["bytes"].append(len(data))
+
+    wav_bytes = sum(rows["wav"]["bytes"])
+    results: Dict[str, Any] = {}
+    for fmt, row in rows.items():
+        total = sum(row["bytes"])
+        encode_ms = statistics.median(row["encode_ms"])
+        transfer_ms = total / len(texts) * 8 / (mbps * 1_000_000) * 1000
+        results[fmt] = {
+            "mean_bytes": int(total / len(texts)),
+            "ratio_vs_wav": round(total / wav_bytes, 3),
+            "kbps": round(total * 8 / sum(audio_ms), 1),
+            "encode_p50_ms": round(encode_ms, 2),
+            "transfer_ms": round(transfer_ms, 1),
+            "delivery_ms": round(encode_ms + transfer_ms, 1),
+        }
+    return {"texts": len(texts), "audio_s": round(sum(audio_ms) / 1000, 2), "mbps": mbps, "formats": results}
+
+
+def _print(report: Dict[str, Any]) -> None:
+    print(f"{report['texts']} texts, {report['audio_s']} s of audio, link {report['mbps']} Mbit/s")
+    print(f"{'format':<6} {'bytes':>9} {'vs wav':>7} {'kbit/s':>7} {'encode':>8} {'transfer':>9} {'delivery':>9}")
+    for fmt, row in report["formats"].items():
+        print(
+            f"{fmt:<6} {row['mean_bytes']:>9} {row['ratio_vs_wav']:>7} {row['kbps']:>7} "
+            f"{row['encode_p50_ms']:>6}ms {row['transfer_ms']:>7}ms {row['delivery_ms']:>7}ms"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mbps", type=float, default=10.0, help="link speed for the transfer estimate")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--real", action="store_true", help="use the installed piper and PIPER_VOICE")
+    parser.add_argument("--out", help="write the JSON report here")
+    args = parser.parse_args()
+    texts = [*TTS_TEXTS, LONG_TEXT]
+
+    with tempfile.TemporaryDirectory(prefix="aios-formats-") as tmp:
+        if not args.real:
+            voice = install_shim(Path(tmp) / "bin")
+            os.environ["PATH"] = f"{Path(tmp) / 'bin'}{os.pathsep}{os.environ.get('PATH', '')}"
+            os.environ["PIPER_VOICE"] = str(voice)
+            os.environ["STUB_PIPER_SIGNAL"] = "babble"
+            os.environ["STUB_PIPER_START_MS"] = "0"
+        os.environ["AIOS_TTS_CACHE"] = "off"
+        report = asyncio.run(measure(texts, args.repeat, args.mbps))
+
+    _print(report)
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Small-to-large model cascade: draft on the fast tier, escalate only when the draft fails a cheap check."""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from . import flag
+from .errors import ServiceUnavailableError
+from .llm_router import REGISTRY, model_info
+from .runtime import breakers
+
+LOGGER = logging.getLogger(__name__)
+
+CASCADE_ENABLED = flag("AIOS_CASCADE")
+MIN_CHARS = int(os.getenv("AIOS_CASCADE_MIN_CHARS", "24") or "24")
+_min_logprob = os.getenv("AIOS_CASCADE_MIN_LOGPROB", "").strip()
+MIN_LOGPROB: Optional[float] = float(_min_logprob) if _min_logprob else None
+
+TIER_ORDER = ("fast", "mid", "deep")
+REFUSAL = re.compile(
+    r"^\s*(i\s*(?:'m| am)\s+(?:sorry|unable|not able)|i\s+(?:can(?:'|no)t|cannot|don't know)|as an ai\b)",
+    re.IGNORECASE,
+)
+
+_lock = threading.Lock()
+_stats: Dict[str, Any] = {"runs": 0, "escalations": 0, "deep_calls_avoided": 0, "accepted": {}, "reasons": {}}
+
+
+def rungs(target_model: str) -> List[str]:
+    """Models from the fast tier up to ``target_model``'s tier; empty when there is nothing to cascade."""
+    info = model_info(target_model)
+    if info is None or info.tier not in TIER_ORDER:
+        return []
+    ladder = [
+        REGISTRY[tier].name
+        for tier in TIER_ORDER[: TIER_ORDER.index(info.tier)]
+        if breakers.available(REGISTRY[tier].name)
+    ]
+    return [*ladder, target_model] if ladder else []
+
+
+def score_draft(
+    reply: str,
+    stats: Dict[str, Any],
+    allowed_tools: Iterable[str] = (),
+    number_check: Optional[Callable[[str], str]] = None,
+) -> Optional[str]:
+    """Reason the draft should be escalated, or None when it is good enough."""
+    tool_names = set(allowed_tools)
+    text = (reply or "").strip()
+    if not text:
+        return "empty"
+    if text.startswith("{"):
+        try:
+            parsed = json.loads(text)
+        except json.JSONDecodeError:
+            return "invalid_json"
+        call = parsed.get("tool_call") if isinstance(parsed, dict) else None
+        if isinstance(call, dict):
+            return None if call.get("name") in tool_names else "unknown_tool"
+        if not (isinstance(parsed, dict) and isinstance(parsed.get("reply"), str)):
+            return "invalid_json"
+        text = parsed["reply"].strip()
+    if stats.get("done_reason") == "length":
+        return "truncated"
+    if REFUSAL.search(text):
+        return "refusal"
+    if len(text) < MIN_CHARS and not tool_names:
+        return "too_short"
+    if number_check is not None and number_check(text) != text:
+        return "number_mismatch"
+    if MIN_LOGPROB is not None and stats.get("mean_logprob") is not None and stats["mean_logprob"] < MIN_LOGPROB:
+        return "low_logprob"
+    return None
+
+
+def _tier(model: str) -> str:
+    info = model_info(model)
+    return info.tier if info else model
+
+
+def _record(target: str, accepted: str, reasons: List[str]) -> None:
+    target_tier, accepted_tier = _tier(target), _tier(accepted)
+    with _lock:
+        _stats["runs"] += 1
+        _stats["escalations"] += len(reasons)
+        _stats["accepted"][accepted_tier] = _stats["accepted"].get(accepted_tier, 0) + 1
+        if target_tier == "deep" and accepted_tier != "deep":
+            _stats["deep_calls_avoided"] += 1
+        for reason in reasons:
+            _stats["reasons"][reason] = _stats["reasons"].get(reason, 0) + 1
+
+
+async def run(
+    target_model: str,
+    attempt: Callable[[str, Dict[str, Any]], Awaitable[str]],
+    judge: Callable[[str, Dict[str, Any]], Optional[str]],
+) -> Tuple[str, Dict[str, Any], Dict[str, Any]]:
+    """Try each rung of ``rungs(target_model)`` until ``judge`` accepts a draft.
+
+    ``attempt(model, stats)`` generates one draft. The last rung's answer is
+    returned whatever its score. Returns ``(reply, stats of the accepted rung, trace)``.
+    """
+    ladder = rungs(target_model) or [target_model]
+    path: List[Dict[str, Any]] = []
+    reasons: List[str] = []
+    for idx, model in enumerate(ladder):
+        last = idx == len(ladder) - 1
+        stats: Dict[str, Any] = {}
+        start = time.perf_counter()
+        try:
+            reply = await attempt(model, stats)
+            reason = None if last else judge(reply, stats)
+        except ServiceUnavailableError as exc:
+            if last:
+                raise
+            reply, reason = "", "error"
+            LOGGER.info("cascade_rung_failed", extra={"model": model, "error": str(exc)})
+        step = {"model": model, "ms": round((time.perf_counter() - start) * 1000, 1)}
+        if reason:
+            step["escalated"] = reason
+            reasons.append(reason)
+        path.append(step)
+        if reason is None:
+            _record(target_model, model, reasons)
+            trace = {
+                "target": target_model,
+                "accepted": model,
+                "path": path,
+                "deep_avoided": _tier(target_model) == "deep" and model != target_model,
+            }
+            return reply, stats, trace
+    raise ServiceUnavailableError("cascade exhausted")  # pragma: no cover - last rung always returns
+
+
+def snapshot() -> Dict[str, Any]:
+    with _lock:
+        return {
+            "enabled": CASCADE_ENABLED,
+            "min_logprob": MIN_LOGPROB,
+            **{key: dict(value) if isinstance(value, dict) else value for key, value in _stats.items()},
+        }
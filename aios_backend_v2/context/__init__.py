@@ -1,5 +1,5 @@
 """Prompt/context assembly utilities."""
 
-from .assembler import RequestContext, PromptBundle, build_prompt
+from .assembler import RequestContext, PromptBundle, build_prompt, common_prefix_bytes
 
-__all__ = ["RequestContext", "PromptBundle", "build_prompt"]
+__all__ = ["RequestContext", "PromptBundle", "build_prompt", "common_prefix_bytes"]
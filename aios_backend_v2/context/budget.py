@@ -0,0 +1,118 @@
+"""Token quotas for the flexible prompt sections, sized to the model's context window."""
+
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .tokens import TokenCounter
+
+RESERVED_OUTPUT_TOKENS = int(os.getenv("AIOS_RESERVED_OUTPUT_TOKENS", "512") or "512")
+
+# Relative claim of each flexible section on the tokens left after the fixed
+# sections (system, behavior, current user message) and the reserved output.
+SECTION_SHARES: Dict[str, float] = {
+    "tools": 0.35,
+    "history": 0.25,
+    "memory_context": 0.2,
+    "system_card": 0.1,
+    "persona": 0.1,
+}
+
+
+@dataclass
+class TokenBudget:
+    context_window: int
+    reserved_output: int
+    fixed_tokens: int = 0
+    quotas: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def available(self) -> int:
+        return max(0, self.context_window - self.reserved_output - self.fixed_tokens)
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "context_window": self.context_window,
+            "reserved_output": self.reserved_output,
+            "fixed_tokens": self.fixed_tokens,
+            "quotas": dict(self.quotas),
+        }
+
+
+def allocate(
+    context_window: int,
+    fixed_tokens: int,
+    demands: Dict[str, int],
+    reserved_output: int = RESERVED_OUTPUT_TOKENS,
+    shares: Optional[Dict[str, float]] = None,
+) -> TokenBudget:
+    """Split the free context between sections by share, without over-granting.
+
+    Sections that need less than their share keep only what they need and the
+    remainder is re-split among the sections that still want more, so a small
+    memory block leaves room for a large tool catalog and vice versa.
+    """
+    shares = shares or SECTION_SHARES
+    budget = TokenBudget(context_window, reserved_output, fixed_tokens)
+    remaining = budget.available
+    wanting = {name: max(0, demands.get(name, 0)) for name in shares}
+    quotas = {name: 0 for name in shares}
+    while remaining > 0 and wanting:
+        total_share = sum(shares[name] for name in wanting)
+        settled = {
+            name: need
+            for name, need in wanting.items()
+            if need <= int(remaining * shares[name] / total_share)
+        }
+        if not settled:
+            for name in wanting:
+                quotas[name] += int(remaining * shares[name] / total_share)
+            break
+        for name, need in settled.items():
+            quotas[name] += need
+            remaining -= need
+            del wanting[name]
+    budget.quotas = quotas
+    return budget
+
+
+def fit_sections(
+    counter: TokenCounter,
+    sections: Dict[str, str],
+    tokens: Dict[str, int],
+    fixed: Iterable[str],
+    context_window: int,
+    extra_demands: Optional[Dict[str, int]] = None,
+    reserved_output: int = RESERVED_OUTPUT_TOKENS,
+    compact: Optional[Dict[str, Callable[[], str]]] = None,
+) -> Tuple[TokenBudget, List[str]]:
+    """Allocate quotas over ``sections`` and clamp, in place, every flexible section over its quota.
+
+    ``tokens`` holds the per-section counts and is updated after clamping. ``fixed``
+    sections are never cut. ``compact`` offers a cheaper rendering of a section to try
+    before truncating it. Returns the budget and the names of the clamped sections.
+    """
+    fixed = set(fixed)
+    demands = {name: count for name, count in tokens.items() if name not in fixed}
+    demands.update(extra_demands or {})
+    budget = allocate(
+        context_window,
+        sum(tokens.get(name, 0) for name in fixed),
+        demands,
+        reserved_output=reserved_output,
+    )
+    clamped: List[str] = []
+    for name, quota in budget.quotas.items():
+        if name not in sections or tokens[name] <= quota:
+            continue
+        text = sections[name]
+        if compact and name in compact:
+            text = compact[name]()
+        if counter.count(text) > quota:
+            text = counter.truncate(text, max(0, quota - 8)).rstrip() + "\n...[truncated]"
+        sections[name] = text
+        tokens[name] = counter.count(text)
+        clamped.append(name)
+    return budget, clamped
@@ -0,0 +1,132 @@
+"""Memoized prompt sections so a turn only formats what changed since the last one.
+
+Three tiers: static sections (built once per process from constant inputs),
+tool blocks (keyed by the allowed tool names and the registry version), and
+volatile sections (keyed by a digest of their inputs, bounded LRU). Each
+``Tally`` records per-section hit/miss for one prompt, for ``prompt_metrics``.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+from .. import flag
+
+SECTION_CACHE_ENABLED = flag("AIOS_PROMPT_SECTION_CACHE", default=True)
+MAX_ENTRIES = int(os.getenv("AIOS_PROMPT_SECTION_CACHE_MAX", "256") or "256")
+
+_lock = threading.Lock()
+_static: Dict[Hashable, str] = {}
+_tools: "OrderedDict[Hashable, str]" = OrderedDict()
+_volatile: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+_stats: Dict[str, Dict[str, int]] = {}
+
+
+class Tally:
+    """Per-prompt record of which sections came from the cache."""
+
+    def __init__(self) -> None:
+        self.sections: Dict[str, str] = {}
+
+    def mark(self, name: str, hit: bool) -> None:
+        self.sections[name] = "hit" if hit else "miss"
+        with _lock:
+            counts = _stats.setdefault(name, {"hits": 0, "misses": 0})
+            counts["hits" if hit else "misses"] += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        hits = sum(1 for state in self.sections.values() if state == "hit")
+        return {"sections": dict(self.sections), "hits": hits, "misses": len(self.sections) - hits}
+
+
+def digest(*parts: Any) -> str:
+    """Content hash of ``parts`` (strings as-is, anything else via ``repr``)."""
+    hasher = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        hasher.update((part if isinstance(part, str) else repr(part)).encode("utf-8", "surrogatepass"))
+        hasher.update(b"\0")
+    return hasher.hexdigest()
+
+
+def _remember(store: "OrderedDict[Any, str]", key: Any, value: str) -> None:
+    store[key] = value
+    store.move_to_end(key)
+    while len(store) > MAX_ENTRIES:
+        store.popitem(last=False)
+
+
+def static(name: str, build: Callable[[], str], *inputs: Hashable, tally: Optional[Tally] = None) -> str:
+    """Section ``name`` built once per process; ``inputs`` are the constants it depends on."""
+    if not SECTION_CACHE_ENABLED:
+        return build()
+    key = (name, *inputs)
+    with _lock:
+        value = _static.get(key)
+    hit = value is not None
+    if value is None:
+        value = build()
+        with _lock:
+            _static[key] = value
+    if tally is not None:
+        tally.mark(name, hit)
+    return value
+
+
+def tool_key(tool_names: Iterable[str], version: int, *variant: Hashable) -> Hashable:
+    return (frozenset(tool_names), version, *variant)
+
+
+def tool_block(key: Hashable, build: Callable[[], str], tally: Optional[Tally] = None, name: str = "tools") -> str:
+    """Tool section for one allowed-tool set, memoized on ``tool_key(...)``."""
+    return _cached(_tools, key, build, tally, name)
+
+
+def volatile(name: str, build: Callable[[], str], *inputs: Any, tally: Optional[Tally] = None) -> str:
+    """Per-turn section memoized on a content hash of ``inputs``."""
+    return _cached(_volatile, (name, digest(*inputs)), build, tally, name)
+
+
+def _cached(
+    store: "OrderedDict[Any, str]",
+    key: Hashable,
+    build: Callable[[], str],
+    tally: Optional[Tally],
+    name: str,
+) -> str:
+    if not SECTION_CACHE_ENABLED:
+        return build()
+    with _lock:
+        value = store.get(key)
+        if value is not None:
+            store.move_to_end(key)
+    hit = value is not None
+    if value is None:
+        value = build()
+        with _lock:
+            _remember(store, key, value)
+    if tally is not None:
+        tally.mark(name, hit)
+    return value
+
+
+def clear() -> None:
+    with _lock:
+        _static.clear()
+        _tools.clear()
+        _volatile.clear()
+
+
+def snapshot() -> Dict[str, Any]:
+    with _lock:
+        return {
+            "enabled": SECTION_CACHE_ENABLED,
+            "static_entries": len(_static),
+            "tool_blocks": len(_tools),
+            "volatile_entries": len(_volatile),
+            "max_entries": MAX_ENTRIES,
+            "sections": {name: dict(counts) for name, counts in sorted(_stats.items())},
+        }
@@ -0,0 +1,132 @@
+"""Token counting for prompt budgeting, per model tier.
+
+Tokenizer vocab files are looked up under ``AIOS_TOKENIZER_DIR`` (default
+``$AIOS_DATA_DIR/tokenizers``) as ``<tier>.json``, ``<model>.json`` or
+``<tier|model>/tokenizer.json`` (Hugging Face ``tokenizer.json`` format, model
+names with ``:``/``/`` replaced by ``_``). Without a vocab file or the optional
+``tokenizers`` package, a cached estimator is used instead.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import os
+import re
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:  # pragma: no cover - optional dependency
+    from tokenizers import Tokenizer  # type: ignore
+except Exception:  # noqa: BLE001
+    Tokenizer = None
+
+from ..settings import DATA_DIR
+
+LOGGER = logging.getLogger(__name__)
+
+TOKENIZER_DIR = Path(os.getenv("AIOS_TOKENIZER_DIR", str(DATA_DIR / "tokenizers"))).expanduser()
+CACHE_SIZE = int(os.getenv("AIOS_TOKEN_CACHE", "4096") or "4096")
+
+_WORDS = re.compile(r"\w+", re.UNICODE)
+_PUNCT = re.compile(r"[^\w\s]+", re.UNICODE)
+_BREAKS = re.compile(r"\n\s*")
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def estimate_tokens(text: str) -> int:
+    """BPE-shaped estimate: ~4 chars per word piece, ~2 per punctuation run, one per line break."""
+    if not text:
+        return 0
+    words = sum(math.ceil(len(word) / 4) for word in _WORDS.findall(text))
+    punct = sum(math.ceil(len(run) / 2) for run in _PUNCT.findall(text))
+    return max(1, words + punct + len(_BREAKS.findall(text)))
+
+
+class TokenCounter:
+    name = "estimate"
+
+    def count(self, text: str) -> int:
+        return estimate_tokens(text or "")
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Longest prefix of ``text`` that fits in ``max_tokens``."""
+        if max_tokens <= 0:
+            return ""
+        if self.count(text) <= max_tokens:
+            return text
+        lo, hi = 0, len(text)
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if self.count(text[:mid]) <= max_tokens:
+                lo = mid
+            else:
+                hi = mid - 1
+        return text[:lo]
+
+
+class VocabTokenCounter(TokenCounter):
+    def __init__(self, tokenizer, source: Path) -> None:
+        self._tokenizer = tokenizer
+        self.name = f"tokenizer:{source.name if source.name != 'tokenizer.json' else source.parent.name}"
+        self._count = lru_cache(maxsize=CACHE_SIZE)(self._encode_len)
+
+    def _encode_len(self, text: str) -> int:
+        return len(self._tokenizer.encode(text, add_special_tokens=False).ids)
+
+    def count(self, text: str) -> int:
+        return self._count(text or "")
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        if max_tokens <= 0:
+            return ""
+        encoding = self._tokenizer.encode(text, add_special_tokens=False)
+        if len(encoding.ids) <= max_tokens:
+            return text
+        return text[: encoding.offsets[max_tokens - 1][1]]
+
+
+def _safe_name(name: str) -> str:
+    return re.sub(r"[:/\\]", "_", name)
+
+
+def _vocab_candidates(model: Optional[str], tier: Optional[str]) -> List[Path]:
+    paths: List[Path] = []
+    for key in (tier, _safe_name(model) if model else None):
+        if key:
+            paths.append(TOKENIZER_DIR / f"{key}.json")
+            paths.append(TOKENIZER_DIR / key / "tokenizer.json")
+    return paths
+
+
+_counters: Dict[str, TokenCounter] = {}
+_lock = threading.Lock()
+_FALLBACK = TokenCounter()
+
+
+def _load(model: Optional[str], tier: Optional[str]) -> TokenCounter:
+    if Tokenizer is None:
+        return _FALLBACK
+    for path in _vocab_candidates(model, tier):
+        if not path.is_file():
+            continue
+        try:
+            return VocabTokenCounter(Tokenizer.from_file(str(path)), path)
+        except Exception as exc:  # noqa: BLE001
+            LOGGER.warning("tokenizer_load_failed", extra={"path": str(path), "error": str(exc)})
+    return _FALLBACK
+
+
+def counter_for(model: Optional[str]) -> TokenCounter:
+    """Token counter for ``model``, loaded once and reused; the estimator when no vocab is found."""
+    from ..llm_router import model_info
+
+    info = model_info(model) if model else None
+    key = model or ""
+    with _lock:
+        counter = _counters.get(key)
+        if counter is None:
+            counter = _counters[key] = _load(model, info.tier if info else None)
+        return counter
@@ -0,0 +1,90 @@
+"""Per-turn generation profiles: output caps, stop sequences and keep_alive.
+
+``num_ctx`` is not part of a profile: Ollama reloads a runner whenever it changes, so every
+request for a model (generation, probes and residency warm-ups) sends ``context_window(model)``.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from . import flag
+from .llm_router import context_window
+from .runtime import residency
+
+PROFILES_ENABLED = flag("AIOS_GEN_PROFILES")
+_STOP_TURNS = ["\nUser:", "\nuser:"]
+_SENTENCE_END = re.compile(r"[.!?](?:[\"')\]]*)(?=\s|$)")
+
+
+def _num_predict(name: str, default: int) -> int:
+    return int(os.getenv(f"AIOS_NUM_PREDICT_{name.upper()}", str(default)) or default)
+
+
+@dataclass(frozen=True)
+class GenerationProfile:
+    name: str
+    num_predict: int
+    stop: List[str] = field(default_factory=list)
+    keep_alive: Optional[str] = None  # None = residency.KEEP_ALIVE
+
+
+PROFILES: Dict[str, GenerationProfile] = {
+    # A single {"tool_call": ...} object; the stream is usually cut earlier by the tool-call scanner.
+    "tool": GenerationProfile("tool", _num_predict("tool", 192), _STOP_TURNS),
+    # Tool-capable turn in the 0.6-0.8 band: one clarifying question or a tool call.
+    "clarify": GenerationProfile("clarify", _num_predict("clarify", 128), ["\n\n", *_STOP_TURNS]),
+    # Latency-budgeted (spoken) replies: a few sentences. The cap is a backstop, not the length
+    # target, so it leaves room to finish a sentence; see ``trim_truncated``.
+    "voice": GenerationProfile("voice", _num_predict("voice", 192), _STOP_TURNS),
+    "chat": GenerationProfile("chat", _num_predict("chat", 384), _STOP_TURNS),
+    "deep": GenerationProfile(
+        "deep", _num_predict("deep", 1024), _STOP_TURNS, os.getenv("AIOS_KEEP_ALIVE_DEEP", "10m")
+    ),
+}
+
+
+@dataclass(frozen=True)
+class GenerationPlan:
+    """A profile bound to one assembled prompt; options are resolved per model rung."""
+
+    profile: GenerationProfile
+    prompt_tokens: int
+
+    def options(self, model: Optional[str]) -> Dict[str, Any]:
+        # Never ask for more than the pinned window has left after the prompt.
+        room = context_window(model) - self.prompt_tokens
+        opts: Dict[str, Any] = {"num_predict": max(1, min(self.profile.num_predict, room))}
+        if self.profile.stop:
+            opts["stop"] = list(self.profile.stop)
+        return opts
+
+    @property
+    def keep_alive(self) -> str:
+        return self.profile.keep_alive or residency.KEEP_ALIVE
+
+    def describe(self, model: Optional[str]) -> Dict[str, Any]:
+        return {
+            "name": self.profile.name,
+            "keep_alive": self.keep_alive,
+            "num_ctx": context_window(model),
+            **self.options(model),
+        }
+
+
+def plan_for(name: str, prompt_tokens: int) -> Optional[GenerationPlan]:
+    if not PROFILES_ENABLED or name not in PROFILES:
+        return None
+    return GenerationPlan(PROFILES[name], prompt_tokens)
+
+
+def trim_truncated(text: str) -> str:
+    """Cut a reply that hit ``num_predict`` back to its last complete sentence.
+
+    Returns ``text`` unchanged when it has no sentence end to fall back to.
+    """
+    ends = list(_SENTENCE_END.finditer(text))
+    return text[: ends[-1].end()].rstrip() if ends else text
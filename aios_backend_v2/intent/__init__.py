@@ -30,6 +30,8 @@ RUN_VERBS = re.compile(r"\b(run|open|launch|start|use)\b")
 FOLDER_VERBS = re.compile(r"\b(mkdir|create|make|new)\b")
 FILE_VERBS = re.compile(r"\b(touch|create|make|new)\b")
 PATH_PATTERN = re.compile(r"(~/\S+|/[\w\-/\.]+)")
+TIME_QUESTION = re.compile(r"\b(what(?:'s| is)? (?:the )?(?:time|date|day)|what day is it|today's date)\b")
+READ_COMMAND = re.compile(r"^(?:run |show me |show )?((?:ls|df|free|uptime|uname|whoami|pwd)(?: -[\w-]+)*)\s*$")
 
 
 def _find_app(text: str) -> Optional[str]:
@@ -111,4 +113,14 @@ def infer_tool_intent(user_text: str | None, allowed_tools: Iterable[str]) -> Op
                     "confidence": 0.75,
                 }
 
+    # Read-only guesses below stay under 0.8: the model still decides, but they
+    # are safe to run speculatively while it does.
+    if "get_datetime" in allowed and TIME_QUESTION.search(text):
+        return {"name": "get_datetime", "arguments": {}, "confidence": 0.7}
+
+    if "run_command_safe" in allowed:
+        match = READ_COMMAND.match(text.strip())
+        if match:
+            return {"name": "run_command_safe", "arguments": {"cmd": match.group(1).split()}, "confidence": 0.65}
+
     return None
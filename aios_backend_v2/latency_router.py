@@ -0,0 +1,228 @@
+"""Per-model generation-time distributions learned from chat_turns.ndjson.
+
+Samples are the model's own time (``generate_ms``), not whole-turn latency,
+which for tool turns also includes tool and resolver time. The log is read
+once at startup, off the event loop.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import collections
+import json
+import os
+import threading
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+from . import flag
+from .logs import CHAT_LOG_PATH
+
+LEARNED_ROUTER_ENABLED = flag("AIOS_ROUTER_LEARNED")
+WINDOW = int(os.getenv("AIOS_ROUTER_WINDOW", "200") or "200")
+MIN_SAMPLES = int(os.getenv("AIOS_ROUTER_MIN_SAMPLES", "5") or "5")
+HISTORY_LINES = 5000
+
+# (upper bound in prompt bytes, bucket label); anything larger is "large".
+SIZE_BUCKETS: List[Tuple[int, str]] = [(2048, "small"), (6144, "medium")]
+TOOL_RESPONSE_TYPES = {"executed_tool", "tool_call", "tool_error", "tool_missing"}
+TEXT_RESPONSE_TYPES = {"text_reply"}
+
+Key = Tuple[str, str, str]  # (model, kind, size bucket)
+
+
+def size_bucket(prompt_bytes: Optional[int]) -> str:
+    size = prompt_bytes or 0
+    for limit, label in SIZE_BUCKETS:
+        if size < limit:
+            return label
+    return "large"
+
+
+def turn_kind(response_type: Optional[str]) -> Optional[str]:
+    if response_type in TOOL_RESPONSE_TYPES:
+        return "tool"
+    if response_type in TEXT_RESPONSE_TYPES:
+        return "text"
+    return None
+
+
+def prompt_bytes_of(record: Dict[str, Any]) -> int:
+    """Prompt size for a logged turn; older records only carry per-section byte counts."""
+    if isinstance(record.get("prompt_bytes"), (int, float)):
+        return int(record["prompt_bytes"])
+    total = len((record.get("user_text") or "").encode("utf-8"))
+    for key in ("system_card_bytes", "persona_bytes", "stm_bytes", "ltm_bytes", "tools_bytes"):
+        value = record.get(key)
+        if isinstance(value, (int, float)):
+            total += int(value)
+    return total
+
+
+def generation_ms_of(record: Dict[str, Any], kind: Optional[str]) -> Optional[float]:
+    """Model time for a logged turn; records older than ``generate_ms`` fall back to latency for text turns.
+
+    Response-cache hits never ran the model and yield None.
+    """
+    if record.get("cache_hit") or (record.get("response_cache") or {}).get("hit"):
+        return None
+    value = record.get("generate_ms")
+    if isinstance(value, (int, float)):
+        return float(value)
+    # A text turn's latency is almost all generation; a tool turn's also includes the tool.
+    latency = record.get("latency_ms")
+    if kind == "text" and isinstance(latency, (int, float)):
+        return float(latency)
+    return None
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    idx = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+class LatencyModel:
+    """Sliding-window latency samples keyed by model, turn kind and prompt size."""
+
+    def __init__(self, window: int = WINDOW, min_samples: int = MIN_SAMPLES) -> None:
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[Key, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, model: str, kind: str, prompt_bytes: Optional[int], latency_ms: float) -> None:
+        key = (model, kind, size_bucket(prompt_bytes))
+        with self._lock:
+            bucket = self._samples.get(key)
+            if bucket is None:
+                bucket = self._samples[key] = collections.deque(maxlen=self.window)
+            bucket.append(float(latency_ms))
+
+    def observe_record(self, record: Dict[str, Any]) -> bool:
+        model = record.get("model_used") or record.get("model")
+        kind = turn_kind(record.get("response_type"))
+        latency = generation_ms_of(record, kind)
+        if not model or not kind or latency is None:
+            return False
+        self.observe(model, kind, prompt_bytes_of(record), latency)
+        return True
+
+    def absorb(self, other: "LatencyModel") -> None:
+        """Append ``other``'s samples after this model's, oldest first."""
+        with other._lock:
+            items = [(key, list(values)) for key, values in other._samples.items()]
+        for (model, kind, bucket), values in items:
+            with self._lock:
+                target = self._samples.setdefault((model, kind, bucket), collections.deque(maxlen=self.window))
+                target.extend(values)
+
+    def _candidates(self, model: str, kind: str, bucket: str) -> Iterable[List[float]]:
+        # Exact key first, then widen to any size, then to any kind for the model.
+        exact = self._samples.get((model, kind, bucket))
+        yield list(exact or [])
+        yield [v for (m, k, _), vals in self._samples.items() if m == model and k == kind for v in vals]
+        yield [v for (m, _, _), vals in self._samples.items() if m == model for v in vals]
+
+    def percentile(self, model: str, kind: str, prompt_bytes: Optional[int], q: float) -> Optional[float]:
+        bucket = size_bucket(prompt_bytes)
+        with self._lock:
+            for samples in self._candidates(model, kind, bucket):
+                if len(samples) >= self.min_samples:
+                    return _percentile(sorted(samples), q)
+        return None
+
+    def choose(
+        self,
+        models: List[str],
+        kind: str,
+        prompt_bytes: Optional[int],
+        budget_ms: float,
+    ) -> Optional[str]:
+        """First model (callers pass highest tier first) whose predicted p95 fits the budget.
+
+        When none fits, the model with the lowest predicted p95 is returned. None
+        means no model has enough samples yet, so the caller keeps its heuristic.
+        """
+        fastest: Optional[Tuple[float, str]] = None
+        for model in models:
+            p95 = self.percentile(model, kind, prompt_bytes, 0.95)
+            if p95 is None:
+                continue
+            if p95 <= budget_ms:
+                return model
+            if fastest is None or p95 < fastest[0]:
+                fastest = (p95, model)
+        return fastest[1] if fastest else None
+
+    def typical(self, kind: str, q: float = 0.5) -> Optional[float]:
+        """Percentile of ``kind`` turns across every model, or None without enough samples."""
+        with self._lock:
+            samples = [v for (_, k, _), vals in self._samples.items() if k == kind for v in vals]
+        if len(samples) < self.min_samples:
+            return None
+        return _percentile(sorted(samples), q)
+
+    def load_records(self, records: Iterable[Dict[str, Any]]) -> int:
+        return sum(1 for record in records if self.observe_record(record))
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            items = list(self._samples.items())
+        data: Dict[str, Dict[str, Any]] = {}
+        for (model, kind, bucket), values in items:
+            ordered = sorted(values)
+            data[f"{model}|{kind}|{bucket}"] = {
+                "n": len(ordered),
+                "p50_ms": round(_percentile(ordered, 0.5), 1),
+                "p95_ms": round(_percentile(ordered, 0.95), 1),
+            }
+        return data
+
+
+def read_log(path: str = CHAT_LOG_PATH, limit: Optional[int] = HISTORY_LINES) -> List[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return []
+    records: Deque[Dict[str, Any]] = collections.deque(maxlen=limit)
+    with open(path, "r", encoding="utf-8") as fh:
+        for line in fh:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return list(records)
+
+
+_model = LatencyModel()
+_model_lock = threading.Lock()
+_loaded = False
+
+
+def get_model() -> LatencyModel:
+    """The live model; empty (callers keep their heuristics) until ``startup`` has read the log."""
+    with _model_lock:
+        return _model
+
+
+def _load_history() -> int:
+    global _model, _loaded
+    history = LatencyModel()
+    count = history.load_records(read_log())
+    with _model_lock:
+        # Turns observed while the log was being read are newer; keep them last in the window.
+        history.absorb(_model)
+        _model = history
+        _loaded = True
+    return count
+
+
+async def startup() -> None:
+    if not _loaded:
+        await asyncio.to_thread(_load_history)
+
+
+def observe_turn(record: Dict[str, Any]) -> None:
+    """Record every turn, so the fast-path baseline stays current even with the learned router off."""
+    get_model().observe_record(record)
+
+
+def typical_latency_ms(kind: str, q: float = 0.5) -> Optional[float]:
+    return get_model().typical(kind, q)
@@ -1,30 +1,100 @@
 from __future__ import annotations
 
+import asyncio
+import json
+import logging
 import os
-from typing import Any, Dict, List, Optional
+import time
+from contextlib import aclosing
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
 
 import httpx
 
+from . import flag
 from .errors import ServiceUnavailableError
+from .generation import GenerationPlan
+from .llm_router import REGISTRY, context_window, model_info
+from .ollama_client import OLLAMA_URL, OllamaClient, get_client  # noqa: F401
+from .runtime import admission, breakers, residency
+from .util.tool_json import ToolCallScanner
 
-OLLAMA_URL = os.getenv("OLLAMA_URL", "http://127.0.0.1:11434")
 DEFAULT_MODEL = os.getenv("OLLAMA_MODEL", "phi3:mini")
+HEDGE_ENABLED = flag("AIOS_LLM_HEDGE")
+HEDGE_DEFAULT_MS = int(os.getenv("AIOS_HEDGE_DEFAULT_MS", "2500") or "2500")
+LOGGER = logging.getLogger(__name__)
+
+
+def _chat_payload(
+    model: str,
+    messages: List[Dict[str, Any]],
+    temperature: Optional[float],
+    stream: bool,
+    format: Optional[Any] = None,
+    plan: Optional[GenerationPlan] = None,
+    logprobs: bool = False,
+) -> Dict[str, Any]:
+    payload: Dict[str, Any] = {"model": model, "messages": messages, "stream": stream}
+    # One num_ctx per model, the same one residency warms with, so Ollama never reloads the runner.
+    options: Dict[str, Any] = {"num_ctx": context_window(model)}
+    if temperature is not None:
+        options["temperature"] = temperature
+    if plan is not None:
+        options.update(plan.options(model))
+        payload["keep_alive"] = plan.keep_alive
+    payload["options"] = options
+    if format is not None:
+        payload["format"] = format
+    if logprobs:
+        payload["logprobs"] = True
+    return payload
+
+
+def _logprob_values(data: Dict[str, Any]) -> List[float]:
+    entries = data.get("logprobs") or []
+    return [float(e["logprob"]) for e in entries if isinstance(e, dict) and e.get("logprob") is not None]
+
+
+def _record_eval(stats: Dict[str, Any], data: Dict[str, Any], fallback_count: int, elapsed: float) -> None:
+    """Copy Ollama's generation counters from a final response into ``stats``."""
+    eval_count = data.get("eval_count") or fallback_count
+    eval_ns = data.get("eval_duration")
+    seconds = eval_ns / 1e9 if eval_ns else elapsed
+    stats["eval_count"] = eval_count
+    stats["eval_duration_ms"] = round(seconds * 1000, 1)
+    stats["tokens_per_sec"] = round(eval_count / seconds, 2) if seconds else None
+    if data.get("prompt_eval_count") is not None:
+        stats["prompt_eval_count"] = data["prompt_eval_count"]
+    if data.get("done_reason"):
+        stats["done_reason"] = data["done_reason"]
 
 
 async def _try_generate(
-    client: httpx.AsyncClient,
+    client: OllamaClient,
     model: str,
     messages: List[Dict[str, Any]],
     temperature: Optional[float] = None,
+    priority: int = admission.NORMAL,
+    stats: Optional[Dict[str, Any]] = None,
+    format: Optional[Any] = None,
+    plan: Optional[GenerationPlan] = None,
+    logprobs: bool = False,
 ) -> str:
-    payload: Dict[str, Any] = {"model": model, "messages": messages, "stream": False}
-    if temperature is not None:
-        payload["options"] = {"temperature": temperature}
-    response = await client.post(
-        f"{OLLAMA_URL}/api/chat",
-        json=payload,
-        timeout=60.0,
+    payload = _chat_payload(
+        model, messages, temperature, stream=False, format=format, plan=plan, logprobs=logprobs
     )
+    try:
+        async with admission.slot(model, priority) as slot:
+            if stats is not None:
+                stats["queue_wait_ms"] = slot["queue_wait_ms"]
+            start = time.perf_counter()
+            response = await client.post("/api/chat", payload)
+    except httpx.TimeoutException:
+        breakers.record_failure(model, "timeout")
+        raise
+    except httpx.HTTPError as exc:
+        breakers.record_failure(model, type(exc).__name__)
+        raise
     if response.status_code == 200:
         data = response.json()
         message = data.get("message", {})
@@ -35,14 +105,103 @@ async def _try_generate(
             or data.get("response")
         )
         if isinstance(content, str):
+            elapsed = time.perf_counter() - start
+            breakers.record_success(model, elapsed * 1000)
+            residency.mark_used(model)
+            if stats is not None:
+                _record_eval(stats, data, 0, elapsed)
+                values = _logprob_values(data)
+                if values:
+                    stats["mean_logprob"] = round(sum(values) / len(values), 4)
             return content.strip()
+        breakers.record_failure(model, "missing text content")
         raise ServiceUnavailableError("Ollama response missing text content")
 
+    breakers.record_failure(model, response.text[:120], status=response.status_code)
     raise ServiceUnavailableError(
         f"Ollama {model} HTTP {response.status_code}: {response.text[:200]}"
     )
 
 
+async def _try_stream(
+    client: OllamaClient,
+    model: str,
+    messages: List[Dict[str, Any]],
+    temperature: Optional[float],
+    stats: Optional[Dict[str, Any]],
+    priority: int = admission.NORMAL,
+    format: Optional[Any] = None,
+    plan: Optional[GenerationPlan] = None,
+    logprobs: bool = False,
+    on_admitted: Optional[Callable[[], None]] = None,
+) -> AsyncIterator[str]:
+    payload = _chat_payload(
+        model, messages, temperature, stream=True, format=format, plan=plan, logprobs=logprobs
+    )
+    try:
+        async with admission.slot(model, priority) as slot:
+            if stats is not None:
+                stats["queue_wait_ms"] = slot["queue_wait_ms"]
+            if on_admitted is not None:
+                on_admitted()
+            start = time.perf_counter()
+            async with client.stream("/api/chat", payload) as response:
+                if response.status_code != 200:
+                    body = (await response.aread()).decode("utf-8", errors="ignore")
+                    breakers.record_failure(model, body[:120], status=response.status_code)
+                    raise ServiceUnavailableError(f"Ollama {model} HTTP {response.status_code}: {body[:200]}")
+                async for chunk in _iter_stream(response, model, start, stats):
+                    yield chunk
+    except GeneratorExit:
+        # The caller stopped reading (e.g. a complete tool call was already
+        # decoded); the model answered fine, so count it as healthy.
+        breakers.record_success(model, (time.perf_counter() - start) * 1000)
+        residency.mark_used(model)
+        raise
+    except httpx.TimeoutException:
+        breakers.record_failure(model, "timeout")
+        raise
+    except httpx.HTTPError as exc:
+        breakers.record_failure(model, type(exc).__name__)
+        raise
+    breakers.record_success(model, (time.perf_counter() - start) * 1000)
+    residency.mark_used(model)
+
+
+async def _iter_stream(
+    response: httpx.Response,
+    model: str,
+    start: float,
+    stats: Optional[Dict[str, Any]],
+) -> AsyncIterator[str]:
+    chunks = 0
+    logprob_sum, logprob_n = 0.0, 0
+    async for line in response.aiter_lines():
+        if not line.strip():
+            continue
+        data = json.loads(line)
+        if data.get("error"):
+            breakers.record_failure(model, str(data["error"])[:120])
+            raise ServiceUnavailableError(f"Ollama {model}: {str(data['error'])[:200]}")
+        content = (data.get("message") or {}).get("content") or data.get("response") or ""
+        values = _logprob_values(data)
+        if values:
+            logprob_sum += sum(values)
+            logprob_n += len(values)
+            if stats is not None:
+                stats["mean_logprob"] = round(logprob_sum / logprob_n, 4)
+        if content:
+            chunks += 1
+            if stats is not None and "gen_ttft_ms" not in stats:
+                stats["gen_ttft_ms"] = (time.perf_counter() - start) * 1000
+            yield content
+        if data.get("done"):
+            if stats is not None:
+                stats["stream_model"] = model
+                _record_eval(stats, data, chunks, time.perf_counter() - start)
+            break
+
+
 def _build_fallbacks(chosen: str) -> List[str]:
     fallbacks = [chosen]
     if "llama3:8b" in chosen:
@@ -51,23 +210,332 @@ def _build_fallbacks(chosen: str) -> List[str]:
         fallbacks += ["phi3:mini"]
     elif chosen != DEFAULT_MODEL:
         fallbacks.append(DEFAULT_MODEL)
-    return fallbacks
+    # Skip rungs whose circuit is open, but never leave the ladder empty.
+    healthy = [name for name in fallbacks if breakers.available(name)]
+    return healthy or fallbacks
+
+
+async def _probe_model(model: str) -> bool:
+    payload = _chat_payload(model, [{"role": "user", "content": "ping"}], None, stream=False)
+    payload["options"]["num_predict"] = 1
+    response = await get_client().post("/api/chat", payload, read_timeout=30.0)
+    return response.status_code == 200
+
+
+breakers.register_prober(_probe_model)
+
+
+def _admit(
+    model: str,
+    priority: int,
+    latency_budget_ms: Optional[int],
+    stats: Dict[str, Any],
+) -> str:
+    """Model to queue on: ``model``, or the fast tier when ``model``'s predicted wait exceeds the budget.
+
+    When neither fits, the shorter queue is used; with ``AIOS_ADMISSION_REJECT`` on,
+    AdmissionRejected is raised instead.
+    """
+    wait = admission.predicted_wait_ms(model, priority)
+    info: Dict[str, Any] = {
+        "priority": admission.PRIORITY_NAMES.get(priority, str(priority)),
+        "predicted_wait_ms": round(wait, 1),
+    }
+    stats["admission"] = info
+    if latency_budget_ms is None or wait <= latency_budget_ms:
+        return model
+    fast = REGISTRY["fast"].name
+    fast_wait: Optional[float] = None
+    if fast != model and breakers.available(fast):
+        fast_wait = admission.predicted_wait_ms(fast, priority)
+        if fast_wait <= latency_budget_ms:
+            info.update(downgraded_from=model, predicted_wait_ms=round(fast_wait, 1))
+            LOGGER.info("llm_admission_downgrade", extra={"from": model, "to": fast, "wait_ms": wait})
+            return fast
+    if admission.REJECT_ENABLED:
+        info["rejected"] = True
+        raise admission.AdmissionRejected(model, wait, latency_budget_ms)
+    info["over_budget"] = True
+    if fast_wait is not None and fast_wait < wait:
+        info.update(downgraded_from=model, predicted_wait_ms=round(fast_wait, 1))
+        return fast
+    return model
+
+
+@dataclass(eq=False)
+class _HedgeAttempt:
+    model: str
+    launched: float
+    # Set once the admission slot is held: time spent queued behind other turns is not a stall.
+    started: Optional[float] = None
+    admitted: asyncio.Event = field(default_factory=asyncio.Event)
+    first_byte: asyncio.Event = field(default_factory=asyncio.Event)
+    # Per-attempt generation stats; only the winner's are copied into the turn's stats.
+    stats: Dict[str, Any] = field(default_factory=dict)
+
+    def mark_admitted(self) -> None:
+        self.started = time.perf_counter()
+        self.admitted.set()
+
+
+def _hedge_deadline_s(model: str) -> float:
+    info = model_info(model)
+    return (info.hedge_after_ms if info else HEDGE_DEFAULT_MS) / 1000
+
+
+async def _drain(
+    chunks: AsyncIterator[str],
+    stop_on_tool_call: bool,
+    stats: Optional[Dict[str, Any]],
+    on_chunk: Optional[Any] = None,
+) -> str:
+    """Concatenate ``chunks``; with ``stop_on_tool_call`` the stream is closed as soon
+    as a complete top-level ``{"tool_call": ...}`` object has been decoded."""
+    scanner = ToolCallScanner() if stop_on_tool_call else None
+    parts: List[str] = []
+    async with aclosing(chunks) as stream:
+        async for chunk in stream:
+            if on_chunk is not None:
+                on_chunk()
+            parts.append(chunk)
+            if scanner is not None and scanner.feed(chunk) is not None:
+                if stats is not None:
+                    stats["tool_call_early_stop"] = True
+                return scanner.text
+    return "".join(parts).strip()
+
+
+async def _collect_stream(
+    client: OllamaClient,
+    attempt: _HedgeAttempt,
+    messages: List[Dict[str, Any]],
+    temperature: Optional[float],
+    priority: int,
+    format: Optional[Any] = None,
+    stop_on_tool_call: bool = False,
+    plan: Optional[GenerationPlan] = None,
+    logprobs: bool = False,
+) -> str:
+    text = await _drain(
+        _try_stream(
+            client,
+            attempt.model,
+            messages,
+            temperature,
+            attempt.stats,
+            priority,
+            format,
+            plan,
+            logprobs,
+            on_admitted=attempt.mark_admitted,
+        ),
+        stop_on_tool_call,
+        attempt.stats,
+        on_chunk=attempt.first_byte.set,
+    )
+    if not text:
+        raise ServiceUnavailableError(f"Ollama {attempt.model} returned no text")
+    return text
+
+
+async def _hedged_generate(
+    client: OllamaClient,
+    fallbacks: List[str],
+    messages: List[Dict[str, Any]],
+    temperature: Optional[float],
+    stats: Dict[str, Any],
+    priority: int = admission.NORMAL,
+    format: Optional[Any] = None,
+    stop_on_tool_call: bool = False,
+    plan: Optional[GenerationPlan] = None,
+    logprobs: bool = False,
+) -> str:
+    """Walk the fallback ladder, firing the next rung early when the current one stalls.
+
+    A rung is hedged when it has not produced its first byte within its tier's
+    ``hedge_after_ms`` of getting its admission slot; it is also replaced immediately
+    when it fails. The first successful rung wins and every other in-flight attempt
+    is cancelled.
+    """
+    start = time.perf_counter()
+    pending = list(fallbacks)
+    running: Dict[asyncio.Task, _HedgeAttempt] = {}
+    hedges: List[Dict[str, Any]] = []
+    last_err: Optional[BaseException] = None
+    admission_wait: Optional[asyncio.Task] = None
+
+    def launch() -> _HedgeAttempt:
+        attempt = _HedgeAttempt(pending.pop(0), time.perf_counter())
+        task = asyncio.create_task(
+            _collect_stream(
+                client, attempt, messages, temperature, priority, format, stop_on_tool_call, plan, logprobs
+            )
+        )
+        running[task] = attempt
+        return attempt
+
+    newest = launch()
+    try:
+        while running:
+            timeout = None
+            waiting_on = set(running)
+            if pending and not newest.first_byte.is_set():
+                if newest.started is None:
+                    # Still queued: wake when the slot is granted and start its clock then.
+                    if admission_wait is not None:
+                        admission_wait.cancel()
+                    admission_wait = asyncio.create_task(newest.admitted.wait())
+                    waiting_on.add(admission_wait)
+                else:
+                    deadline = newest.started + _hedge_deadline_s(newest.model)
+                    timeout = max(0.0, deadline - time.perf_counter())
+            done, _ = await asyncio.wait(waiting_on, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if admission_wait is not None:
+                done.discard(admission_wait)
+                admission_wait.cancel()
+                admission_wait = None
+            if not done:
+                if timeout is not None and not newest.first_byte.is_set():
+                    stalled = newest
+                    newest = launch()
+                    hedges.append(
+                        {
+                            "stalled": stalled.model,
+                            "fired": newest.model,
+                            "delay_ms": (newest.launched - stalled.launched) * 1000,
+                        }
+                    )
+                continue
+            for task in done:
+                attempt = running.pop(task)
+                exc = task.exception()
+                if exc is None:
+                    stats.update(attempt.stats)
+                    stats["model_used"] = attempt.model
+                    if hedges:
+                        stats["hedge"] = {
+                            "winner": attempt.model,
+                            "fired": hedges,
+                            "cancelled": [other.model for other in running.values()],
+                            "total_ms": (time.perf_counter() - start) * 1000,
+                        }
+                        LOGGER.info("llm_hedge", extra=stats["hedge"])
+                    return task.result()
+                last_err = exc
+            if pending and (not running or newest not in running.values()):
+                newest = launch()
+    finally:
+        if admission_wait is not None:
+            admission_wait.cancel()
+        for task in running:
+            task.cancel()
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+    raise ServiceUnavailableError(str(last_err) if last_err else "LLM unavailable")
 
 
 async def generate(
     messages: List[Dict[str, Any]],
     model: Optional[str] = None,
     temperature: Optional[float] = None,
+    stats: Optional[Dict[str, Any]] = None,
+    priority: int = admission.NORMAL,
+    latency_budget_ms: Optional[int] = None,
+    format: Optional[Any] = None,
+    stop_on_tool_call: bool = False,
+    plan: Optional[GenerationPlan] = None,
+    logprobs: bool = False,
 ) -> str:
+    """Return the full completion, walking the fallback ladder on failure.
+
+    With ``AIOS_LLM_HEDGE`` on, slow rungs are hedged (see ``_hedged_generate``).
+    Requests queue per model by ``priority``; see ``_admit`` for the budget check.
+    ``format`` is passed through as Ollama's ``format`` (``"json"`` or a JSON schema).
+    With ``stop_on_tool_call`` the completion is streamed and cut off as soon as a
+    complete ``{"tool_call": ...}`` object has been decoded; only that object is returned.
+    ``plan`` (see ``generation.py``) adds ``num_predict``/``num_ctx``/``stop`` and ``keep_alive``.
+    ``logprobs`` asks Ollama for token log-probabilities, reported as ``stats["mean_logprob"]``.
+    ``stats`` (if given) receives ``model_used``, ``admission``, ``queue_wait_ms``,
+    ``eval_count``/``eval_duration_ms``, ``tool_call_early_stop`` and, when a hedge fired, ``hedge``.
+    """
     if not messages:
         raise ServiceUnavailableError("No messages provided for generation")
 
-    fallbacks = _build_fallbacks(model or DEFAULT_MODEL)
-    async with httpx.AsyncClient() as client:
-        last_err: Optional[Exception] = None
-        for target_model in fallbacks:
-            try:
-                return await _try_generate(client, target_model, messages, temperature)
-            except Exception as exc:
-                last_err = exc
-        raise ServiceUnavailableError(str(last_err) if last_err else "LLM unavailable")
+    stats = stats if stats is not None else {}
+    fallbacks = _build_fallbacks(_admit(model or DEFAULT_MODEL, priority, latency_budget_ms, stats))
+    client = get_client()
+    if HEDGE_ENABLED and len(fallbacks) > 1:
+        return await _hedged_generate(
+            client, fallbacks, messages, temperature, stats, priority, format, stop_on_tool_call, plan, logprobs
+        )
+
+    last_err: Optional[Exception] = None
+    for target_model in fallbacks:
+        try:
+            if stop_on_tool_call:
+                reply = await _drain(
+                    _try_stream(
+                        client, target_model, messages, temperature, stats, priority, format, plan, logprobs
+                    ),
+                    True,
+                    stats,
+                )
+                if not reply:
+                    raise ServiceUnavailableError(f"Ollama {target_model} returned no text")
+            else:
+                reply = await _try_generate(
+                    client, target_model, messages, temperature, priority, stats, format, plan, logprobs
+                )
+            stats["model_used"] = target_model
+            return reply
+        except Exception as exc:
+            last_err = exc
+    raise ServiceUnavailableError(str(last_err) if last_err else "LLM unavailable")
+
+
+async def stream_generate(
+    messages: List[Dict[str, Any]],
+    model: Optional[str] = None,
+    temperature: Optional[float] = None,
+    stats: Optional[Dict[str, Any]] = None,
+    priority: int = admission.NORMAL,
+    latency_budget_ms: Optional[int] = None,
+    format: Optional[Any] = None,
+    plan: Optional[GenerationPlan] = None,
+) -> AsyncIterator[str]:
+    """Yield content chunks as Ollama emits them.
+
+    Falls back to the next model only while nothing has been yielded yet; once
+    tokens reach the caller a failure is raised instead of switching models.
+    Closing the iterator early (``aclose``) cancels the Ollama request.
+    ``stats`` (if given) receives ``model_used``, ``gen_ttft_ms``, ``eval_count``,
+    ``eval_duration_ms`` and ``tokens_per_sec``.
+    """
+    if not messages:
+        raise ServiceUnavailableError("No messages provided for generation")
+
+    client = get_client()
+    admit_stats = stats if stats is not None else {}
+    chosen = _admit(model or DEFAULT_MODEL, priority, latency_budget_ms, admit_stats)
+    last_err: Optional[Exception] = None
+    for target_model in _build_fallbacks(chosen):
+        started = False
+        try:
+            async with aclosing(
+                _try_stream(client, target_model, messages, temperature, stats, priority, format, plan)
+            ) as chunks:
+                async for chunk in chunks:
+                    if not started and stats is not None:
+                        stats["model_used"] = target_model
+                    started = True
+                    yield chunk
+            return
+        except ServiceUnavailableError as exc:
+            if started:
+                raise
+            last_err = exc
+        except Exception as exc:
+            if started:
+                raise ServiceUnavailableError(str(exc)) from exc
+            last_err = exc
+    raise ServiceUnavailableError(str(last_err) if last_err else "LLM unavailable")
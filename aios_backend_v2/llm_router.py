@@ -5,19 +5,79 @@ import re
 from dataclasses import dataclass
 from typing import Dict, List, Optional
 
+from . import latency_router
+from .runtime import breakers, residency
+
 
 @dataclass
 class ModelInfo:
     name: str
     tier: str  # "fast" | "mid" | "deep"
+    hedge_after_ms: int = 2500  # first-byte deadline before the next rung is fired
+    num_ctx: int = 4096  # context window the prompt plus reply must fit in
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)) or default)
+
 
+DEFAULT_NUM_CTX = _env_int("AIOS_NUM_CTX", 4096)
 
 REGISTRY: Dict[str, ModelInfo] = {
-    "fast": ModelInfo(os.getenv("MODEL_FAST", "qwen2.5:3b-instruct"), "fast"),
-    "mid": ModelInfo(os.getenv("MODEL_MID", "phi3:mini"), "mid"),
-    "deep": ModelInfo(os.getenv("MODEL_DEEP", "llama3:8b"), "deep"),
+    "fast": ModelInfo(
+        os.getenv("MODEL_FAST", "qwen2.5:3b-instruct"),
+        "fast",
+        _env_int("AIOS_HEDGE_FAST_MS", 1500),
+        _env_int("AIOS_NUM_CTX_FAST", DEFAULT_NUM_CTX),
+    ),
+    "mid": ModelInfo(
+        os.getenv("MODEL_MID", "phi3:mini"),
+        "mid",
+        _env_int("AIOS_HEDGE_MID_MS", 2500),
+        _env_int("AIOS_NUM_CTX_MID", DEFAULT_NUM_CTX),
+    ),
+    "deep": ModelInfo(
+        os.getenv("MODEL_DEEP", "llama3:8b"),
+        "deep",
+        _env_int("AIOS_HEDGE_DEEP_MS", 4000),
+        _env_int("AIOS_NUM_CTX_DEEP", DEFAULT_NUM_CTX),
+    ),
 }
 
+
+def model_info(name: str) -> Optional[ModelInfo]:
+    for info in REGISTRY.values():
+        if info.name == name:
+            return info
+    return None
+
+
+def context_window(name: Optional[str]) -> int:
+    info = model_info(name) if name else None
+    return info.num_ctx if info else DEFAULT_NUM_CTX
+
+
+def budget_model(force: Optional[str] = None) -> str:
+    """Model whose context window the prompt must fit before routing has run.
+
+    The prompt is assembled before ``select_model`` and any rung of the fallback
+    ladder may serve it, so unless a model is forced the smallest window wins.
+    """
+    if force:
+        return force
+    return min(REGISTRY.values(), key=lambda info: info.num_ctx).name
+
+# Preferred substitutes when a tier's circuit is open, nearest capability first.
+TIER_SUBSTITUTES: Dict[str, List[str]] = {
+    "fast": ["mid", "deep"],
+    "mid": ["fast", "deep"],
+    "deep": ["mid", "fast"],
+}
+
+TIGHT_BUDGET_MS = 1200
+# Tiers acceptable under a tight latency budget, in order of preference.
+TIGHT_BUDGET_TIERS = ["fast", "mid"]
+
 TOOLY = re.compile(r"\\b(plan|steps?|install|json|schema|tool|command|code|api|curl)\\b", re.I)
 DEEPY = re.compile(r"\\b(analy[sz]e|compare|trade-?offs?|architecture|design|benchmark|optimi[sz]e)\\b", re.I)
 
@@ -26,21 +86,69 @@ def select_model(
     messages: List[Dict],
     latency_budget_ms: Optional[int] = None,
     force: Optional[str] = None,
+    turn_kind: Optional[str] = None,
 ) -> str:
     if force:
         return force
+    if latency_router.LEARNED_ROUTER_ENABLED and latency_budget_ms is not None:
+        learned = _learned_model(messages, latency_budget_ms, turn_kind or "text")
+        if learned:
+            return learned
+    if latency_budget_ms is not None and latency_budget_ms < TIGHT_BUDGET_MS:
+        resident = _resident_tier(TIGHT_BUDGET_TIERS)
+        if resident:
+            return resident
+    return _healthy_tier(_select_tier(messages, latency_budget_ms))
+
+
+def prompt_bytes(messages: List[Dict]) -> int:
+    return sum(len((m.get("content") or "").encode("utf-8")) for m in messages)
+
+
+def _learned_model(messages: List[Dict], latency_budget_ms: int, turn_kind: str) -> Optional[str]:
+    """Highest healthy tier whose learned p95 for this prompt size fits the budget."""
+    candidates = [
+        REGISTRY[tier].name
+        for tier in ("deep", "mid", "fast")
+        if breakers.available(REGISTRY[tier].name)
+    ]
+    return latency_router.get_model().choose(
+        candidates, turn_kind, prompt_bytes(messages), latency_budget_ms
+    )
+
+
+def _resident_tier(tiers: List[str]) -> Optional[str]:
+    """First healthy model among ``tiers`` that Ollama already has loaded."""
+    if not residency.known():
+        return None
+    for tier in tiers:
+        name = REGISTRY[tier].name
+        if residency.is_resident(name) and breakers.available(name):
+            return name
+    return None
+
+
+def _healthy_tier(tier: str) -> str:
+    """Return the tier's model, or the nearest substitute whose circuit is closed."""
+    for candidate in [tier, *TIER_SUBSTITUTES.get(tier, [])]:
+        name = REGISTRY[candidate].name
+        if breakers.available(name):
+            return name
+    return REGISTRY[tier].name
+
 
+def _select_tier(messages: List[Dict], latency_budget_ms: Optional[int]) -> str:
     text = " ".join(
         m.get("content", "") for m in messages[-3:] if m.get("content")
     )[:4000]
     n_chars = len(text)
 
-    if latency_budget_ms is not None and latency_budget_ms < 1200:
-        return REGISTRY["fast"].name
+    if latency_budget_ms is not None and latency_budget_ms < TIGHT_BUDGET_MS:
+        return "fast"
 
     if n_chars >= 600 or DEEPY.search(text) or len(messages) > 3:
-        return REGISTRY["deep"].name
+        return "deep"
     if n_chars >= 120 or TOOLY.search(text):
-        return REGISTRY["mid"].name
+        return "mid"
 
-    return REGISTRY["fast"].name
+    return "fast"
@@ -10,6 +10,7 @@ from .settings import LOG_DIR
 
 LOG_PATH = os.path.join(LOG_DIR, "tools.ndjson")
 CHAT_LOG_PATH = os.path.join(LOG_DIR, "chat_turns.ndjson")
+SPEECH_LOG_PATH = os.path.join(LOG_DIR, "speech.ndjson")
 MAX_FIELD_BYTES = 4096
 MAX_LOG_BYTES = 10 * 1024 * 1024
 _LAST_ROTATION: Dict[str, float] = {}
@@ -55,6 +56,16 @@ def log_chat_turn(data: Dict[str, Any]) -> None:
         fh.write(json.dumps(entry) + "\n")
 
 
+def log_speech_turn(data: Dict[str, Any]) -> None:
+    _ensure_log_dir()
+    _rotate_if_needed(SPEECH_LOG_PATH)
+    entry = {"ts": time.time()}
+    entry.update(data)
+    _truncate_large_fields(entry)
+    with open(SPEECH_LOG_PATH, "a", encoding="utf-8") as fh:
+        fh.write(json.dumps(entry) + "\n")
+
+
 def _truncate_large_fields(entry: Dict[str, Any]) -> None:
     for key, value in list(entry.items()):
         truncated = _maybe_truncate(value)
@@ -104,7 +115,7 @@ def _rotate_if_needed(path: str) -> None:
 
 def get_log_stats() -> Dict[str, Dict[str, Optional[float]]]:
     stats = {}
-    for label, path in (("chat", CHAT_LOG_PATH), ("tools", LOG_PATH)):
+    for label, path in (("chat", CHAT_LOG_PATH), ("tools", LOG_PATH), ("speech", SPEECH_LOG_PATH)):
         size = os.path.getsize(path) if os.path.exists(path) else 0
         stats[label] = {
             "size": size,
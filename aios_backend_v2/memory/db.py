@@ -292,3 +292,11 @@ def search_app_index_by_name(term: str, limit: int = 10) -> List[Dict[str, objec
     )
     rows = cur.fetchall()
     return [dict(row) for row in rows]
+
+
+def list_app_index(limit: int = 500) -> List[Dict[str, object]]:
+    cur = get_connection().execute(
+        "SELECT id,name,generic,exec,source FROM app_index ORDER BY last_seen DESC LIMIT ?",
+        (limit,),
+    )
+    return [dict(row) for row in cur.fetchall()]
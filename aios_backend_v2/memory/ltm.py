@@ -77,6 +77,21 @@ def _embed(text: str):
     return np.asarray(vec, dtype="float32")
 
 
+def embed(text: str):
+    """Normalized sentence embedding, or None when the embedding model is unavailable.
+
+    Unlike ``_embed`` this never returns the byte-histogram fallback, which is
+    fine for ranking memories but not for deciding that two texts mean the same.
+    """
+    if np is None or _load_embedder() is None:
+        return None
+    return _embed(text)
+
+
+def similarity(a, b) -> float:
+    return _dot(a, b)
+
+
 def _rebuild_index() -> None:
     global _index, _embedding_cache
     if not _memories:
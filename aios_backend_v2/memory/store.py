@@ -96,6 +96,14 @@ def search_app_index_by_name(term: str, limit: int = 10) -> List[Dict[str, Any]]
         return []
 
 
+def list_app_index(limit: int = 500) -> List[Dict[str, Any]]:
+    try:
+        return db.list_app_index(limit)
+    except Exception as exc:
+        LOGGER.error("memory_db_list_app_index_failed", exc_info=exc)
+        return []
+
+
 def list_aliases(limit: int = 10) -> List[Dict[str, Any]]:
     try:
         conn = db.get_connection()
@@ -0,0 +1,163 @@
+"""App-lifetime HTTP client for the local Ollama server."""
+
+from __future__ import annotations
+
+import contextlib
+import os
+from typing import Any, AsyncIterator, Dict, Optional
+
+import httpx
+
+from . import flag
+
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://127.0.0.1:11434").rstrip("/")
+CONNECT_TIMEOUT = float(os.getenv("AIOS_OLLAMA_CONNECT_TIMEOUT", "2.0") or "2.0")
+READ_TIMEOUT = float(os.getenv("AIOS_OLLAMA_READ_TIMEOUT", "60.0") or "60.0")
+POOL_MAX = int(os.getenv("AIOS_OLLAMA_POOL_MAX", "8") or "8")
+KEEPALIVE_MAX = int(os.getenv("AIOS_OLLAMA_KEEPALIVE_MAX", "4") or "4")
+KEEPALIVE_EXPIRY = float(os.getenv("AIOS_OLLAMA_KEEPALIVE_EXPIRY", "120") or "120")
+HTTP2_ENABLED = flag("AIOS_OLLAMA_HTTP2")
+
+try:  # pragma: no cover - optional dependency
+    import h2  # type: ignore  # noqa: F401
+
+    _H2_AVAILABLE = True
+except Exception:  # noqa: BLE001
+    _H2_AVAILABLE = False
+
+
+def _timeout(read: Optional[float] = None) -> httpx.Timeout:
+    return httpx.Timeout(
+        connect=CONNECT_TIMEOUT,
+        read=READ_TIMEOUT if read is None else read,
+        write=CONNECT_TIMEOUT,
+        pool=CONNECT_TIMEOUT,
+    )
+
+
+class OllamaClient:
+    """Pooled keep-alive client shared by generation, health checks and embeddings."""
+
+    def __init__(self, base_url: str = OLLAMA_URL) -> None:
+        self.base_url = base_url.rstrip("/")
+        self._client: Optional[httpx.AsyncClient] = None
+        self._in_flight = 0
+        self._peak_in_flight = 0
+        self._requests = 0
+        self._errors = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=_timeout(),
+                limits=httpx.Limits(
+                    max_connections=POOL_MAX,
+                    max_keepalive_connections=KEEPALIVE_MAX,
+                    keepalive_expiry=KEEPALIVE_EXPIRY,
+                ),
+                http2=HTTP2_ENABLED and _H2_AVAILABLE,
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+    @contextlib.asynccontextmanager
+    async def _track(self) -> AsyncIterator[None]:
+        self._in_flight += 1
+        self._requests += 1
+        self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+        try:
+            yield
+        except Exception:
+            self._errors += 1
+            raise
+        finally:
+            self._in_flight -= 1
+
+    async def post(
+        self,
+        path: str,
+        payload: Dict[str, Any],
+        *,
+        read_timeout: Optional[float] = None,
+    ) -> httpx.Response:
+        async with self._track():
+            return await self.client.post(path, json=payload, timeout=_timeout(read_timeout))
+
+    @contextlib.asynccontextmanager
+    async def stream(
+        self,
+        path: str,
+        payload: Dict[str, Any],
+        *,
+        read_timeout: Optional[float] = None,
+    ) -> AsyncIterator[httpx.Response]:
+        async with self._track():
+            async with self.client.stream(
+                "POST", path, json=payload, timeout=_timeout(read_timeout)
+            ) as response:
+                yield response
+
+    async def get(self, path: str, *, read_timeout: Optional[float] = None) -> httpx.Response:
+        async with self._track():
+            return await self.client.get(path, timeout=_timeout(read_timeout))
+
+    def pool_stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {
+            "in_flight": self._in_flight,
+            "peak_in_flight": self._peak_in_flight,
+            "requests": self._requests,
+            "errors": self._errors,
+            "max_connections": POOL_MAX,
+            "http2": bool(HTTP2_ENABLED and _H2_AVAILABLE),
+            "open": self._client is not None and not self._client.is_closed,
+        }
+        # httpx does not expose pool occupancy publicly; read it from the
+        # httpcore pool when present and fall back to request counters only.
+        pool = getattr(getattr(self._client, "_transport", None), "_pool", None)
+        connections = getattr(pool, "connections", None)
+        if connections is not None:
+            idle = sum(1 for conn in connections if conn.is_idle())
+            stats["connections"] = len(connections)
+            stats["idle_connections"] = idle
+            stats["active_connections"] = len(connections) - idle
+        return stats
+
+
+_shared: Optional[OllamaClient] = None
+
+
+def get_client() -> OllamaClient:
+    global _shared
+    if _shared is None:
+        _shared = OllamaClient()
+    return _shared
+
+
+async def startup(base_url: Optional[str] = None) -> OllamaClient:
+    global _shared
+    if base_url and (_shared is None or _shared.base_url != base_url.rstrip("/")):
+        if _shared is not None:
+            await _shared.aclose()
+        _shared = OllamaClient(base_url)
+    client = get_client()
+    _ = client.client
+    return client
+
+
+async def shutdown() -> None:
+    global _shared
+    if _shared is not None:
+        await _shared.aclose()
+    _shared = None
+
+
+def pool_stats() -> Dict[str, Any]:
+    if _shared is None:
+        return {"open": False, "in_flight": 0, "requests": 0}
+    return _shared.pool_stats()
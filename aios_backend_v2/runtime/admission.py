@@ -0,0 +1,161 @@
+"""Priority admission in front of Ollama: bounded concurrency per model, ordered queues."""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from .. import flag
+from ..errors import ServiceUnavailableError
+
+# Match Ollama's own parallelism, so the queue only holds what Ollama would have queued anyway.
+MODEL_CONCURRENCY = max(
+    1, int(os.getenv("AIOS_LLM_CONCURRENCY") or os.getenv("OLLAMA_NUM_PARALLEL") or "4")
+)
+INTERACTIVE_BUDGET_MS = int(os.getenv("AIOS_INTERACTIVE_BUDGET_MS", "3000") or "3000")
+# Off: a turn whose predicted wait fits no tier is queued on the shorter wait rather than refused.
+REJECT_ENABLED = flag("AIOS_ADMISSION_REJECT")
+SERVICE_EWMA_ALPHA = 0.2
+DEFAULT_SERVICE_MS = 2000.0
+
+INTERACTIVE = 0
+NORMAL = 1
+BACKGROUND = 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", NORMAL: "normal", BACKGROUND: "background"}
+
+
+class AdmissionRejected(ServiceUnavailableError):
+    """The predicted queue wait does not fit the request's latency budget."""
+
+    def __init__(self, model: str, predicted_wait_ms: float, budget_ms: float) -> None:
+        super().__init__(
+            f"{model} busy: predicted wait {int(predicted_wait_ms)}ms exceeds {int(budget_ms)}ms budget"
+        )
+        self.model = model
+        self.predicted_wait_ms = predicted_wait_ms
+        self.budget_ms = budget_ms
+
+
+def priority_for(latency_budget_ms: Optional[int], background: bool = False) -> int:
+    if background:
+        return BACKGROUND
+    if latency_budget_ms is not None and latency_budget_ms <= INTERACTIVE_BUDGET_MS:
+        return INTERACTIVE
+    return NORMAL
+
+
+@dataclass
+class _Lane:
+    capacity: int
+    active: int = 0
+    waiters: List[Tuple[int, int, asyncio.Future]] = field(default_factory=list)
+    service_ms: float = DEFAULT_SERVICE_MS
+    admitted: int = 0
+    served: int = 0
+    queued: int = 0
+    max_wait_ms: float = 0.0
+    total_wait_ms: float = 0.0
+
+
+_lanes: Dict[str, _Lane] = {}
+_seq = itertools.count()
+
+
+def _lane(model: str) -> _Lane:
+    lane = _lanes.get(model)
+    if lane is None:
+        lane = _lanes[model] = _Lane(MODEL_CONCURRENCY)
+    return lane
+
+
+def _prior_service_ms(model: str) -> float:
+    """Service time to assume before ``model``'s lane has finished a request: its learned median."""
+    from .. import latency_router
+
+    learned = latency_router.get_model().percentile(model, "text", None, 0.5)
+    return learned if learned is not None else DEFAULT_SERVICE_MS
+
+
+def predicted_wait_ms(model: str, priority: int = NORMAL) -> float:
+    """Expected queue wait for a new request: work ahead of it divided across the slots."""
+    lane = _lane(model)
+    ahead = sum(1 for prio, _, fut in lane.waiters if prio <= priority and not fut.done())
+    if lane.active + ahead < lane.capacity:
+        return 0.0
+    rounds = (lane.active + ahead - lane.capacity) // lane.capacity + 1
+    service_ms = lane.service_ms if lane.served else _prior_service_ms(model)
+    # The running batch is on average half done.
+    return max(0.0, (rounds - 0.5) * service_ms)
+
+
+def _wake(lane: _Lane) -> None:
+    while lane.waiters and lane.active < lane.capacity:
+        _, _, fut = heapq.heappop(lane.waiters)
+        if fut.done():  # cancelled while queued
+            continue
+        lane.active += 1
+        fut.set_result(None)
+
+
+@asynccontextmanager
+async def slot(model: str, priority: int = NORMAL) -> AsyncIterator[Dict[str, float]]:
+    """Hold one of ``model``'s concurrency slots; yields ``{"queue_wait_ms": ...}``."""
+    lane = _lane(model)
+    start = time.perf_counter()
+    info: Dict[str, float] = {"queue_wait_ms": 0.0}
+    if lane.active < lane.capacity and not lane.waiters:
+        lane.active += 1
+    else:
+        fut: asyncio.Future = asyncio.get_running_loop().create_future()
+        heapq.heappush(lane.waiters, (priority, next(_seq), fut))
+        lane.queued += 1
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # Granted just as we were cancelled; hand the slot on.
+                lane.active -= 1
+                _wake(lane)
+            else:
+                fut.cancel()
+                lane.waiters = [w for w in lane.waiters if w[2] is not fut]
+                heapq.heapify(lane.waiters)
+            raise
+        info["queue_wait_ms"] = (time.perf_counter() - start) * 1000
+    lane.admitted += 1
+    lane.total_wait_ms += info["queue_wait_ms"]
+    lane.max_wait_ms = max(lane.max_wait_ms, info["queue_wait_ms"])
+    served = time.perf_counter()
+    try:
+        yield info
+    finally:
+        elapsed = (time.perf_counter() - served) * 1000
+        if lane.served:
+            lane.service_ms += SERVICE_EWMA_ALPHA * (elapsed - lane.service_ms)
+        else:
+            lane.service_ms = elapsed
+        lane.served += 1
+        lane.active -= 1
+        _wake(lane)
+
+
+def snapshot() -> Dict[str, Dict[str, object]]:
+    data: Dict[str, Dict[str, object]] = {}
+    for model, lane in _lanes.items():
+        data[model] = {
+            "capacity": lane.capacity,
+            "active": lane.active,
+            "waiting": sum(1 for *_, fut in lane.waiters if not fut.done()),
+            "service_ms": round(lane.service_ms, 1),
+            "admitted": lane.admitted,
+            "queued": lane.queued,
+            "avg_wait_ms": round(lane.total_wait_ms / lane.admitted, 1) if lane.admitted else 0.0,
+            "max_wait_ms": round(lane.max_wait_ms, 1),
+        }
+    return data
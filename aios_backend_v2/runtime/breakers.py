@@ -0,0 +1,167 @@
+"""Per-model circuit breakers fed by Ollama generation outcomes."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+LOGGER = logging.getLogger(__name__)
+
+FAILURE_THRESHOLD = int(os.getenv("AIOS_BREAKER_FAILURES", "3") or "3")
+OPEN_SECONDS = float(os.getenv("AIOS_BREAKER_OPEN_S", "30") or "30")
+SLOW_MS = float(os.getenv("AIOS_BREAKER_SLOW_MS", "20000") or "20000")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Statuses that mean the model itself is unusable (not pulled), so the circuit opens on
+# the first occurrence. A 500 can be a one-off (a bad request, a transient runner error)
+# and counts toward FAILURE_THRESHOLD like any other failure.
+_HARD_STATUSES = {404}
+
+
+@dataclass
+class Breaker:
+    model: str
+    state: str = CLOSED
+    consecutive_failures: int = 0
+    successes: int = 0
+    failures: int = 0
+    opened_ts: Optional[float] = None
+    last_error: Optional[str] = None
+    last_latency_ms: Optional[float] = None
+    probing: bool = False
+
+
+_breakers: Dict[str, Breaker] = {}
+_lock = threading.Lock()
+_prober: Optional[Callable[[str], Awaitable[bool]]] = None
+# The loop only keeps weak references to tasks; hold probes until they finish.
+_probe_tasks: Set["asyncio.Task[None]"] = set()
+
+
+def _get(model: str) -> Breaker:
+    breaker = _breakers.get(model)
+    if breaker is None:
+        breaker = _breakers[model] = Breaker(model)
+    return breaker
+
+
+def _refresh(breaker: Breaker, now: float) -> None:
+    if breaker.state == OPEN and breaker.opened_ts and now - breaker.opened_ts >= OPEN_SECONDS:
+        breaker.state = HALF_OPEN
+
+
+def _open(breaker: Breaker, reason: str) -> None:
+    if breaker.state != OPEN:
+        LOGGER.warning("model_circuit_open", extra={"model": breaker.model, "reason": reason})
+    breaker.state = OPEN
+    breaker.opened_ts = time.time()
+
+
+def register_prober(prober: Callable[[str], Awaitable[bool]]) -> None:
+    """Install the coroutine used to probe half-open models (set by llm.py)."""
+    global _prober
+    _prober = prober
+
+
+def record_success(model: str, latency_ms: float) -> None:
+    with _lock:
+        breaker = _get(model)
+        breaker.last_latency_ms = latency_ms
+        if latency_ms > SLOW_MS:
+            breaker.failures += 1
+            breaker.consecutive_failures += 1
+            breaker.last_error = f"slow:{int(latency_ms)}ms"
+            if breaker.consecutive_failures >= FAILURE_THRESHOLD:
+                _open(breaker, breaker.last_error)
+            return
+        breaker.successes += 1
+        breaker.consecutive_failures = 0
+        breaker.state = CLOSED
+        breaker.opened_ts = None
+
+
+def record_failure(model: str, reason: str, status: Optional[int] = None) -> None:
+    with _lock:
+        breaker = _get(model)
+        breaker.failures += 1
+        breaker.consecutive_failures += 1
+        breaker.last_error = f"HTTP {status}: {reason}" if status else reason
+        if (
+            breaker.state == HALF_OPEN
+            or (status in _HARD_STATUSES)
+            or breaker.consecutive_failures >= FAILURE_THRESHOLD
+        ):
+            _open(breaker, breaker.last_error)
+
+
+def state(model: str) -> str:
+    with _lock:
+        breaker = _breakers.get(model)
+        if breaker is None:
+            return CLOSED
+        _refresh(breaker, time.time())
+        return breaker.state
+
+
+def available(model: str) -> bool:
+    """True when the circuit is closed; half-open circuits trigger a background probe."""
+    current = state(model)
+    if current == HALF_OPEN:
+        _schedule_probe(model)
+    return current == CLOSED
+
+
+def _schedule_probe(model: str) -> None:
+    if _prober is None:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    with _lock:
+        breaker = _get(model)
+        if breaker.probing:
+            return
+        breaker.probing = True
+    task = loop.create_task(_run_probe(model))
+    _probe_tasks.add(task)
+    task.add_done_callback(_probe_tasks.discard)
+
+
+async def _run_probe(model: str) -> None:
+    start = time.perf_counter()
+    try:
+        ok = await _prober(model) if _prober else False
+    except Exception as exc:  # noqa: BLE001
+        ok = False
+        LOGGER.info("model_probe_failed", extra={"model": model, "error": str(exc)})
+    finally:
+        with _lock:
+            _get(model).probing = False
+    if ok:
+        record_success(model, (time.perf_counter() - start) * 1000)
+    else:
+        record_failure(model, "probe failed")
+
+
+def snapshot() -> Dict[str, Dict[str, object]]:
+    now = time.time()
+    with _lock:
+        data = {}
+        for name, breaker in _breakers.items():
+            _refresh(breaker, now)
+            data[name] = asdict(breaker)
+    return data
+
+
+def reset() -> None:
+    with _lock:
+        _breakers.clear()
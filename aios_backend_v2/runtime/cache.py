@@ -3,7 +3,7 @@ from __future__ import annotations
 import collections
 import threading
 import time
-from typing import Deque, Dict, List, Optional, Tuple, TYPE_CHECKING
+from typing import Any, Deque, Dict, List, Optional, Tuple, TYPE_CHECKING
 
 MAX_ENTRIES = 50
 TTL_SECONDS = 120
@@ -21,6 +21,7 @@ if TYPE_CHECKING:  # pragma: no cover
 _last_context_snapshot: Optional["ContextSnapshot"] = None
 _cache_hits = 0
 _cache_misses = 0
+_response_stats: Dict[str, int] = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "bypassed": 0, "evictions": 0}
 _lock = threading.Lock()
 _stats_lock = threading.Lock()
 
@@ -124,11 +125,18 @@ def get_last_alias_hit(phrase: str) -> Optional[str]:
     return None
 
 
-def stats_snapshot() -> Dict[str, int]:
+def record_response_cache(outcome: str) -> None:
+    """Count a response-cache outcome: exact_hits, semantic_hits, misses, bypassed or evictions."""
+    with _stats_lock:
+        _response_stats[outcome] = _response_stats.get(outcome, 0) + 1
+
+
+def stats_snapshot() -> Dict[str, Any]:
     with _stats_lock:
         hits = _cache_hits
         misses = _cache_misses
-    return {"hits": hits, "misses": misses}
+        response = dict(_response_stats)
+    return {"hits": hits, "misses": misses, "response_cache": response}
 
 
 def push_conversation_turn(user_text: str, assistant_text: str) -> None:
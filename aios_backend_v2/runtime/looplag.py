@@ -0,0 +1,74 @@
+"""Event-loop lag monitor: how late a periodic timer fires, over a sliding window."""
+
+from __future__ import annotations
+
+import asyncio
+import collections
+import math
+import os
+import time
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from .. import flag
+
+LOOP_LAG_ENABLED = flag("AIOS_LOOP_LAG_MONITOR")
+INTERVAL_SECONDS = float(os.getenv("AIOS_LOOP_LAG_INTERVAL_MS", "50") or "50") / 1000
+WINDOW_SECONDS = float(os.getenv("AIOS_LOOP_LAG_WINDOW_S", "10") or "10")
+
+_samples: Deque[Tuple[float, float]] = collections.deque()
+_max_ms = 0.0
+_task: Optional[asyncio.Task] = None
+
+
+def _record(now: float, lag_ms: float) -> None:
+    global _max_ms
+    _samples.append((now, lag_ms))
+    _max_ms = max(_max_ms, lag_ms)
+    while _samples and now - _samples[0][0] > WINDOW_SECONDS:
+        _samples.popleft()
+
+
+async def _loop() -> None:
+    while True:
+        expected = time.perf_counter() + INTERVAL_SECONDS
+        await asyncio.sleep(INTERVAL_SECONDS)
+        now = time.perf_counter()
+        _record(now, max(0.0, (now - expected) * 1000))
+
+
+async def startup() -> None:
+    global _task
+    if not LOOP_LAG_ENABLED or _task is not None:
+        return
+    _task = asyncio.create_task(_loop())
+
+
+async def shutdown() -> None:
+    global _task
+    if _task is None:
+        return
+    _task.cancel()
+    try:
+        await _task
+    except asyncio.CancelledError:
+        pass
+    _task = None
+
+
+def snapshot() -> Dict[str, Any]:
+    lags = sorted(lag for _, lag in _samples)
+    if not lags:
+        return {"enabled": LOOP_LAG_ENABLED, "samples": 0}
+
+    def rank(q: float) -> float:
+        return round(lags[max(0, math.ceil(q * len(lags)) - 1)], 2)
+
+    return {
+        "enabled": LOOP_LAG_ENABLED,
+        "samples": len(lags),
+        "window_s": WINDOW_SECONDS,
+        "p50_ms": rank(0.5),
+        "p99_ms": rank(0.99),
+        "window_max_ms": round(lags[-1], 2),
+        "max_ms": round(_max_ms, 2),
+    }
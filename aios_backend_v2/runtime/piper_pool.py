@@ -0,0 +1,299 @@
+"""Long-lived Piper workers that keep the voice model loaded between /tts requests.
+
+Each worker runs ``piper --json-input`` and receives one JSON line per
+utterance. Piper's raw output has no per-utterance framing, so every line asks
+for the WAV on the worker's own stdout and the RIFF length delimits it; Piper
+echoes the output path after each file, which the reader skips.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import collections
+import io
+import json
+import logging
+import os
+import shutil
+import time
+import wave
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from .. import flag
+from ..errors import ServiceUnavailableError
+
+LOGGER = logging.getLogger(__name__)
+
+PIPER_POOL_ENABLED = flag("AIOS_PIPER_POOL")
+POOL_SIZE = max(1, int(os.getenv("AIOS_PIPER_POOL_SIZE", "2") or "2"))
+REQUEST_TIMEOUT_SECONDS = float(os.getenv("AIOS_PIPER_TIMEOUT_S", "30") or "30")
+HEALTH_SECONDS = float(os.getenv("AIOS_PIPER_HEALTH_S", "30") or "30")
+MAX_RESTART_BACKOFF_SECONDS = 30.0
+PROBE_TEXT = "Ready."
+STDOUT_TARGET = "/dev/stdout"
+
+
+class _Worker:
+    def __init__(self, index: int) -> None:
+        self.index = index
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.stderr_tail: Deque[str] = collections.deque(maxlen=5)
+        self.stderr_task: Optional[asyncio.Task] = None
+        self.served = 0
+        self.failures = 0
+        self.last_ok = 0.0
+
+    def alive(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    async def start(self, piper_bin: str, voice: str) -> None:
+        self.process = await asyncio.create_subprocess_exec(
+            piper_bin,
+            "-m",
+            voice,
+            "-f",
+            STDOUT_TARGET,
+            "--json-input",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        self.stderr_task = asyncio.create_task(self._drain_stderr(self.process))
+
+    async def _drain_stderr(self, process: asyncio.subprocess.Process) -> None:
+        assert process.stderr is not None
+        async for line in process.stderr:
+            self.stderr_tail.append(line.decode("utf-8", "ignore").strip()[:200])
+
+    async def stop(self) -> None:
+        process, self.process = self.process, None
+        if process is not None and process.returncode is None:
+            process.kill()
+            try:
+                await process.wait()
+            except ProcessLookupError:
+                pass
+        if self.stderr_task is not None:
+            self.stderr_task.cancel()
+            self.stderr_task = None
+
+    async def _read_wav(self) -> bytes:
+        assert self.process is not None and self.process.stdout is not None
+        stdout = self.process.stdout
+        head = await stdout.readexactly(4)
+        while head != b"RIFF":
+            # The output path Piper echoes after each file; it may land before or after the WAV bytes.
+            await stdout.readline()
+            head = await stdout.readexactly(4)
+        size = await stdout.readexactly(4)
+        return head + size + await stdout.readexactly(int.from_bytes(size, "little"))
+
+    async def synthesize(self, text: str, timeout: float) -> bytes:
+        if not self.alive():
+            raise ServiceUnavailableError(f"piper worker {self.index} is not running")
+        assert self.process is not None and self.process.stdin is not None
+        line = json.dumps({"text": text, "output_file": STDOUT_TARGET}, ensure_ascii=False)
+        self.process.stdin.write(line.encode("utf-8") + b"\n")
+        await self.process.stdin.drain()
+        data = await asyncio.wait_for(self._read_wav(), timeout)
+        self.served += 1
+        self.last_ok = time.time()
+        return data
+
+
+_workers: List[_Worker] = []
+_idle: Optional[asyncio.Queue] = None
+_tasks: List[asyncio.Task] = []
+_command: Optional[Tuple[str, str]] = None
+_stats: Dict[str, Any] = {
+    "requests": 0,
+    "failures": 0,
+    "restarts": 0,
+    "waiting": 0,
+    "max_waiting": 0,
+    "total_ms": 0.0,
+    "last_error": None,
+}
+
+
+def running() -> bool:
+    return _idle is not None
+
+
+def split_wav(data: bytes) -> Tuple[bytes, int]:
+    """``(pcm, sample_rate)`` from a 16-bit mono WAV produced by Piper."""
+    try:
+        with wave.open(io.BytesIO(data), "rb") as wav:
+            return wav.readframes(wav.getnframes()), wav.getframerate()
+    except (wave.Error, EOFError) as exc:
+        raise ServiceUnavailableError("TTS produced non-WAV data") from exc
+
+
+async def _spawn(worker: _Worker) -> bool:
+    """Start ``worker`` and load its voice with a probe utterance."""
+    assert _command is not None
+    await worker.stop()
+    try:
+        await worker.start(*_command)
+        await worker.synthesize(PROBE_TEXT, REQUEST_TIMEOUT_SECONDS)
+    except Exception as exc:  # noqa: BLE001
+        _stats["last_error"] = f"worker {worker.index}: {exc or type(exc).__name__}"
+        LOGGER.warning(
+            "piper_worker_start_failed",
+            extra={"worker": worker.index, "error": str(exc), "stderr": list(worker.stderr_tail)},
+        )
+        await worker.stop()
+        return False
+    return True
+
+
+async def _restart(worker: _Worker) -> None:
+    """Respawn ``worker`` with backoff, then hand it back to the idle queue."""
+    while True:
+        _stats["restarts"] += 1
+        if await _spawn(worker):
+            worker.failures = 0
+            break
+        worker.failures += 1
+        await asyncio.sleep(min(2.0**worker.failures, MAX_RESTART_BACKOFF_SECONDS))
+    if _idle is None:
+        # The pool shut down while this worker was starting; do not leave its Piper behind.
+        await worker.stop()
+        return
+    LOGGER.info("piper_worker_ready", extra={"worker": worker.index})
+    _idle.put_nowait(worker)
+
+
+def _schedule_restart(worker: _Worker) -> None:
+    if _idle is None:
+        # shutdown() already cancelled _tasks; a restart now would spawn an orphaned Piper.
+        return
+    _tasks.append(asyncio.create_task(_restart(worker)))
+    _tasks[:] = [task for task in _tasks if not task.done()]
+
+
+async def synthesize(text: str) -> Tuple[bytes, int]:
+    """Synthesize ``text`` on the next free worker; returns ``(pcm, sample_rate)``."""
+    if _idle is None:
+        raise ServiceUnavailableError("Piper worker pool is not running")
+    _stats["waiting"] += 1
+    _stats["max_waiting"] = max(_stats["max_waiting"], _stats["waiting"])
+    try:
+        worker = await asyncio.wait_for(_idle.get(), REQUEST_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError as exc:
+        raise ServiceUnavailableError("no Piper worker became free in time") from exc
+    finally:
+        _stats["waiting"] -= 1
+
+    _stats["requests"] += 1
+    start = time.perf_counter()
+    try:
+        data = await worker.synthesize(text, REQUEST_TIMEOUT_SECONDS)
+    except (asyncio.CancelledError, Exception) as exc:  # noqa: BLE001
+        # A half-read reply leaves the worker's stdout out of step; never reuse it.
+        _stats["failures"] += 1
+        _stats["last_error"] = f"worker {worker.index}: {exc or type(exc).__name__}"
+        LOGGER.warning("piper_worker_failed", extra={"worker": worker.index, "error": repr(exc)})
+        _schedule_restart(worker)
+        if isinstance(exc, asyncio.CancelledError):
+            raise
+        raise ServiceUnavailableError(f"Piper worker failed: {exc or type(exc).__name__}") from exc
+    _stats["total_ms"] += (time.perf_counter() - start) * 1000
+    if _idle is not None:
+        _idle.put_nowait(worker)
+    return split_wav(data)
+
+
+async def check_health() -> Dict[str, int]:
+    """Probe idle workers that have been quiet for a health interval; respawn dead or stuck ones.
+
+    Workers are taken off the idle queue one at a time, so /tts keeps the rest while a probe runs.
+    """
+    checked = restarted = 0
+    if _idle is None:
+        return {"checked": 0, "restarted": 0}
+    for _ in range(_idle.qsize()):
+        if _idle is None or _idle.empty():
+            break
+        worker = _idle.get_nowait()
+        checked += 1
+        healthy = worker.alive()
+        if healthy and time.time() - worker.last_ok > HEALTH_SECONDS:
+            try:
+                await worker.synthesize(PROBE_TEXT, min(REQUEST_TIMEOUT_SECONDS, 10.0))
+            except Exception as exc:  # noqa: BLE001
+                _stats["last_error"] = f"worker {worker.index} probe: {exc or type(exc).__name__}"
+                healthy = False
+        if _idle is None:
+            break
+        if healthy:
+            _idle.put_nowait(worker)
+        else:
+            restarted += 1
+            _schedule_restart(worker)
+    return {"checked": checked, "restarted": restarted}
+
+
+async def _health_loop() -> None:
+    while True:
+        await asyncio.sleep(HEALTH_SECONDS)
+        try:
+            result = await check_health()
+            if result["restarted"]:
+                LOGGER.info("piper_pool_health", extra=result)
+        except Exception as exc:  # noqa: BLE001
+            LOGGER.exception("piper_pool_health_failed", exc_info=exc)
+
+
+async def startup() -> None:
+    global _idle, _command
+    if not PIPER_POOL_ENABLED or _idle is not None:
+        return
+    piper_bin = shutil.which("piper")
+    voice = os.getenv("PIPER_VOICE") or os.getenv("PIPER_MODEL")
+    if not piper_bin or not voice or not os.path.exists(voice):
+        LOGGER.warning("piper_pool_disabled", extra={"reason": "piper binary or voice missing"})
+        return
+    _command = (piper_bin, voice)
+    _idle = asyncio.Queue()
+    _workers[:] = [_Worker(index) for index in range(POOL_SIZE)]
+    started = await asyncio.gather(*(_spawn(worker) for worker in _workers))
+    for worker, ok in zip(_workers, started):
+        if ok:
+            _idle.put_nowait(worker)
+        else:
+            _schedule_restart(worker)
+    _tasks.append(asyncio.create_task(_health_loop()))
+    LOGGER.info("piper_pool_started", extra={"size": POOL_SIZE, "ready": sum(started)})
+
+
+async def shutdown() -> None:
+    global _idle
+    if _idle is None:
+        return
+    _idle = None
+    for task in _tasks:
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
+    await asyncio.gather(*(worker.stop() for worker in _workers))
+    _workers.clear()
+
+
+def snapshot() -> Dict[str, Any]:
+    requests = _stats["requests"]
+    return {
+        "enabled": PIPER_POOL_ENABLED,
+        "running": running(),
+        "size": len(_workers),
+        "alive": sum(1 for worker in _workers if worker.alive()),
+        "idle": _idle.qsize() if _idle is not None else 0,
+        "queue_depth": _stats["waiting"],
+        "max_queue_depth": _stats["max_waiting"],
+        "requests": requests,
+        "failures": _stats["failures"],
+        "restarts": _stats["restarts"],
+        "avg_ms": round(_stats["total_ms"] / max(requests - _stats["failures"], 1), 1),
+        "served": [worker.served for worker in _workers],
+        "last_error": _stats["last_error"],
+    }
@@ -0,0 +1,212 @@
+"""Keep the configured model tiers loaded in Ollama and track which ones are resident."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from .. import flag, ollama_client
+
+LOGGER = logging.getLogger(__name__)
+
+RESIDENCY_ENABLED = flag("AIOS_MODEL_RESIDENCY")
+KEEP_ALIVE = os.getenv("AIOS_KEEP_ALIVE", "30m")
+WARM_TIERS = [t.strip() for t in os.getenv("AIOS_WARM_TIERS", "fast,mid,deep").split(",") if t.strip()]
+REFRESH_SECONDS = float(os.getenv("AIOS_RESIDENCY_REFRESH_S", "120") or "120")
+ACTIVE_WINDOW_SECONDS = float(os.getenv("AIOS_RESIDENCY_WINDOW_MIN", "15") or "15") * 60
+MIN_FREE_MB = int(os.getenv("AIOS_RESIDENCY_MIN_FREE_MB", "2048") or "2048")
+
+_resident: Dict[str, Dict[str, Any]] = {}
+_last_used: Dict[str, float] = {}
+_last_poll_ts: Optional[float] = None
+_deep_unpinned = False
+_lock = threading.Lock()
+_task: Optional[asyncio.Task] = None
+
+
+def mark_used(model: str) -> None:
+    """Record a successful generation; the model is resident at least until keep_alive lapses."""
+    if not model:
+        return
+    now = time.time()
+    with _lock:
+        _last_used[model] = now
+        _resident.setdefault(model, {"name": model})
+
+
+def is_resident(model: str) -> bool:
+    with _lock:
+        return model in _resident
+
+
+def known() -> bool:
+    """True once /api/ps has been read at least once."""
+    with _lock:
+        return _last_poll_ts is not None
+
+
+def recently_used(model: str, now: Optional[float] = None) -> bool:
+    now = now or time.time()
+    with _lock:
+        ts = _last_used.get(model)
+    return ts is not None and now - ts <= ACTIVE_WINDOW_SECONDS
+
+
+def memory_available_mb() -> Optional[int]:
+    try:
+        with open("/proc/meminfo", "r", encoding="utf-8") as fh:
+            for line in fh:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) // 1024
+    except (OSError, ValueError, IndexError):
+        return None
+    return None
+
+
+def memory_tight() -> bool:
+    available = memory_available_mb()
+    return available is not None and available < MIN_FREE_MB
+
+
+async def poll() -> List[str]:
+    """Refresh the resident set from Ollama's /api/ps."""
+    global _last_poll_ts
+    response = await ollama_client.get_client().get("/api/ps", read_timeout=2.0)
+    response.raise_for_status()
+    models = response.json().get("models") or []
+    with _lock:
+        _resident.clear()
+        for entry in models:
+            name = entry.get("name") or entry.get("model")
+            if name:
+                _resident[name] = {
+                    "name": name,
+                    "size": entry.get("size"),
+                    "size_vram": entry.get("size_vram"),
+                    "expires_at": entry.get("expires_at"),
+                }
+        _last_poll_ts = time.time()
+        return list(_resident)
+
+
+async def warm(model: str, keep_alive: str | int = KEEP_ALIVE) -> bool:
+    """Load ``model`` (or extend its residency) with a zero-token /api/generate call.
+
+    Sends the same ``num_ctx`` as generation so the runner it loads is the one turns will use.
+    """
+    from ..llm_router import context_window
+
+    try:
+        response = await ollama_client.get_client().post(
+            "/api/generate",
+            {"model": model, "keep_alive": keep_alive, "options": {"num_ctx": context_window(model)}},
+            read_timeout=120.0,
+        )
+    except Exception as exc:  # noqa: BLE001
+        LOGGER.info("model_warm_failed", extra={"model": model, "error": str(exc)})
+        return False
+    ok = response.status_code == 200
+    if ok and keep_alive not in (0, "0"):
+        with _lock:
+            _resident.setdefault(model, {"name": model})
+    return ok
+
+
+async def unpin(model: str) -> bool:
+    ok = await warm(model, keep_alive=0)
+    if ok:
+        with _lock:
+            _resident.pop(model, None)
+    return ok
+
+
+def _tier_models() -> Dict[str, str]:
+    from ..llm_router import REGISTRY
+
+    return {tier: REGISTRY[tier].name for tier in WARM_TIERS if tier in REGISTRY}
+
+
+async def refresh_once() -> Dict[str, Any]:
+    """Refresh keep_alive for recently used tiers and release the deep tier under memory pressure."""
+    global _deep_unpinned
+    actions: Dict[str, Any] = {"refreshed": [], "unpinned": []}
+    try:
+        await poll()
+    except Exception as exc:  # noqa: BLE001
+        actions["poll_error"] = str(exc)
+    tight = memory_tight()
+    now = time.time()
+    for tier, model in _tier_models().items():
+        used = recently_used(model, now)
+        if tier == "deep" and tight:
+            _deep_unpinned = True
+            if is_resident(model) and not used:
+                if await unpin(model):
+                    actions["unpinned"].append(model)
+            continue
+        if tier == "deep":
+            _deep_unpinned = False
+        if used and await warm(model):
+            actions["refreshed"].append(model)
+    actions["memory_tight"] = tight
+    return actions
+
+
+async def _warm_startup() -> None:
+    tight = memory_tight()
+    for tier, model in _tier_models().items():
+        if tier == "deep" and tight:
+            LOGGER.info("model_warm_skipped", extra={"model": model, "reason": "memory_tight"})
+            continue
+        start = time.perf_counter()
+        ok = await warm(model)
+        LOGGER.info(
+            "model_warmed",
+            extra={"model": model, "ok": ok, "ms": (time.perf_counter() - start) * 1000},
+        )
+
+
+async def _loop() -> None:
+    await _warm_startup()
+    while True:
+        try:
+            await refresh_once()
+        except Exception as exc:  # noqa: BLE001
+            LOGGER.exception("residency_refresh_failed", exc_info=exc)
+        await asyncio.sleep(REFRESH_SECONDS)
+
+
+async def startup() -> None:
+    global _task
+    if not RESIDENCY_ENABLED or _task is not None:
+        return
+    # Warm-up can take seconds per model; never block app startup on it.
+    _task = asyncio.create_task(_loop())
+
+
+async def shutdown() -> None:
+    global _task
+    if _task is None:
+        return
+    _task.cancel()
+    try:
+        await _task
+    except asyncio.CancelledError:
+        pass
+    _task = None
+
+
+def snapshot() -> Dict[str, Any]:
+    with _lock:
+        return {
+            "enabled": RESIDENCY_ENABLED,
+            "resident": sorted(_resident),
+            "last_used": dict(_last_used),
+            "last_poll_ts": _last_poll_ts,
+            "deep_unpinned": _deep_unpinned,
+            "memory_available_mb": memory_available_mb(),
+        }
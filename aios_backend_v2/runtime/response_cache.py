@@ -0,0 +1,154 @@
+"""Exact and semantic cache of LLM replies for repeated conversational turns.
+
+The exact tier is keyed on the assembled messages, model and temperature. The
+semantic tier matches the latest user text by embedding (the LTM embedder)
+within the same model and tool set, and is used only when the
+sentence-transformers model is available. Tool-call replies are never cached.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .. import flag
+from . import cache as runtime_cache
+from .singleflight import request_key
+
+RESPONSE_CACHE_ENABLED = flag("AIOS_RESPONSE_CACHE")
+SEMANTIC_ENABLED = flag("AIOS_RESPONSE_CACHE_SEMANTIC")
+TTL_SECONDS = float(os.getenv("AIOS_RESPONSE_CACHE_TTL_S", "900") or "900")
+MAX_ENTRIES = int(os.getenv("AIOS_RESPONSE_CACHE_MAX", "256") or "256")
+SEMANTIC_MIN_SIM = float(os.getenv("AIOS_RESPONSE_CACHE_MIN_SIM", "0.93") or "0.93")
+
+# Prompt content that goes stale between turns: recent launches and wall-clock time.
+# The rest of the system card (OS, compositor, package managers) is stable.
+VOLATILE_PATTERNS = {
+    "recent_launches": re.compile(r'Recent apps: \[\s*"|"recent_apps":\[\s*"'),
+    "datetime": re.compile(r"\b\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}"),
+}
+
+
+@dataclass
+class _Entry:
+    reply: str
+    stored: float
+    scope: str
+    vector: Any = None
+
+
+_entries: "OrderedDict[str, _Entry]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def volatile_reason(messages: List[Dict[str, Any]]) -> Optional[str]:
+    """Name of the first volatile section found in the prompt, if any."""
+    text = "\n".join(m.get("content") or "" for m in messages)
+    for name, pattern in VOLATILE_PATTERNS.items():
+        if pattern.search(text):
+            return name
+    return None
+
+
+def exact_key(messages: List[Dict[str, Any]], model: str, temperature: Optional[float]) -> str:
+    return request_key(model, temperature, messages)
+
+
+def scope_key(model: str, tools: Iterable[str]) -> str:
+    return f"{model}|{','.join(sorted(tools))}"
+
+
+def embed(text: str) -> Any:
+    """Embedding for the semantic tier, or None when it is off or no embedder is installed."""
+    if not (RESPONSE_CACHE_ENABLED and SEMANTIC_ENABLED and text.strip()):
+        return None
+    from ..memory import ltm
+
+    return ltm.embed(text.strip().lower())
+
+
+def _prune(now: float) -> None:
+    expired = [key for key, entry in _entries.items() if now - entry.stored > TTL_SECONDS]
+    for key in expired:
+        del _entries[key]
+    while len(_entries) > MAX_ENTRIES:
+        _entries.popitem(last=False)
+        runtime_cache.record_response_cache("evictions")
+
+
+def lookup(key: str, scope: str, vector: Any = None) -> Optional[Tuple[str, str, float]]:
+    """``(reply, tier, similarity)`` for a live entry, else None; a hit refreshes its LRU position."""
+    now = time.time()
+    with _lock:
+        _prune(now)
+        entry = _entries.get(key)
+        if entry is not None:
+            _entries.move_to_end(key)
+            runtime_cache.record_response_cache("exact_hits")
+            return entry.reply, "exact", 1.0
+        if vector is not None:
+            from ..memory import ltm
+
+            best: Optional[Tuple[float, str]] = None
+            for candidate_key, candidate in _entries.items():
+                if candidate.scope != scope or candidate.vector is None:
+                    continue
+                score = ltm.similarity(vector, candidate.vector)
+                if score >= SEMANTIC_MIN_SIM and (best is None or score > best[0]):
+                    best = (score, candidate_key)
+            if best is not None:
+                _entries.move_to_end(best[1])
+                runtime_cache.record_response_cache("semantic_hits")
+                return _entries[best[1]].reply, "semantic", round(best[0], 4)
+    runtime_cache.record_response_cache("misses")
+    return None
+
+
+def is_tool_call(reply: str) -> bool:
+    text = reply.strip()
+    if not text.startswith("{"):
+        return False
+    try:
+        parsed = json.loads(text)
+    except ValueError:
+        return False
+    return isinstance(parsed, dict) and "tool_call" in parsed
+
+
+def store(key: str, scope: str, reply: str, vector: Any = None) -> None:
+    """Cache a conversational reply; tool calls are never stored, since a hit would execute them."""
+    if not reply or is_tool_call(reply):
+        return
+    with _lock:
+        _entries[key] = _Entry(reply, time.time(), scope, vector)
+        _entries.move_to_end(key)
+        _prune(time.time())
+
+
+def bypass() -> None:
+    runtime_cache.record_response_cache("bypassed")
+
+
+def clear() -> None:
+    with _lock:
+        _entries.clear()
+
+
+def snapshot() -> Dict[str, Any]:
+    with _lock:
+        size = len(_entries)
+        semantic = sum(1 for entry in _entries.values() if entry.vector is not None)
+    return {
+        "enabled": RESPONSE_CACHE_ENABLED,
+        "semantic": SEMANTIC_ENABLED,
+        "entries": size,
+        "semantic_entries": semantic,
+        "ttl_s": TTL_SECONDS,
+        **runtime_cache.stats_snapshot()["response_cache"],
+    }
@@ -0,0 +1,91 @@
+"""Coalesce identical in-flight requests so duplicates share one result."""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import hashlib
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+from .. import flag
+
+LOGGER = logging.getLogger(__name__)
+
+COALESCE_ENABLED = flag("AIOS_COALESCE", True)
+
+T = TypeVar("T")
+
+_current: contextvars.ContextVar[Optional["_Flight"]] = contextvars.ContextVar("singleflight", default=None)
+
+
+def request_key(*parts: Any) -> str:
+    blob = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class _Flight:
+    def __init__(self) -> None:
+        self.task: Optional[asyncio.Task] = None
+        self.joined = 0
+
+
+class SingleFlight:
+    """One in-flight call per key; concurrent callers with the same key await it."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._flights: Dict[str, _Flight] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        if not COALESCE_ENABLED:
+            return await fn()
+        flight = self._flights.get(key)
+        if flight is not None:
+            flight.joined += 1
+            self.coalesced += 1
+            LOGGER.info("request_coalesced", extra={"kind": self.name, "key": key[:12], "joined": flight.joined})
+        else:
+            flight = self._start(key, fn)
+        # Shielded so a client that disconnects does not cancel the call for the others.
+        return await asyncio.shield(flight.task)
+
+    def _start(self, key: str, fn: Callable[[], Awaitable[T]]) -> _Flight:
+        flight = _Flight()
+
+        async def run() -> T:
+            _current.set(flight)
+            return await fn()
+
+        flight.task = asyncio.ensure_future(run())
+        self._flights[key] = flight
+        self.leaders += 1
+
+        def _done(task: asyncio.Task) -> None:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            if not task.cancelled():
+                task.exception()  # mark retrieved when every caller went away
+
+        flight.task.add_done_callback(_done)
+        return flight
+
+    def stats(self) -> Dict[str, int]:
+        return {"leaders": self.leaders, "coalesced": self.coalesced, "inflight": len(self._flights)}
+
+
+def joined_so_far() -> int:
+    """Duplicates that have joined the flight the current task is running for."""
+    flight = _current.get()
+    return flight.joined if flight else 0
+
+
+chat_flights = SingleFlight("chat")
+tts_flights = SingleFlight("tts")
+
+
+def snapshot() -> Dict[str, Dict[str, Any]]:
+    return {"enabled": COALESCE_ENABLED, "chat": chat_flights.stats(), "tts": tts_flights.stats()}
@@ -0,0 +1,109 @@
+"""Speculative execution of side-effect-free tools while the LLM is generating."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from .. import flag
+
+LOGGER = logging.getLogger(__name__)
+
+SPECULATION_ENABLED = flag("AIOS_SPECULATIVE_TOOLS")
+MIN_CONF = float(os.getenv("AIOS_SPECULATE_MIN_CONF", "0.6") or "0.6")
+MAX_CONF = float(os.getenv("AIOS_SPECULATE_MAX_CONF", "0.8") or "0.8")
+
+_stats: Dict[str, Dict[str, float]] = {}
+_lock = threading.Lock()
+
+
+def in_band(confidence: float) -> bool:
+    return SPECULATION_ENABLED and MIN_CONF <= confidence < MAX_CONF
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, str):
+        return value.strip().lower()
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items() if v not in (None, "")}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def _record(tool: str, outcome: str, ms: float = 0.0) -> None:
+    with _lock:
+        entry = _stats.setdefault(tool, {"started": 0, "hits": 0, "misses": 0, "saved_ms": 0.0, "wasted_ms": 0.0})
+        if outcome == "started":
+            entry["started"] += 1
+        elif outcome == "hit":
+            entry["hits"] += 1
+            entry["saved_ms"] += ms
+        else:
+            entry["misses"] += 1
+            entry["wasted_ms"] += ms
+
+
+class Speculation:
+    """One predicted tool call running ahead of the model's decision."""
+
+    def __init__(self, name: str, args: Dict[str, Any], run: Callable[[], Awaitable[Dict[str, Any]]]) -> None:
+        self.name = name
+        self.args = dict(args or {})
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+        self.settled = False
+        self.task = asyncio.create_task(run())
+        self.task.add_done_callback(self._on_done)
+        _record(name, "started")
+
+    def _on_done(self, task: asyncio.Task) -> None:
+        self.finished = time.perf_counter()
+        if not task.cancelled():
+            task.exception()  # retrieved here so a discarded failure is not reported as unhandled
+
+    def matches(self, tool_call: Optional[Dict[str, Any]]) -> bool:
+        if not tool_call or tool_call.get("name") != self.name:
+            return False
+        return _normalize(tool_call.get("arguments") or {}) == _normalize(self.args)
+
+    async def commit(self) -> Tuple[Dict[str, Any], float]:
+        """Result of the speculative run and the latency it saved versus starting now."""
+        commit_ts = time.perf_counter()
+        result = await self.task
+        duration = (self.finished or time.perf_counter()) - self.started
+        waited = time.perf_counter() - commit_ts
+        saved_ms = max(0.0, (duration - waited) * 1000)
+        self.settled = True
+        _record(self.name, "hit", saved_ms)
+        return result, saved_ms
+
+    def discard(self) -> Optional[float]:
+        """Drop the speculative run; returns the milliseconds it had spent, or None if already settled."""
+        if self.settled:
+            return None
+        self.settled = True
+        if not self.task.done():
+            self.task.cancel()
+        spent_ms = ((self.finished or time.perf_counter()) - self.started) * 1000
+        _record(self.name, "miss", spent_ms)
+        LOGGER.info("speculation_discarded", extra={"tool": self.name, "spent_ms": spent_ms})
+        return spent_ms
+
+
+def snapshot() -> Dict[str, Any]:
+    with _lock:
+        tools = {}
+        for name, entry in _stats.items():
+            decided = entry["hits"] + entry["misses"]
+            tools[name] = {
+                **entry,
+                "hit_rate": round(entry["hits"] / decided, 3) if decided else None,
+                "saved_ms": round(entry["saved_ms"], 1),
+                "wasted_ms": round(entry["wasted_ms"], 1),
+            }
+    return {"enabled": SPECULATION_ENABLED, "band": [MIN_CONF, MAX_CONF], "tools": tools}
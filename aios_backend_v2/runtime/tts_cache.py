@@ -0,0 +1,300 @@
+"""Content-addressed cache of synthesized speech under DATA_DIR, with an in-memory hot tier.
+
+Entries are keyed by a hash of the voice model file and the normalized text,
+so swapping voices never serves stale audio. The disk tier is LRU by file
+mtime (touched on every hit) and capped at ``AIOS_TTS_CACHE_MAX_MB``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .. import flag
+from ..settings import DATA_DIR
+
+LOGGER = logging.getLogger(__name__)
+
+TTS_CACHE_ENABLED = flag("AIOS_TTS_CACHE")
+PRERENDER_ENABLED = flag("AIOS_TTS_PRERENDER", default=True)
+CACHE_DIR = Path(os.getenv("AIOS_TTS_CACHE_DIR", str(DATA_DIR / "tts_cache"))).expanduser()
+MAX_BYTES = int(float(os.getenv("AIOS_TTS_CACHE_MAX_MB", "64") or "64") * 1024 * 1024)
+HOT_ENTRIES = int(os.getenv("AIOS_TTS_CACHE_HOT", "64") or "64")
+PRERENDER_MAX = int(os.getenv("AIOS_TTS_PRERENDER_MAX", "200") or "200")
+
+_WHITESPACE = re.compile(r"\s+")
+
+_lock = threading.Lock()
+_hot: "OrderedDict[str, bytes]" = OrderedDict()
+# key -> (size, last use); rebuilt from the directory on first access.
+_disk: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+_disk_bytes = 0
+_disk_loaded = False
+_voice_hash: Dict[Tuple[str, int, int], str] = {}
+_task: Optional[asyncio.Task] = None
+_stats: Dict[str, Any] = {
+    "hot_hits": 0,
+    "disk_hits": 0,
+    "misses": 0,
+    "stores": 0,
+    "evictions": 0,
+    "prerendered": 0,
+    "prerender_skipped": 0,
+}
+
+
+def normalize(text: str) -> str:
+    """Spacing and a trailing full stop do not change what Piper says; case does ("US" vs "us")."""
+    text = unicodedata.normalize("NFKC", text)
+    return _WHITESPACE.sub(" ", text).strip().rstrip(".").rstrip()
+
+
+def voice_hash() -> Optional[str]:
+    """SHA-256 of the configured voice model, memoized on path, size and mtime."""
+    voice = os.getenv("PIPER_VOICE") or os.getenv("PIPER_MODEL")
+    if not voice:
+        return None
+    try:
+        stat = os.stat(voice)
+    except OSError:
+        return None
+    ident = (voice, stat.st_size, int(stat.st_mtime))
+    cached = _voice_hash.get(ident)
+    if cached is None:
+        digest = hashlib.sha256()
+        with open(voice, "rb") as fh:
+            for block in iter(lambda: fh.read(1 << 20), b""):
+                digest.update(block)
+        cached = _voice_hash[ident] = digest.hexdigest()
+    return cached
+
+
+def cache_key(text: str, fmt: str = "wav") -> Optional[str]:
+    voice = voice_hash()
+    if voice is None:
+        return None
+    return hashlib.sha256(f"{voice}\0{fmt}\0{normalize(text)}".encode("utf-8")).hexdigest()
+
+
+def _path(key: str, fmt: str) -> Path:
+    return CACHE_DIR / key[:2] / f"{key}.{fmt}"
+
+
+def _load_disk_index() -> None:
+    global _disk_bytes, _disk_loaded
+    if _disk_loaded:
+        return
+    found: List[Tuple[float, str, int]] = []
+    if CACHE_DIR.exists():
+        for path in CACHE_DIR.glob("*/*.*"):
+            if path.suffix == ".tmp":
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            found.append((stat.st_mtime, path.name, stat.st_size))
+    found.sort()
+    _disk.clear()
+    for mtime, name, size in found:
+        _disk[name] = (size, mtime)
+    _disk_bytes = sum(size for _, _, size in found)
+    _disk_loaded = True
+
+
+def _remember_hot(name: str, data: bytes) -> None:
+    _hot[name] = data
+    _hot.move_to_end(name)
+    while len(_hot) > HOT_ENTRIES:
+        _hot.popitem(last=False)
+
+
+def _forget(name: str) -> None:
+    global _disk_bytes
+    entry = _disk.pop(name, None)
+    if entry is not None:
+        _disk_bytes -= entry[0]
+
+
+def _evict() -> None:
+    global _disk_bytes
+    while _disk_bytes > MAX_BYTES and len(_disk) > 1:
+        name, (size, _) = _disk.popitem(last=False)
+        _disk_bytes -= size
+        _stats["evictions"] += 1
+        try:
+            (CACHE_DIR / name[:2] / name).unlink()
+        except OSError:
+            pass
+
+
+def get(text: str, fmt: str = "wav") -> Optional[bytes]:
+    """Cached audio for ``text`` in ``fmt``, from memory or disk; blocking, call off the loop."""
+    if not TTS_CACHE_ENABLED:
+        return None
+    key = cache_key(text, fmt)
+    if key is None:
+        return None
+    name = f"{key}.{fmt}"
+    with _lock:
+        data = _hot.get(name)
+        if data is not None:
+            _hot.move_to_end(name)
+            _stats["hot_hits"] += 1
+            return data
+        _load_disk_index()
+        known = name in _disk
+    if known:
+        path = _path(key, fmt)
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+        except OSError:
+            data = None
+        with _lock:
+            if data is None:
+                _forget(name)
+            else:
+                _disk[name] = (len(data), time.time())
+                _disk.move_to_end(name)
+                _remember_hot(name, data)
+                _stats["disk_hits"] += 1
+                return data
+    with _lock:
+        _stats["misses"] += 1
+    return None
+
+
+def put(text: str, data: bytes, fmt: str = "wav") -> None:
+    """Store ``data`` for ``text``; blocking, call off the loop."""
+    global _disk_bytes
+    if not TTS_CACHE_ENABLED or not data:
+        return
+    key = cache_key(text, fmt)
+    if key is None:
+        return
+    name = f"{key}.{fmt}"
+    path = _path(key, fmt)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+    except OSError as exc:
+        LOGGER.warning("tts_cache_write_failed", extra={"error": str(exc)})
+        return
+    with _lock:
+        _load_disk_index()
+        _forget(name)
+        _disk[name] = (len(data), time.time())
+        _disk_bytes += len(data)
+        _remember_hot(name, data)
+        _stats["stores"] += 1
+        _evict()
+
+
+async def aget(text: str, fmt: str = "wav") -> Optional[bytes]:
+    if not TTS_CACHE_ENABLED:
+        return None
+    return await asyncio.to_thread(get, text, fmt)
+
+
+async def aput(text: str, data: bytes, fmt: str = "wav") -> None:
+    if TTS_CACHE_ENABLED:
+        await asyncio.to_thread(put, text, data, fmt)
+
+
+def contains(text: str, fmt: str = "wav") -> bool:
+    key = cache_key(text, fmt)
+    if key is None:
+        return False
+    name = f"{key}.{fmt}"
+    with _lock:
+        _load_disk_index()
+        return name in _hot or name in _disk
+
+
+async def prerender(phrases: Iterable[str], render: Callable[[str], Awaitable[bytes]]) -> Dict[str, int]:
+    """Synthesize and store each phrase that is not cached yet, one at a time."""
+    rendered = skipped = failed = 0
+    for phrase in phrases:
+        if await asyncio.to_thread(contains, phrase):
+            skipped += 1
+            continue
+        try:
+            await aput(phrase, await render(phrase))
+            rendered += 1
+        except Exception as exc:  # noqa: BLE001
+            failed += 1
+            LOGGER.info("tts_prerender_failed", extra={"phrase": phrase, "error": str(exc)})
+    _stats["prerendered"] += rendered
+    _stats["prerender_skipped"] += skipped
+    return {"rendered": rendered, "skipped": skipped, "failed": failed}
+
+
+async def _prerender_job(
+    phrases: Callable[[], List[str]], render: Callable[[str], Awaitable[bytes]]
+) -> None:
+    start = time.perf_counter()
+    try:
+        # Built on the loop thread: the phrase source reads the app index through the
+        # sqlite connection, which may only be used from the thread that opened it.
+        candidates = phrases()[:PRERENDER_MAX]
+        result = await prerender(candidates, render)
+    except Exception as exc:  # noqa: BLE001
+        LOGGER.exception("tts_prerender_job_failed", exc_info=exc)
+        return
+    LOGGER.info("tts_prerendered", extra={**result, "ms": (time.perf_counter() - start) * 1000})
+
+
+async def startup(phrases: Callable[[], List[str]], render: Callable[[str], Awaitable[bytes]]) -> None:
+    """Pre-render ``phrases()`` in the background; never blocks app startup."""
+    global _task
+    if not (TTS_CACHE_ENABLED and PRERENDER_ENABLED) or _task is not None:
+        return
+    _task = asyncio.create_task(_prerender_job(phrases, render))
+
+
+async def shutdown() -> None:
+    global _task
+    if _task is None:
+        return
+    _task.cancel()
+    try:
+        await _task
+    except asyncio.CancelledError:
+        pass
+    _task = None
+
+
+def clear_memory() -> None:
+    """Drop the hot tier and forget the disk index (it is rebuilt on next use)."""
+    global _disk_loaded, _disk_bytes
+    with _lock:
+        _hot.clear()
+        _disk.clear()
+        _disk_bytes = 0
+        _disk_loaded = False
+
+
+def snapshot() -> Dict[str, Any]:
+    with _lock:
+        return {
+            "enabled": TTS_CACHE_ENABLED,
+            "dir": str(CACHE_DIR),
+            "hot_entries": len(_hot),
+            "disk_entries": len(_disk),
+            "disk_mb": round(_disk_bytes / (1024 * 1024), 2),
+            "max_mb": round(MAX_BYTES / (1024 * 1024), 2),
+            "prerendering": _task is not None and not _task.done(),
+            **_stats,
+        }
@@ -14,6 +14,11 @@ class Tool(abc.ABC):
         "additionalProperties": False,
     }
     returns_schema: Dict[str, Any] = {"type": "object"}
+    # Side-effect-free tools may be started speculatively while the LLM is still deciding.
+    speculative: bool = False
+
+    def speculation_safe(self, args: Dict[str, Any]) -> bool:
+        return self.speculative
 
     @abc.abstractmethod
     async def run(self, args: Dict[str, Any]) -> Dict[str, Any]:
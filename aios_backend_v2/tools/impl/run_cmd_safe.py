@@ -18,6 +18,24 @@ INTERACTIVE_BLOCKLIST = {
     "ssh",
 }
 
+# Commands that only read state, so they can run before the model has confirmed them.
+READ_ONLY_COMMANDS = {
+    "cat",
+    "date",
+    "df",
+    "du",
+    "free",
+    "hostname",
+    "id",
+    "ls",
+    "lsblk",
+    "ps",
+    "pwd",
+    "uname",
+    "uptime",
+    "whoami",
+}
+
 
 def _normalize(cmd: List[str]) -> str:
     if not cmd:
@@ -52,6 +70,9 @@ class RunCommandSafe(Tool):
         },
     }
 
+    def speculation_safe(self, args: Dict[str, Any]) -> bool:
+        return _normalize(args.get("cmd") or []) in READ_ONLY_COMMANDS
+
     async def run(self, args: Dict[str, Any]) -> Dict[str, Any]:
         cmd: List[str] = args["cmd"]
         head = _normalize(cmd)
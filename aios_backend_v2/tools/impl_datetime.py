@@ -10,6 +10,7 @@ class GetDateTime(Tool):
     name = "get_datetime"
     description = "Get the current date/time in ISO8601 and a human string."
     permissions = []
+    speculative = True
     params_schema = {
         "type": "object",
         "properties": {"tz": {"type": "string"}},
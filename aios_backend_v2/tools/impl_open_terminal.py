@@ -15,6 +15,14 @@ TERMINAL_CHOICES = {"kitty", "foot", "gnome-terminal", "alacritty"}
 TUI_FALLBACK_ORDER = ["kitty", "alacritty", "foot", "gnome-terminal"]
 
 
+def launch_note(program: str, terminal: str, workspace: int, comp: str) -> str:
+    if comp == "hyprland":
+        return f"Opening {program} in {terminal} on workspace {workspace}"
+    if comp == "gnome":
+        return f"Opening {program} in {terminal} (current GNOME workspace)"
+    return f"Opening {program} in {terminal}"
+
+
 def _dispatch_workspace(workspace: int) -> None:
     if workspace <= 0:
         return
@@ -133,12 +141,7 @@ class OpenTerminal(Tool):
                     break
 
         if result.get("ok"):
-            if comp == "hyprland":
-                note = f"Opening {program} in {terminal} on workspace {workspace}"
-            elif comp == "gnome":
-                note = f"Opening {program} in {terminal} (current GNOME workspace)"
-            else:
-                note = f"Opening {program} in {terminal}"
+            note = launch_note(program, terminal, workspace, comp)
             result.update(
                 {
                     "workspace": workspace,
@@ -10,6 +10,7 @@ class PkgInfo(Tool):
     name = "pkg_info"
     description = "Report how AIOS would resolve an app/package across channels."
     permissions = ["shell:read"]
+    speculative = True
     params_schema = {
         "type": "object",
         "properties": {
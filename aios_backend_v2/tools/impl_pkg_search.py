@@ -10,6 +10,7 @@ class PkgSearch(Tool):
     name = "pkg_search"
     description = "List canonical matches for an application/package alias."
     permissions = ["shell:read"]
+    speculative = True
     params_schema = {
         "type": "object",
         "properties": {"query": {"type": "string"}},
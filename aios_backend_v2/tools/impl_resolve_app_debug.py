@@ -10,6 +10,7 @@ class ResolveAppDebug(Tool):
     name = "resolve_app_debug"
     description = "Explain how open_app would resolve an application without launching it."
     permissions = ["shell:read"]
+    speculative = True
     params_schema = {
         "type": "object",
         "properties": {"app": {"type": "string"}},
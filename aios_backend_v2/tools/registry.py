@@ -47,10 +47,16 @@ TOOLS_PACKAGES += [
 if os.getenv("AIOS_MEMORY_LTM_V1","off").lower() in {"1","true","on"}:
     TOOLS_PACKAGES += ["aios_backend_v2.tools.impl_memory_ltm"]
 
+# Bumped whenever the registry is (re)built; prompt tool blocks are memoized against it.
+_version = 0
+
+
+def registry_version() -> int:
+    return _version
 
 
 def load_tools() -> Dict[str, Tool]:
-    global _registry
+    global _registry, _version
     if _registry:
         return _registry
     for modname in TOOLS_PACKAGES:
@@ -64,6 +70,7 @@ def load_tools() -> Dict[str, Tool]:
             raise RuntimeError(f"Tool module {modname} has no tool(s)")
         for tool in tools:
             _registry[tool.name] = tool
+    _version += 1
     return _registry
 
 
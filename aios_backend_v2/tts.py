@@ -1,9 +1,27 @@
 import asyncio
+import collections
+import json
 import os
+import re
 import shutil
+import struct
 import tempfile
+import time
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
 
+from . import audio_format
+from .audio_format import wav_bytes
 from .errors import ServiceUnavailableError
+from .runtime import piper_pool, tts_cache
+
+MAX_CHUNK_CHARS = 240
+FRAME_MEDIA_TYPE = "application/x-aios-audio-frames"
+FRAME_META = b"m"
+FRAME_AUDIO = b"a"
+
+# Split after terminal punctuation (and any closing quote) unless the next word is lowercase ("3 p.m. today").
+_SENTENCE_END = re.compile(r"(?:(?<=[.!?\u2026])|(?<=[.!?\u2026][\"')\]]))\s+(?=[^a-z\s])")
+_CLAUSE_END = re.compile(r"(?<=[,;:])\s+")
 
 
 def _get_voice_path() -> str:
@@ -16,6 +34,198 @@ def _get_voice_path() -> str:
 
 
 async def piper_say(text: str) -> bytes:
+    cached = await tts_cache.aget(text)
+    if cached is not None:
+        return cached
+    data = await render_wav(text)
+    await tts_cache.aput(text, data)
+    return data
+
+
+async def render_wav(text: str) -> bytes:
+    """Synthesize ``text`` with Piper, bypassing the phrase cache."""
+    if piper_pool.running():
+        pcm, sample_rate = await piper_pool.synthesize(text)
+        return wav_bytes(pcm, sample_rate)
+    return await _piper_once(text)
+
+
+async def synthesize_pcm(text: str) -> Tuple[bytes, int]:
+    """``(pcm, sample_rate)`` for ``text``, from the phrase cache or the worker pool when running."""
+    cached = await tts_cache.aget(text)
+    if cached is not None:
+        return piper_pool.split_wav(cached)
+    if piper_pool.running():
+        pcm, sample_rate = await piper_pool.synthesize(text)
+        await tts_cache.aput(text, wav_bytes(pcm, sample_rate))
+        return pcm, sample_rate
+    data = await _piper_once(text)
+    await tts_cache.aput(text, data)
+    return piper_pool.split_wav(data)
+
+
+async def synthesize(text: str, fmt: str) -> Tuple[bytes, Optional[int]]:
+    """``text`` as ``fmt`` audio plus the PCM sample rate (None when served from the cache as-is).
+
+    Compressed variants are cached alongside the WAV they were encoded from.
+    """
+    if fmt == "wav":
+        return await piper_say(text), None
+    if fmt in audio_format.COMPRESSED:
+        cached = await tts_cache.aget(text, fmt)
+        if cached is not None:
+            return cached, None
+    pcm, sample_rate = await synthesize_pcm(text)
+    data = await audio_format.encode(pcm, sample_rate, fmt)
+    if fmt in audio_format.COMPRESSED:
+        await tts_cache.aput(text, data, fmt)
+    return data, sample_rate
+
+
+def split_sentences(text: str) -> List[str]:
+    """Speakable chunks in order: sentences, with overlong ones cut at clause punctuation."""
+    chunks: List[str] = []
+    for sentence in _SENTENCE_END.split(text.strip()):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        if len(sentence) <= MAX_CHUNK_CHARS:
+            chunks.append(sentence)
+            continue
+        current = ""
+        for clause in _CLAUSE_END.split(sentence):
+            if current and len(current) + len(clause) + 1 > MAX_CHUNK_CHARS:
+                chunks.append(current)
+                current = clause
+            else:
+                current = f"{current} {clause}".strip()
+        if current:
+            chunks.append(current)
+    # A lone word or punctuation mark is not worth its own synthesis round trip.
+    merged: List[str] = []
+    for chunk in chunks:
+        if merged and len(chunk) < 4:
+            merged[-1] = f"{merged[-1]} {chunk}"
+        else:
+            merged.append(chunk)
+    return merged
+
+
+def audio_frame(kind: bytes, payload: bytes) -> bytes:
+    """One frame of the ``/tts/stream`` format: kind byte, little-endian u32 length, payload."""
+    return kind + struct.pack("<I", len(payload)) + payload
+
+
+def meta_frame(data: Dict[str, Any]) -> bytes:
+    return audio_frame(FRAME_META, json.dumps(data, ensure_ascii=False).encode("utf-8"))
+
+
+async def _timed_audio(text: str, fmt: str) -> Tuple[bytes, Optional[int], float]:
+    start = time.perf_counter()
+    if fmt == "pcm":
+        data, sample_rate = await synthesize_pcm(text)
+    else:
+        data, sample_rate = await synthesize(text, fmt)
+    return data, sample_rate, (time.perf_counter() - start) * 1000
+
+
+def _discard(task: "asyncio.Task") -> None:
+    if not task.cancelled():
+        task.exception()
+
+
+class SentenceSegmenter:
+    """Cut streamed text into speakable chunks as soon as each sentence is complete.
+
+    A boundary only counts once the next sentence has started, so ``3 p.m.``
+    followed by a lowercase word is not split.
+    """
+
+    def __init__(self) -> None:
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        self._buffer += text
+        ready: List[str] = []
+        last = None
+        for last in _SENTENCE_END.finditer(self._buffer):
+            pass
+        if last is not None:
+            head, self._buffer = self._buffer[: last.start()], self._buffer[last.end() :]
+            ready = split_sentences(head)
+        elif len(self._buffer) > MAX_CHUNK_CHARS:
+            clause = None
+            for clause in _CLAUSE_END.finditer(self._buffer):
+                pass
+            if clause is not None:
+                ready = [self._buffer[: clause.start()].strip()]
+                self._buffer = self._buffer[clause.end() :]
+        return ready
+
+    def flush(self) -> List[str]:
+        rest, self._buffer = self._buffer, ""
+        return split_sentences(rest)
+
+
+class SpeechPipeline:
+    """Synthesize chunks as they are submitted and hand them back in submission order.
+
+    Up to one chunk per pool worker is in flight (one at a time without the
+    pool). Iterating yields ``(index, text, audio, sample_rate, synth_ms,
+    submitted_at)`` until ``close()`` has been called and every chunk is out;
+    ``audio`` is 16-bit mono PCM unless another ``fmt`` is given.
+    """
+
+    def __init__(self, fmt: str = "pcm") -> None:
+        self.fmt = fmt
+        self._limit = asyncio.Semaphore(piper_pool.POOL_SIZE if piper_pool.running() else 1)
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._pending: Deque[asyncio.Task] = collections.deque()
+        self._submitted = 0
+
+    def submit(self, text: str) -> None:
+        task = asyncio.create_task(self._render(text))
+        self._pending.append(task)
+        self._queue.put_nowait((self._submitted, text, time.perf_counter(), task))
+        self._submitted += 1
+
+    def close(self) -> None:
+        self._queue.put_nowait(None)
+
+    async def _render(self, text: str) -> Tuple[bytes, Optional[int], float]:
+        async with self._limit:
+            return await _timed_audio(text, self.fmt)
+
+    async def __aiter__(self) -> AsyncIterator[Tuple[int, str, bytes, Optional[int], float, float]]:
+        try:
+            while True:
+                item = await self._queue.get()
+                if item is None:
+                    return
+                index, text, submitted_at, task = item
+                audio, sample_rate, synth_ms = await task
+                self._pending.popleft()
+                yield index, text, audio, sample_rate, synth_ms, submitted_at
+        finally:
+            # Let in-flight chunks finish: cancelling a pool worker mid-utterance forces a restart.
+            for task in self._pending:
+                task.add_done_callback(_discard)
+
+
+async def stream_audio(
+    chunks: List[str], fmt: str = "pcm"
+) -> AsyncIterator[Tuple[int, str, bytes, Optional[int], float]]:
+    """Yield ``(index, text, audio, sample_rate, synth_ms)`` per chunk, in order."""
+    pipeline = SpeechPipeline(fmt)
+    for chunk in chunks:
+        pipeline.submit(chunk)
+    pipeline.close()
+    async for index, text, audio, sample_rate, synth_ms, _ in pipeline:
+        yield index, text, audio, sample_rate, synth_ms
+
+
+async def _piper_once(text: str) -> bytes:
+    """One Piper process per utterance; used when the worker pool is off."""
     piper_bin = shutil.which("piper")
     if not piper_bin:
         raise ServiceUnavailableError("Piper binary not found in PATH")
@@ -0,0 +1,100 @@
+"""Incremental detection of a ``{"tool_call": {...}}`` reply on a token stream."""
+
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, List, Optional
+
+
+class ToolCallScanner:
+    """Feed streamed chunks; ``feed`` returns the parsed object once a top-level
+    JSON object carrying ``tool_call`` is complete.
+
+    Tracks brace depth outside of strings only, so it costs one pass over each
+    chunk. Replies that do not open with ``{`` are abandoned on the first
+    visible character.
+    """
+
+    def __init__(self) -> None:
+        self._buf: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._started = False
+        self.abandoned = False
+        self.result: Optional[Dict[str, Any]] = None
+
+    def feed(self, chunk: str) -> Optional[Dict[str, Any]]:
+        if self.abandoned or self.result is not None:
+            return self.result
+        for ch in chunk:
+            if not self._started:
+                if ch.isspace():
+                    continue
+                if ch != "{":
+                    self.abandoned = True
+                    return None
+                self._started = True
+            self._buf.append(ch)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    return self._finish()
+        return None
+
+    def _finish(self) -> Optional[Dict[str, Any]]:
+        try:
+            parsed = json.loads("".join(self._buf))
+        except json.JSONDecodeError:
+            self.abandoned = True
+            return None
+        if isinstance(parsed, dict) and isinstance(parsed.get("tool_call"), dict):
+            self.result = parsed
+        else:
+            self.abandoned = True
+        return self.result
+
+    @property
+    def text(self) -> str:
+        return "".join(self._buf)
+
+
+def tool_call_schema(tools: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """JSON schema for Ollama's ``format`` option: one of the allowed tool calls, or a plain reply."""
+    calls = [
+        {
+            "type": "object",
+            "properties": {
+                "name": {"type": "string", "enum": [tool["name"]]},
+                "arguments": tool.get("params_schema") or {"type": "object"},
+            },
+            "required": ["name", "arguments"],
+        }
+        for tool in tools
+    ]
+    return {
+        "anyOf": [
+            {
+                "type": "object",
+                "properties": {"tool_call": {"anyOf": calls} if len(calls) > 1 else calls[0]},
+                "required": ["tool_call"],
+            },
+            {
+                "type": "object",
+                "properties": {"reply": {"type": "string"}},
+                "required": ["reply"],
+            },
+        ]
+    }